@@ -2,23 +2,25 @@ import streamlit as st
 import pandas as pd
 import json
 import numpy as np
-from fpdf import FPDF
-import matplotlib.pyplot as plt
-import tempfile
-from datetime import datetime
+import os
+import uuid
+from cache import RESULT_CACHE, cached_calculate, cached_calculate_batch, scenario_key
+from montecarlo import MC_METRICS, run_monte_carlo
+from profiling import Tracer, span
+from importer import read_records, read_table, typed
+from jobs import DONE, EXPIRED, FAILED, CANCELLED, JOBS
+from report import create_comparison_pdf, create_detailed_pdf, submit_report
+from engine import DEFAULTS, MAX_HORIZON_YEARS, METRICS, PERIODS_PER_YEAR, STRATEGIES, STRUCTURAL_KEYS, IncrementalEngine, ModelInputs, ScenarioResult, strategy_grid, strategy_midpoint
+from solver import OPS, Constraint, Decision, solve
+from store import OPS as STORE_OPS, default_store
+from export import BIL_COLS, CF_COLS, FORMATS, GUV_COLS, XLSX_MAX_ROWS, available_formats, batch_sheet, detail_sheets, estimate, file_name, monte_carlo_sheet, portfolio_sheets, to_bytes
+from calibration import fit_many, read_histories, summary as calibration_summary
+from portfolio import IC_COST_COLUMNS, CashPool, Intercompany, Portfolio, evaluate as evaluate_portfolio
 
 # ==========================================
 # 0. HILFSFUNKTIONEN & LOGIN
 # ==========================================
 
-def safe_float(value, default=0.0):
-    try:
-        if value is None or (isinstance(value, str) and not value.strip()) or pd.isna(value): 
-            return default
-        return float(value)
-    except: 
-        return default
-
 def check_password():
     if "password_correct" not in st.session_state:
         st.session_state["password_correct"] = False
@@ -33,6 +35,7 @@ def check_password():
         if st.button("Anmelden", type="primary"):
             if user == "admin" and pwd == "123":
                 st.session_state["password_correct"] = True
+                st.session_state["user"] = user
                 st.rerun()
             else:
                 st.error("Zugangsdaten falsch.")
@@ -87,47 +90,67 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 st.sidebar.success("Eingeloggt als Admin")
+# Profiling nur für Admins: Tracer je Session, Auswertung am Ende des Reruns (Abschnitt 6)
+is_admin = st.session_state.get("user") == "admin"
+if "tracer" not in st.session_state: st.session_state["tracer"] = Tracer()
+tracer = st.session_state["tracer"]
+profiling_on = is_admin and st.sidebar.toggle("⏱️ Profiling", key="profiling_on")
+profiling_panel = st.sidebar.container()
+if profiling_on: tracer.begin_run()
+with st.sidebar.expander("⚡ Ergebnis-Cache"):
+    cache_stats = RESULT_CACHE.stats()
+    st.caption(f"Treffer {cache_stats['hits'] + cache_stats['disk_hits']} · Fehlzugriffe {cache_stats['misses']} · Verdrängt {cache_stats['evictions']}"
+               + (f" · Disk-Fehler {cache_stats['disk_errors']} (nur Speicher)" if cache_stats["disk_errors"] else ""))
+    st.caption(f"{cache_stats['entries']} Einträge · {cache_stats['bytes'] / 2**20:,.1f} MB · Trefferquote {cache_stats['hit_rate']:.0%}")
+    if st.button("🧹 Cache leeren"): RESULT_CACHE.clear()
+jobs_panel = st.sidebar.container()
 
 # ==========================================
 # 1. CONFIG & STATE
 # ==========================================
 
-DEFAULTS = {
-    # Markt (Basis)
-    "sam": 50000.0, "cap_pct": 5.0, "p_pct": 0.03, "q_pct": 0.38, "churn": 5.0,
-    
-    # ARPU Steuerung
-    "use_manual_arpu": False,
-    "manual_arpu_val": 1500.0,
-    
-    # ROA Strategie Defaults
-    "roa_std_p_min": 0.005, "roa_std_p_max": 0.010,
-    "roa_std_q_min": 0.150, "roa_std_q_max": 0.250,
-    "roa_std_c_min": 0.030, "roa_std_c_max": 0.050,
-    
-    "roa_fight_p_min": 0.030, "roa_fight_p_max": 0.050,
-    "roa_fight_q_min": 0.200, "roa_fight_q_max": 0.300,
-    "roa_fight_c_min": 0.080, "roa_fight_c_max": 0.120,
-    "roa_fight_discount": 25.0,
-
-    # Finanzierung
-    "equity": 50000.0, "loan_initial": 0.0, "min_cash": 10000.0, "loan_rate": 5.0,
-    # Personal
-    "wage_inc": 2.0, "inflation": 2.0, "lnk_pct": 25.0, "target_rev_per_fte": 120000.0,
-    # Ops
-    "tax_rate": 25.0, "dso": 30, "dpo": 30, "cac": 250.0,
-    "capex_annual": 2000, "depreciation_misc": 5,
-    # Hardware Preise
-    "price_laptop": 1500, "ul_laptop": 3,
-    "price_phone": 800, "ul_phone": 2,
-    "price_car": 35000, "ul_car": 6,
-    "price_truck": 50000, "ul_truck": 8,
-    "price_desk": 1000, "ul_desk": 10,
-}
-
 for k, v in DEFAULTS.items():
     if k not in st.session_state: st.session_state[k] = v
 
+# Hintergrund-Jobs: Handles je Session; fertige Ergebnisse beim nächsten Rerun in den State übernehmen
+if "session_id" not in st.session_state: st.session_state["session_id"] = uuid.uuid4().hex
+if "jobs" not in st.session_state: st.session_state["jobs"] = {}
+session_jobs = st.session_state["jobs"]
+JOBS.evict()  # TTL bei jedem Rerun durchsetzen, nicht erst beim nächsten submit()
+for job in list(session_jobs.values()):
+    if job.status == EXPIRED: del session_jobs[job.id]
+    elif job.status == DONE and not job.picked_up and job.meta.get("state_key"):
+        st.session_state[job.meta["state_key"]] = job.result; job.picked_up = True
+
+def start_job(submit, fn, *args, **kwargs):
+    """Job im gemeinsamen Pool starten und das Handle in der Session ablegen."""
+    try: job = submit(fn, *args, owner=st.session_state["session_id"], **kwargs)
+    except RuntimeError as e:
+        st.error(str(e)); return None
+    session_jobs[job.id] = job
+    return job
+
+def job_notice(state_key):
+    # Status des letzten Jobs für state_key an der Stelle, an der sein Ergebnis angezeigt wird
+    job = max((j for j in session_jobs.values() if j.meta.get("state_key") == state_key), key=lambda j: j.id, default=None)
+    if job is None: return
+    if not job.done: st.info(f"{job.label} läuft im Hintergrund (Fortschritt unter ⏳ Hintergrund-Jobs) ...")
+    elif job.status == FAILED: st.error(f"{job.label} fehlgeschlagen: {job.error}")
+    elif job.status == CANCELLED: st.warning(f"{job.label} abgebrochen")
+
+def export_button(sheets, base, key):
+    """Format wählen und Umfang anzeigen; die Datei entsteht erst beim Klick, blockweise und ohne Session-Zugriff."""
+    formats = available_formats()
+    e1, e2 = st.columns([1, 2])
+    fmt = e1.selectbox("Format", formats, format_func=lambda f: FORMATS[f][0], key=f"{key}_fmt")
+    options = {"sep": ";", "decimal": ",", "encoding": "utf-8-sig"} if fmt == "csv" and e1.checkbox("Deutsches Excel (; und ,)", key=f"{key}_de") else {}
+    rows, size = estimate(sheets, fmt)
+    name, mime = file_name(base, sheets, fmt)
+    e2.caption(f"{len(sheets)} {'Tabelle' if len(sheets) == 1 else 'Tabellen'} · {rows:,} Zeilen · ca. " + (f"{size / 2**20:,.1f} MB" if size >= 2**20 else f"{size / 2**10:,.0f} KB")
+               + (f" · Blätter über {XLSX_MAX_ROWS:,} Zeilen werden geteilt" if fmt == "xlsx" and max(s.rows for s in sheets) > XLSX_MAX_ROWS else "")
+               + ("" if "xlsx" in formats else " · Excel braucht openpyxl"))
+    e2.download_button(f"⬇️ {name}", lambda: to_bytes(sheets, fmt, **options), name, mime, key=f"{key}_dl")
+
 # Tabellen Init
 if "current_jobs_df" not in st.session_state:
     roles = [
@@ -152,108 +175,6 @@ if "cost_centers_df" not in st.session_state:
         {"Kostenstelle": "Logistik", "Grundwert Jahr 1 (€)": 0, "Umsatz-Kopplung (%)": 5},
     ])
 
-# ==========================================
-# 2. PDF GENERATOR
-# ==========================================
-class PDFReport(FPDF):
-    def fix_text(self, text):
-        if isinstance(text, (int, float)): return str(text)
-        if text is None: return ""
-        text = str(text).replace("€", "EUR").replace("ä", "ae").replace("ö", "oe").replace("ü", "ue").replace("ß", "ss")
-        return text.encode('latin-1', 'replace').decode('latin-1')
-
-    def header(self):
-        self.set_font('Arial', 'B', 16); self.set_text_color(44, 62, 80)
-        self.cell(0, 10, self.fix_text('Business Plan & Finanzmodell'), 0, 1, 'L')
-        self.set_font('Arial', 'I', 9); self.set_text_color(100, 100, 100)
-        self.cell(0, 5, self.fix_text(f'Generiert am: {datetime.now().strftime("%d.%m.%Y")}'), 0, 1, 'L')
-        self.set_draw_color(200, 200, 200); self.line(10, 25, 287, 25); self.ln(10)
-
-    def footer(self):
-        self.set_y(-15); self.set_font('Arial', 'I', 8); self.set_text_color(128, 128, 128)
-        self.cell(0, 10, self.fix_text(f'Seite {self.page_no()}/{{nb}}'), 0, 0, 'C')
-
-    def section_title(self, title):
-        self.set_font('Arial', 'B', 14); self.set_text_color(0, 51, 102); self.set_fill_color(230, 240, 255)
-        self.cell(0, 10, self.fix_text(title), 0, 1, 'L', 1); self.ln(4)
-
-    def sub_title(self, title):
-        self.set_font('Arial', 'B', 11); self.set_text_color(0, 0, 0)
-        self.cell(0, 8, self.fix_text(title), 0, 1, 'L')
-
-    def add_key_value_table(self, data_dict, title="Parameter"):
-        self.sub_title(title); self.set_font('Arial', '', 9)
-        col_width = 80; row_height = 6
-        for k, v in data_dict.items():
-            self.set_font('Arial', 'B', 9); self.cell(col_width, row_height, self.fix_text(str(k)), 1)
-            self.set_font('Arial', '', 9)
-            val = f"{v:,.2f}" if isinstance(v, float) else str(v)
-            self.cell(col_width, row_height, self.fix_text(val), 1); self.ln()
-        self.ln(5)
-
-    def add_dataframe_table(self, df, col_widths=None):
-        self.set_font('Arial', 'B', 8); self.set_fill_color(240, 240, 240)
-        if not col_widths: col_width = 277 / len(df.columns); widths = [col_width] * len(df.columns)
-        else: widths = col_widths
-        for i, col in enumerate(df.columns): self.cell(widths[i], 7, self.fix_text(str(col)), 1, 0, 'C', 1)
-        self.ln(); self.set_font('Arial', '', 8)
-        for _, row in df.iterrows():
-            for i, col in enumerate(df.columns):
-                val = row[col]; txt = f"{val:,.0f}" if isinstance(val, (int, float)) else str(val)
-                self.cell(widths[i], 6, self.fix_text(txt), 1, 0, 'R' if isinstance(val, (int, float)) else 'L')
-            self.ln()
-        self.ln(5)
-
-    def add_chart(self, fig):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-            fig.savefig(tmpfile.name, dpi=150, bbox_inches='tight')
-            self.image(tmpfile.name, x=30, w=230)
-        self.ln(5)
-
-def create_detailed_pdf(df_results, session_data, jobs_data, products_data, cc_data, title_prefix=""):
-    pdf = PDFReport(orientation='L', unit='mm', format='A4'); pdf.alias_nb_pages()
-    
-    pdf.add_page(); pdf.section_title(f"1. Management Summary {title_prefix}")
-    if not df_results.empty:
-        last = df_results.iloc[-1]
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, pdf.fix_text(f"Jahr 10: Umsatz {last['Umsatz']:,.0f} EUR | EBITDA {last['EBITDA']:,.0f} EUR | Cash {last['Kasse']:,.0f} EUR"), 0, 1); pdf.ln(5)
-        fig1, ax1 = plt.subplots(figsize=(10, 4))
-        ax1.plot(df_results["Jahr"], df_results["Umsatz"], label="Umsatz", marker='o')
-        ax1.plot(df_results["Jahr"], df_results["Gesamtkosten (OPEX)"]+df_results["Wareneinsatz (COGS)"], label="Kosten", linestyle='--', color='red')
-        ax1.bar(df_results["Jahr"], df_results["EBITDA"], label="EBITDA", alpha=0.3, color='green')
-        ax1.legend(); ax1.grid(True, alpha=0.3); pdf.add_chart(fig1); plt.close(fig1)
-
-    pdf.add_page(); pdf.section_title("2. Eingaben")
-    pdf.add_key_value_table({
-        "SAM": session_data.get("sam"), "Marktanteil Ziel": session_data.get("cap_pct"),
-        "Equity": session_data.get("equity"), "Min Cash": session_data.get("min_cash")
-    }, "Markt & Finanz")
-    if jobs_data is not None: pdf.sub_title("Personal"); pdf.add_dataframe_table(jobs_data[["Job Titel", "Jahresgehalt (€)", "FTE Jahr 1"]].head(10))
-    if products_data is not None: pdf.sub_title("Produkte"); pdf.add_dataframe_table(products_data[["Produkt", "Preis (€)", "Herstellungskosten (COGS €)"]])
-
-    pdf.add_page(); pdf.section_title("3. GuV")
-    cols = ["Jahr", "Umsatz", "Wareneinsatz (COGS)", "Gesamtkosten (OPEX)", "EBITDA", "Abschreibungen", "EBIT", "Steuern", "Jahresüberschuss"]
-    exist = [c for c in cols if c in df_results.columns]; widths = [15] + [30]*(len(exist)-1)
-    pdf.add_dataframe_table(df_results[exist], col_widths=widths)
-    
-    pdf.add_page(); pdf.section_title("4. Cashflow & Bilanz")
-    cols_cf = ["Jahr", "Jahresüberschuss", "Investitionen (Assets)", "Kreditaufnahme", "Tilgung", "Net Cash Change", "Kasse"]
-    exist_cf = [c for c in cols_cf if c in df_results.columns]
-    pdf.add_dataframe_table(df_results[exist_cf])
-    
-    pdf.ln(5)
-    cols_bil = ["Jahr", "Eigenkapital", "Bankdarlehen", "Verb. LL", "Summe Passiva"]
-    exist_bil = [c for c in cols_bil if c in df_results.columns]
-    if exist_bil: pdf.sub_title("Bilanz Passiva"); pdf.add_dataframe_table(df_results[exist_bil])
-
-    fig2, ax2 = plt.subplots(figsize=(10, 3.5))
-    ax2.fill_between(df_results["Jahr"], df_results["Kasse"], color="skyblue", alpha=0.4, label="Kasse")
-    ax2.plot(df_results["Jahr"], df_results["Bankdarlehen"], color="red", linestyle="--", label="Kredit")
-    ax2.legend(); pdf.add_chart(fig2); plt.close(fig2)
-
-    return pdf.output(dest='S').encode('latin-1', 'replace')
-
 # ==========================================
 # 3. UI LAYOUT
 # ==========================================
@@ -266,30 +187,82 @@ with col_top1:
 # Import/Export
 with st.expander("📂 Import / Export", expanded=False):
     c1, c2 = st.columns(2)
-    with c1:
+    with c1, span("ui.export_config"):
+        # Serialisiert wird erst beim Klick (ohne Session-Zugriff) -> Werte und Tabellen jetzt einsammeln
         config = {k: st.session_state[k] for k in DEFAULTS}
-        if "current_jobs_df" in st.session_state:
-            df = pd.DataFrame(st.session_state["current_jobs_df"])
-            for c in ["Laptop", "Smartphone", "Auto", "LKW", "Büro"]: 
-                if c in df.columns: df[c] = df[c].apply(bool)
-            config["jobs"] = df.to_dict('records')
-        if "products_df" in st.session_state: config["prod"] = pd.DataFrame(st.session_state["products_df"]).to_dict('records')
-        if "cost_centers_df" in st.session_state: config["cc"] = pd.DataFrame(st.session_state["cost_centers_df"]).to_dict('records')
-        st.download_button("JSON Speichern", json.dumps(config, indent=2), "config.json")
+        config_tables = {key: st.session_state[state_key] for key, state_key in (("jobs", "current_jobs_df"), ("prod", "products_df"), ("cc", "cost_centers_df")) if state_key in st.session_state}
+        def config_json(config=config, tables=config_tables):
+            config = dict(config)
+            for key, table in tables.items():
+                df = pd.DataFrame(table)
+                if key == "jobs":
+                    for c in ["Laptop", "Smartphone", "Auto", "LKW", "Büro"]:
+                        if c in df.columns: df[c] = df[c].apply(bool)
+                config[key] = df.to_dict('records')
+            return json.dumps(config, indent=2)
+        st.download_button("JSON Speichern", config_json, "config.json", "application/json")
     with c2:
         up = st.file_uploader("JSON Laden", type=["json"])
         if up and st.button("Importieren"):
             d = json.load(up)
             for k,v in d.items(): 
                 if k in DEFAULTS: st.session_state[k] = v
-            if "jobs" in d: st.session_state["current_jobs_df"] = pd.DataFrame(d["jobs"])
-            if "prod" in d: st.session_state["products_df"] = pd.DataFrame(d["prod"])
-            if "cc" in d: st.session_state["cost_centers_df"] = pd.DataFrame(d["cc"])
+            # Tabellen einmal typisieren (wie beim Bulk-Import) statt Objekt-Spalten; Zeilen außerhalb der Prüfregeln
+            # bleiben erhalten (die Engine hat sie schon immer gelesen) und werden nur als Fehlerliste gezeigt
+            for json_key, table, state_key in (("jobs", "jobs", "current_jobs_df"), ("prod", "products", "products_df"), ("cc", "cost_centers", "cost_centers_df")):
+                if json_key in d:
+                    res = read_records(d[json_key], table, keep_invalid=True)
+                    st.session_state[state_key] = res.table; st.session_state[f"bulk_result_{table}"] = res
+                    st.session_state.pop(f"bulk_existing_{table}", None)
             st.rerun()
 
+# Große Tabellen nur als Vorschau: der Data-Editor schickt bei jeder Änderung die ganze Tabelle hin und her
+EDITOR_MAX_ROWS = 2000
+
+def table_editor(table, state_key, editor_key):
+    df = st.session_state[state_key]
+    with span(f"ui.data_editor.{table}"):
+        if len(df) > EDITOR_MAX_ROWS:
+            st.caption(f"{len(df):,} Zeilen ({df.memory_usage(deep=True).sum() / 2**20:,.1f} MB) – Vorschau der ersten {EDITOR_MAX_ROWS:,}, Änderungen über den Bulk-Import")
+            st.dataframe(df.head(EDITOR_MAX_ROWS), use_container_width=True)
+        else:
+            # Kategorien als Text editierbar machen (neue Titel erlaubt)
+            editable = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+            st.session_state[state_key] = st.data_editor(editable, num_rows="dynamic", use_container_width=True, key=editor_key)
+
+def bulk_import(table, state_key, editor_key):
+    with st.expander("📥 Bulk-Import (CSV / Parquet)"):
+        up = st.file_uploader("Datei (CSV mit , oder ; getrennt, Parquet)", type=["csv", "parquet"], key=f"bulk_file_{table}")
+        mode = st.radio("Modus", ["Ersetzen", "Anhängen"], horizontal=True, key=f"bulk_mode_{table}")
+        if up and st.button("Importieren", key=f"bulk_btn_{table}"):
+            with span(f"ui.bulk_import.{table}"):
+                res = read_table(up, table)
+                existing = None
+                if mode == "Anhängen":
+                    # Vorhandene Zeilen nicht erneut filtern: übernehmen, Verstöße gegen die Prüfregeln nur melden
+                    existing = read_records(pd.DataFrame(st.session_state[state_key]).to_dict("records"), table, keep_invalid=True)
+                    res.table = typed(pd.concat([existing.table, res.table], ignore_index=True), table)
+            st.session_state[state_key] = res.table; st.session_state[f"bulk_result_{table}"] = res
+            st.session_state[f"bulk_existing_{table}"] = existing
+            st.session_state.pop(editor_key, None)  # Editor-Änderungen der alten Tabelle verwerfen
+            st.rerun()
+        res = st.session_state.get(f"bulk_result_{table}")
+        if res is not None:
+            st.caption(f"Letzter Import: {res.rows:,} Zeilen in {res.seconds:.2f} s · {res.bad_rows:,} fehlerhafte Zeilen "
+                       + ("übernommen (wie von der Engine gelesen)" if res.kept_invalid else "verworfen"))
+            if res.missing_columns: st.warning("Fehlende Spalten (Standardwerte): " + ", ".join(res.missing_columns))
+            if res.ignored_columns: st.caption("Ignorierte Spalten: " + ", ".join(res.ignored_columns))
+            if len(res.errors):
+                st.dataframe(res.errors, use_container_width=True, hide_index=True)
+                st.download_button("Fehlerliste (CSV)", res.errors.to_csv(index=False), f"importfehler_{table}.csv", key=f"bulk_err_{table}")
+        existing = st.session_state.get(f"bulk_existing_{table}")
+        if existing is not None and existing.bad_rows:
+            st.warning(f"{existing.bad_rows:,} bereits vorhandene Zeilen verletzen die Prüfregeln und wurden unverändert übernommen:")
+            st.dataframe(existing.errors, use_container_width=True, hide_index=True)
+
 # Tabs
-tab_input, tab_strat, tab_prod, tab_assets, tab_jobs, tab_cc, tab_dash, tab_guv, tab_cf, tab_bilanz = st.tabs([
-    "Markt", "Strategien", "Produkte", "Assets", "Personal", "Kostenstellen", "Dashboard", "GuV", "Cashflow", "Bilanz"
+tab_input, tab_strat, tab_prod, tab_assets, tab_jobs, tab_cc, tab_dash, tab_guv, tab_cf, tab_bilanz, tab_solve, tab_store, tab_group = st.tabs([
+    "Markt", "Strategien", "Produkte", "Assets", "Personal", "Kostenstellen", "Dashboard", "GuV", "Cashflow", "Bilanz", "Zielwertsuche", "Szenarien", "Konzern"
 ])
 
 # --- TAB INHALTE ---
@@ -299,6 +272,8 @@ with tab_input:
     with c1:
         st.number_input("SAM (Gesamtmarkt)", step=1000.0, key="sam")
         st.number_input("Churn Rate %", step=0.5, key="churn")
+        st.number_input("Planungshorizont (Jahre)", min_value=1, max_value=MAX_HORIZON_YEARS, step=1, key="horizon_years")
+        st.selectbox("Granularität", list(PERIODS_PER_YEAR), format_func=PERIODS_PER_YEAR.get, key="periods_per_year")
         
     with c2:
         st.subheader("Finanzierung")
@@ -306,6 +281,7 @@ with tab_input:
         st.number_input("Mindest-Cash (€)", step=1000.0, key="min_cash")
         st.number_input("Start-Kredit (€)", step=5000.0, key="loan_initial")
         st.number_input("Kredit-Zins %", step=0.1, key="loan_rate")
+        st.number_input("Diskontsatz NPV (WACC) %", step=0.5, key="wacc")
         st.markdown("---")
         st.number_input("Steuersatz %", step=1.0, key="tax_rate")
         st.number_input("Lohnsteigerung %", step=0.1, key="wage_inc")
@@ -355,13 +331,48 @@ with tab_strat:
         
         st.number_input("Fighter Preis-Discount (%)", step=1.0, key="roa_fight_discount")
 
+    with st.expander("📈 Kalibrierung aus Kundenhistorie"):
+        st.caption("CSV mit einer Spalte je Produktlinie und einer Zeile je Periode (Kundenstand). Der Startbestand wird mitgeschätzt; "
+                   "das Modell selbst startet mit dem festen Anfangsbestand der Engine. Churn ist aus der Historie allein nicht von p, q und "
+                   "Marktpotenzial zu trennen und wird deshalb vorgegeben (z. B. aus Kündigungsdaten).")
+        k1, k2, k3 = st.columns([2, 1, 1])
+        calib_file = k1.file_uploader("Kundenhistorie (CSV)", type=["csv", "txt"], key="calib_file")
+        calib_f = k2.selectbox("Perioden der Historie", list(PERIODS_PER_YEAR), index=list(PERIODS_PER_YEAR).index(12), format_func=PERIODS_PER_YEAR.get, key="calib_ppy")
+        calib_churn = k3.number_input("Churn der Historie % p.a.", min_value=0.0, max_value=100.0, value=float(st.session_state["churn"]), step=0.5, key="calib_churn")
+        if calib_file and st.button("📐 Kalibrieren"):
+            try: histories = read_histories(calib_file.getvalue())
+            except (ValueError, pd.errors.ParserError) as e: st.error(f"Lesen fehlgeschlagen: {e}")
+            else:
+                st.session_state.pop("calib_fits", None)
+                start_job(JOBS.submit, fit_many, histories, calib_churn / 100, periods_per_year=calib_f, progress_arg=None,
+                          label=f"Bass-Kalibrierung ({histories.shape[1]} Reihen)", meta={"state_key": "calib_fits"})
+        job_notice("calib_fits")
+        if "calib_fits" in st.session_state:
+            calib = st.session_state["calib_fits"]; fits = calib.fits
+            st.dataframe(calibration_summary(fits), use_container_width=True, hide_index=True)
+            st.caption(f"{len(fits)} Reihen in {calib.seconds:,.2f} s")
+            fit = {f.name: f for f in fits}[st.selectbox("Produktlinie", [f.name for f in fits], key="calib_pick")]
+            st.line_chart(pd.DataFrame({"Beobachtet": fit.observed, "Angepasst": fit.fitted}))
+            sam = float(st.session_state["sam"])
+            if fit.unidentified: st.warning(f"{', '.join(fit.unidentified)} aus dieser Historie nicht identifizierbar: kein Konfidenzintervall, keine ROA Ranges")
+            elif fit.ci["m"][1] > sam: st.warning("Obere Grenze des Marktpotenzials liegt über dem SAM")
+
+            def apply_calibration(params):
+                for key, value in params.items(): st.session_state[key] = float(value)
+            a1, a2, a3 = st.columns(3)
+            a1.button("✅ Basis Parameter übernehmen", on_click=apply_calibration, args=(fit.params(sam),), key="calib_apply")
+            ranges = {} if fit.unidentified else {name: fit.roa_ranges(sam, prefix) for name, (prefix, _) in STRATEGIES.items()}
+            a2.button("↔️ Als Ranges Standard", on_click=apply_calibration, args=(ranges.get("Standard"),), key="calib_roa_std", disabled=not ranges)
+            a3.button("↔️ Als Ranges Fighter", on_click=apply_calibration, args=(ranges.get("Fighter"),), key="calib_roa_fight", disabled=not ranges)
+
 with tab_prod:
     st.info("Produkte steuern Umsatz & COGS.")
     st.checkbox("Manuelles ARPU nutzen?", key="use_manual_arpu")
     if st.session_state["use_manual_arpu"]:
         st.number_input("Manueller ARPU (€)", step=50.0, key="manual_arpu_val")
         
-    st.session_state["products_df"] = st.data_editor(st.session_state["products_df"], num_rows="dynamic", use_container_width=True, key="ed_prod")
+    bulk_import("products", "products_df", "ed_prod")
+    table_editor("products", "products_df", "ed_prod")
 
 with tab_assets:
     c1, c2, c3 = st.columns(3)
@@ -377,97 +388,371 @@ with tab_assets:
 
 with tab_jobs:
     st.number_input("Ziel-Umsatz pro FTE", step=5000.0, key="target_rev_per_fte")
-    st.session_state["current_jobs_df"] = st.data_editor(st.session_state["current_jobs_df"], num_rows="dynamic", use_container_width=True, key="ed_jobs")
+    bulk_import("jobs", "current_jobs_df", "ed_jobs")
+    table_editor("jobs", "current_jobs_df", "ed_jobs")
 
 with tab_cc:
     st.info("Gemeinkosten & Variable Kostenstellen")
-    st.session_state["cost_centers_df"] = st.data_editor(st.session_state["cost_centers_df"], num_rows="dynamic", use_container_width=True, key="ed_cc")
+    bulk_import("cost_centers", "cost_centers_df", "ed_cc")
+    table_editor("cost_centers", "cost_centers_df", "ed_cc")
 
 # ==========================================
-# 4. BERECHNUNGSLOGIK
+# 4. BERECHNUNGSLOGIK (Engine in engine.py)
 # ==========================================
 
-def calculate_scenario(p_input, q_input, market_share_input, discount_pct=0.0):
-    if st.session_state.get("use_manual_arpu", False):
-        base_arpu = st.session_state.get("manual_arpu_val", 1500.0)
-        prods = pd.DataFrame(st.session_state["products_df"]).to_dict('records')
-        w_arpu, w_cogs = 0.0, 0.0
-        has_prod = False
-        for p in prods:
-            pr = safe_float(p.get("Preis (€)"))
-            if pr > 0:
-                has_prod = True
-                c = safe_float(p.get("Herstellungskosten (COGS €)"))
-                w_arpu += pr; w_cogs += c 
-        base_cogs_ratio = (w_cogs/w_arpu) if (has_prod and w_arpu > 0) else 0.15
+def current_inputs():
+    return ModelInputs.build(st.session_state, st.session_state["current_jobs_df"], st.session_state["products_df"], st.session_state["cost_centers_df"])
+
+def calculate_scenario(p_input, q_input, market_share_input, discount_pct=0.0, inputs=None):
+    return cached_calculate(inputs or current_inputs(), p_input, q_input, market_share_input, discount_pct).annual().to_frame()
+
+# Haupt-Szenario: Cache zuerst, sonst inkrementell (nur geänderte Stufen) über die Session-Engine
+with span("calc.inputs"): inputs = current_inputs()
+if "inc_engine" not in st.session_state: st.session_state["inc_engine"] = IncrementalEngine()
+inc_engine = st.session_state["inc_engine"]
+main_args = (st.session_state["p_pct"], st.session_state["q_pct"], st.session_state["cap_pct"] / 100, 0.0)
+main_key = scenario_key("calculate", inputs, *main_args)
+with span("calc.main"):
+    main_result = RESULT_CACHE.get(main_key); main_cached = main_result is not None
+    if not main_cached:
+        main_result = inc_engine.run(inputs, *main_args).scenario(0); RESULT_CACHE.put(main_key, main_result)
+# DataFrames erst hier an der UI-Grenze: Perioden-Detail + Jahresverdichtung für GuV/Cashflow/Bilanz und PDF
+df_periods = main_result.to_frame()
+df_res = main_result.annual().to_frame()
+last_year = int(df_res["Jahr"].iloc[-1])
+
+with st.sidebar.expander("🧩 Rechenstufen (letzter Lauf)"):
+    # Bei Cache-Treffer lief keine Stufe; last_run gehört dann zu einer früheren Rechnung
+    if main_cached: st.caption("📦 Ergebnis aus Cache: keine Stufe gerechnet")
     else:
-        prods = pd.DataFrame(st.session_state["products_df"]).to_dict('records')
-        w_arpu, w_cogs = 0.0, 0.0
-        has_prod = False
-        for p in prods:
-            pr = safe_float(p.get("Preis (€)"))
-            if pr > 0:
-                has_prod = True
-                c = safe_float(p.get("Herstellungskosten (COGS €)"))
-                take = safe_float(p.get("Take Rate (%)"))/100
-                months = safe_float(p.get("Wiederkauf alle (Monate)"))
-                rep = safe_float(p.get("Wiederkauf Rate (%)"))/100
-                freq = 1.0
-                if months > 0:
-                    cycles = 12.0/months
-                    freq = 1.0 + (rep * (cycles - 1)) if cycles >= 1 else 1.0
-                w_arpu += pr*take*freq
-                w_cogs += c*take*freq
-        
-        base_arpu = w_arpu if has_prod and w_arpu > 0 else 1500.0
-        base_cogs_ratio = (w_cogs/w_arpu) if (has_prod and w_arpu > 0) else 0.15
-    
-    calc_arpu = base_arpu * (1 - (discount_pct / 100.0))
-    abs_cogs_per_customer = base_arpu * base_cogs_ratio
-    
-    P = p_input; Q = q_input; market_pot = st.session_state["sam"] * market_share_input; N_start = 10.0
-    n_prev = N_start; debt = st.session_state["loan_initial"]; cash = st.session_state["equity"]
-    loss_carry = 0.0; retained = 0.0; fixed_assets = 0.0; results = []; prev_cc = {}
-    asset_reg = {"Laptop":[], "Smartphone":[], "Auto":[], "LKW":[], "Büro":[], "Misc":[]}
-    as_conf = {"Laptop": ("price_laptop", "ul_laptop"), "Smartphone": ("price_phone", "ul_phone"), "Auto": ("price_car", "ul_car"), "LKW": ("price_truck", "ul_truck"), "Büro": ("price_desk", "ul_desk")}
-    jobs = pd.DataFrame(st.session_state["current_jobs_df"]).to_dict('records')
-    ccs = pd.DataFrame(st.session_state["cost_centers_df"]).to_dict('records')
-
-    for t in range(1, 11):
-        row = {"Jahr": t}
-        if t == 1: n_t = N_start
-        else:
-            M = market_pot
-            if M > 0: adoption = P * (M - n_prev) + Q * (n_prev/M) * (M - n_prev)
-            else: adoption = 0
-            n_t = n_prev * (1 - st.session_state["churn"]/100) + adoption
-            n_t = min(n_t, M)
-        
-        row["Kunden"] = n_t
-        rev = n_t * calc_arpu
-        row["Umsatz"] = rev
-        prev_rev = results[-1]["Umsatz"] if t > 1 else rev
-        growth = (rev - prev_rev)/prev_rev if t > 1 and prev_rev > 0 else 0.0
-        
-        cogs = n_t * abs_cogs_per_customer
-        row["Wareneinsatz (COGS)"] = cogs
-        
-        wage_idx = (1 + st.session_state["wage_inc"]/100)**(t-1)
-        pers_cost = 0.0
-        hw_needs = {k: 0.0 for k in as_conf}
-        base_ftes = sum(safe_float(j.get("FTE Jahr 1")) for j in jobs)
-        target_fte = rev / st.session_state["target_rev_per_fte"] if st.session_state["target_rev_per_fte"] > 0 else 0
-        curr_total_fte = 0
-        for j in jobs:
-            base = safe_float(j.get("FTE Jahr 1"))
-            sal = safe_float(j.get("Jahresgehalt (€)"))
-            fte = max(base, target_fte * (base/base_ftes)) if base_ftes > 0 else 0
-            curr_total_fte += fte
-            pers_cost += sal * fte * wage_idx * (1 + st.session_state["lnk_pct"]/100)
-            for hw in hw_needs:
-                if j.get(hw): hw_needs[hw] += fte
-        row["Personalkosten"] = pers_cost; row["FTE Total"] = curr_total_fte
-        
-        cc_sum = 0.0
-        for c in ccs:
-            nm = c.get("Kostenstelle"); base = safe_float(c.get("Grundwert Jahr
+        for stage, status in inc_engine.last_run.items():
+            st.caption(f"{'♻️' if status == 'reused' else '⚙️'} {stage}: {'wiederverwendet' if status == 'reused' else 'neu berechnet'}")
+
+# ==========================================
+# 5. ERGEBNIS TABS
+# ==========================================
+
+with tab_dash:
+    last = df_res.iloc[-1]
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric(f"Umsatz Jahr {last_year}", f"{last['Umsatz']:,.0f} €")
+    k2.metric(f"EBITDA Jahr {last_year}", f"{last['EBITDA']:,.0f} €")
+    k3.metric(f"Kasse Jahr {last_year}", f"{last['Kasse']:,.0f} €")
+    k4.metric(f"FTE Jahr {last_year}", f"{last['FTE Total']:,.1f}")
+    st.line_chart(df_res.set_index("Jahr")[["Umsatz", "EBITDA", "Kasse"]])
+
+    st.subheader("Strategie-Vergleich (Gitter über die ROA Ranges)")
+    grid_steps = st.slider("Gitterpunkte je Parameter", 2, 20, 5)
+    # Gitter einmal je Rerun (Jahreswerte aus dem Cache); Vergleich, Export und Szenario-Speicher nutzen dieselben Argumente
+    strategy_grids = {name: strategy_grid(inputs, name, grid_steps) for name in STRATEGIES}
+    median_cash, summary = {}, []
+    for name, grid_args in strategy_grids.items():
+        with span("calc.strategy_grid", strategy=name, steps=grid_steps): batch = cached_calculate_batch(inputs, *grid_args, annual=True)
+        median_cash[name] = np.median(batch.metric("Kasse"), axis=0)
+        for col in ("Umsatz", "EBITDA", "Bankdarlehen"):
+            p5, p50, p95 = np.percentile(batch.metric(col)[:, -1], [5, 50, 95])
+            summary.append({"Strategie": name, "Kennzahl": f"{col} Jahr {last_year}", "P5": p5, "P50": p50, "P95": p95})
+    st.caption(f"{len(batch):,} Szenarien je Strategie")
+    st.dataframe(pd.DataFrame(summary).style.format("{:,.0f}", subset=["P5", "P50", "P95"]), use_container_width=True, hide_index=True)
+    st.line_chart(pd.DataFrame(median_cash, index=df_res["Jahr"]))
+
+    st.divider()
+    st.subheader("Export")
+    export_scope = st.radio("Umfang", ["Haupt-Szenario", "Strategie-Gitter"], horizontal=True, key="export_scope",
+                            help="Haupt-Szenario: GuV, Cashflow, Bilanz, Perioden, FTE je Rolle, Anlagenregister · Gitter: alle Szenarien beider Strategien")
+    if export_scope == "Haupt-Szenario": export_button(detail_sheets(inputs, *main_args), "finanzmodell", "export_main")
+    else:
+        export_periods = st.checkbox("Perioden statt Jahreswerte", key="export_grid_periods")
+        grid_sheets = [batch_sheet(name, cached_calculate_batch(inputs, *grid_args, annual=not export_periods), dict(zip(("p", "q", "Marktanteil", "Discount"), grid_args)))
+                       for name, grid_args in strategy_grids.items()]
+        export_button(grid_sheets, "strategie_gitter", "export_grid")
+
+    st.divider()
+    # PDFs entstehen als Hintergrund-Job; Download im Job-Panel der Sidebar
+    pdf_c1, pdf_c2 = st.columns(2)
+    if pdf_c1.button("📄 PDF Report erstellen"):
+        start_job(submit_report, create_detailed_pdf, df_res, dict(inputs.params), inputs.table("jobs"), inputs.table("products"), inputs.table("cost_centers"),
+                  label="PDF Report", meta={"file_name": "finanzmodell.pdf"})
+    if pdf_c2.button("📑 Vergleichs-PDF (Strategien + Monte Carlo)"):
+        scenarios = {"Basis": df_res, **{name: calculate_scenario(*strategy_midpoint(inputs, name), inputs=inputs) for name in STRATEGIES}}
+        start_job(submit_report, create_comparison_pdf, scenarios, dict(inputs.params), st.session_state.get("mc_results"),
+                  label="Vergleichs-PDF", meta={"file_name": "szenario_vergleich.pdf"})
+
+with tab_strat:
+    st.divider()
+    st.subheader("Monte Carlo (ROA Ranges)")
+    m1, m2 = st.columns(2)
+    with m1: mc_draws = st.number_input("Ziehungen je Strategie", min_value=1000, value=100000, step=10000)
+    with m2: mc_seed = st.number_input("Seed", value=42, step=1)
+    if st.button("🎲 Monte Carlo starten"):
+        # Prozesse je Job so begrenzen, dass alle Job-Worker zusammen die CPU-Kerne nicht überbuchen
+        start_job(JOBS.submit, run_monte_carlo, inputs, draws=int(mc_draws), seed=int(mc_seed), workers=max(1, (os.cpu_count() or 1) // JOBS.max_workers),
+                  label=f"Monte Carlo ({int(mc_draws):,} Ziehungen)", meta={"state_key": "mc_results"})
+    job_notice("mc_results")
+    if "mc_results" in st.session_state:
+        mc_res = st.session_state["mc_results"]
+        cols_mc = st.columns(len(mc_res))
+        for col, (name, r) in zip(cols_mc, mc_res.items()):
+            col.metric(f"{name}: P(Kasse < Mindest-Cash)", f"{r.breach_prob:.1%}", help=f"{r.draws:,} Ziehungen, Kasse vor Kreditaufnahme")
+        mc_metric = st.selectbox("Kennzahl", MC_METRICS)
+        st.line_chart(pd.DataFrame({f"{name} {qn}": r.quantiles[mc_metric][qn].values for name, r in mc_res.items() for qn in ("P5", "P50", "P95")}, index=df_res["Jahr"]))
+        export_button([monte_carlo_sheet(mc_res)], "monte_carlo", "export_mc")
+
+with tab_guv:
+    st.dataframe(df_res[GUV_COLS].style.format("{:,.0f}", subset=GUV_COLS[1:]), use_container_width=True, hide_index=True)
+
+with tab_cf:
+    st.dataframe(df_res[CF_COLS].style.format("{:,.0f}", subset=CF_COLS[1:]), use_container_width=True, hide_index=True)
+    if "Periode" in df_periods.columns:
+        st.subheader(f"Cash-Runway je {PERIODS_PER_YEAR[st.session_state['periods_per_year']]}")
+        st.line_chart(df_periods.set_index("Periode")[["Kasse vor Finanzierung", "Bankdarlehen"]])
+        st.caption(f"Tiefster Kassenstand vor Kreditaufnahme: {df_periods['Kasse vor Finanzierung'].min():,.0f} € (Mindest-Cash {st.session_state['min_cash']:,.0f} €)")
+        with st.expander("Perioden-Detail"):
+            st.dataframe(df_periods[["Periode"] + CF_COLS].style.format("{:,.0f}", subset=CF_COLS[1:]), use_container_width=True, hide_index=True)
+
+with tab_bilanz:
+    st.dataframe(df_res[BIL_COLS].style.format("{:,.0f}", subset=BIL_COLS[1:]), use_container_width=True, hide_index=True)
+    diff = (df_res["Summe Aktiva"] - df_res["Summe Passiva"]).abs().max()
+    if diff > 1: st.warning(f"Bilanz nicht ausgeglichen (Differenz {diff:,.0f} €)")
+
+with tab_solve:
+    st.subheader("Zielwertsuche")
+    st.caption("Sucht Eingaben in Grenzen, sodass eine Kennzahl in jedem Jahr ab dem gewählten Jahr die Bedingung erfüllt (alle Kandidaten eines Schritts in einem Batch).")
+    solve_keys = [k for k in DEFAULTS if k not in STRUCTURAL_KEYS and not isinstance(DEFAULTS[k], bool) and not k.startswith("roa_")]
+    decisions = []
+    for key in st.multiselect("Gesuchte Eingaben", solve_keys, default=["equity"], max_selections=3):
+        d1, d2, d3 = st.columns(3)
+        current = float(st.session_state[key])
+        lo = d1.number_input(f"{key} von", value=0.0, key=f"solve_lo_{key}")
+        hi = d2.number_input(f"{key} bis", value=max(10 * current, 1.0), key=f"solve_hi_{key}")
+        sense = d3.selectbox(f"{key} Ziel", ["min", "max"], format_func={"min": "möglichst klein", "max": "möglichst groß"}.get, key=f"solve_sense_{key}")
+        decisions.append(Decision(key, lo, hi, sense))
+    s1, s2, s3, s4 = st.columns(4)
+    s_metric = s1.selectbox("Kennzahl", METRICS, index=METRICS.index("Kasse vor Finanzierung"))
+    s_op = s2.selectbox("Bedingung", OPS)
+    s_target = s3.selectbox("Grenze", ["min_cash", "Fester Wert"], format_func=lambda v: "Mindest-Cash" if v == "min_cash" else v)
+    if s_target == "Fester Wert": s_target = s3.number_input("Wert", value=0.0)
+    s_from = s4.number_input("ab Jahr", min_value=1, max_value=last_year, value=1)
+
+    if decisions and st.button("🎯 Lösen"):
+        st.session_state.pop("solve_result", None)
+        start_job(JOBS.submit, solve, inputs, decisions, [Constraint(s_metric, s_op, s_target, int(s_from))], label="Zielwertsuche", meta={"state_key": "solve_result"})
+    job_notice("solve_result")
+    if "solve_result" in st.session_state:
+        sol = st.session_state["solve_result"]
+        if sol.feasible: st.success(f"Lösung gefunden (Abstand zur Grenze im schlechtesten Jahr: {sol.slack.min():,.2f})")
+        else: st.warning(f"In den Grenzen keine zulässige Lösung; geringste Verletzung {-sol.slack.min():,.0f} bei:")
+        for col, (key, value) in zip(st.columns(len(sol.solution)), sol.solution.items()):
+            col.metric(key, f"{value:,.2f}", delta=f"{value - float(st.session_state[key]):,.2f}")
+        st.caption(f"{sol.evaluations:,} Szenarien in {sol.engine_calls} Engine-Aufrufen · {sol.steps} Schritte · {sol.seconds:.3f} s")
+
+        def apply_solution(solution):
+            for key, value in solution.items():
+                st.session_state[key] = int(round(value)) if isinstance(DEFAULTS.get(key), int) else value
+        if sol.feasible: st.button("✅ Lösung übernehmen", on_click=apply_solution, args=(sol.solution,))
+
+# Lesezugriffe auf den Speicher je Speicherstand gecacht: Reruns ohne Schreibzugriff fragen SQLite nicht erneut
+@st.cache_data(max_entries=256, show_spinner=False)
+def store_read(path, version, method, *args):
+    with span(f"store.{method}"): return getattr(default_store(), method)(*args)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def store_find(path, version, digest, args, _inputs):
+    return default_store().find(_inputs, *args)
+
+def configured_store_path():
+    # Pfad aus .streamlit/secrets.toml (store_path); FINMOD_STORE hat Vorrang
+    try: return st.secrets.get("store_path")
+    except FileNotFoundError: return None
+
+with tab_store:
+    # Gespeicherte Szenarien: Laden ist eine Abfrage (Konfiguration + Jahreswerte), keine Neuberechnung
+    store = default_store(configured_store_path())
+    store_version = store.version()
+    st.subheader("Szenario-Speicher")
+    st.caption(f"{store.path} · {store_read(store.path, store_version, 'stats')['scenarios']:,} Szenarien · Pfad über FINMOD_STORE oder store_path in secrets.toml")
+    sv1, sv2, sv3 = st.columns([2, 1, 1])
+    store_name = sv1.text_input("Name", value="Basis", key="store_name")
+    store_tag = sv2.text_input("Tag", value="", key="store_tag")
+    known = store_find(store.path, store_version, inputs.digest, tuple(map(float, main_args)), inputs)
+    if known: sv3.caption(f"Gleiches Ergebnis bereits gespeichert (#{known})")
+    if sv3.button("💾 Speichern"):
+        st.success(f"Gespeichert als #{store.save(store_name, inputs, main_result, *main_args, tag=store_tag)}")
+    sb1, sb2 = st.columns(2)
+    if sb1.button("💾 Strategie-Gitter speichern"):
+        with span("store.save_grid"):
+            for name, grid_args in strategy_grids.items():
+                store.save_batch(f"{store_name} {name}", inputs, cached_calculate_batch(inputs, *grid_args), *grid_args, tag=f"grid:{name}")
+        st.success(f"{len(STRATEGIES)} × {grid_steps ** 3:,} Szenarien gespeichert")
+    if "mc_results" in st.session_state and sb2.button("💾 Monte Carlo speichern"):
+        st.success(f"{len(store.save_monte_carlo(store_name, inputs, st.session_state['mc_results']))} Perzentil-Szenarien gespeichert")
+    store_version = store.version()  # nach dem Speichern in diesem Rerun -> Liste und Abfrage aktuell
+
+    st.divider()
+    f1, f2 = st.columns(2)
+    filter_name = f1.text_input("Filter Name (% als Platzhalter)", key="store_filter_name") or None
+    filter_tag = f2.text_input("Filter Tag", key="store_filter_tag") or None
+    stored = store_read(store.path, store_version, "list", filter_name, filter_tag)
+    st.dataframe(stored, use_container_width=True, hide_index=True)
+
+    if len(stored):
+        labels = {int(r.id): f"#{r.id} {r.name} [{r.tag}] {r.created[:19]}" for r in stored.itertuples()}
+        pick = st.selectbox("Szenario", list(labels), format_func=labels.get, key="store_pick")
+
+        def load_scenario(scenario_id):
+            loaded, stored_res, row = store.load(scenario_id)
+            for k, v in loaded.params.items(): st.session_state[k] = v
+            for table, state_key, editor_key in (("jobs", "current_jobs_df", "ed_jobs"), ("products", "products_df", "ed_prod"), ("cost_centers", "cost_centers_df", "ed_cc")):
+                st.session_state[state_key] = typed(loaded.table(table), table); st.session_state.pop(editor_key, None)
+            if row["p"] is None: return  # Monte-Carlo-Perzentile: nur die Konfiguration
+            st.session_state["p_pct"], st.session_state["q_pct"], st.session_state["cap_pct"] = row["p"], row["q"], row["market_share"] * 100
+            # Jahresmodell: gespeicherte Werte in den Ergebnis-Cache -> der nächste Rerun rechnet das Szenario nicht neu
+            if loaded["periods_per_year"] == 1 and not row["overrides"] and set(METRICS) <= set(stored_res.columns):
+                key = scenario_key("calculate", loaded, st.session_state["p_pct"], st.session_state["q_pct"], st.session_state["cap_pct"] / 100, 0.0)
+                RESULT_CACHE.put(key, ScenarioResult({"Jahr": stored_res["Jahr"].to_numpy(), **{m: stored_res[m].to_numpy() for m in METRICS}}))
+        st.button("📂 In die Eingaben laden", on_click=load_scenario, args=(pick,))
+        with st.expander("Gespeicherte Jahreswerte"):
+            st.dataframe(store_read(store.path, store_version, "results", pick), use_container_width=True, hide_index=True)
+
+        st.subheader("Versionen vergleichen")
+        d1, d2 = st.columns(2)
+        diff_a = d1.selectbox("Version A", list(labels), index=min(1, len(labels) - 1), format_func=labels.get, key="store_diff_a")
+        diff_b = d2.selectbox("Version B", list(labels), format_func=labels.get, key="store_diff_b")
+        if diff_a != diff_b:
+            p_diff, t_diff, r_diff = store_read(store.path, store_version, "diff", diff_a, diff_b)
+            if p_diff.empty and t_diff.empty and r_diff.empty: st.info("Keine Unterschiede")
+            if not p_diff.empty: st.dataframe(p_diff.astype({"A": str, "B": str}), use_container_width=True, hide_index=True)
+            if not t_diff.empty: st.dataframe(t_diff, use_container_width=True, hide_index=True)
+            if not r_diff.empty: st.dataframe(r_diff.style.format("{:,.0f}", subset=["Max. Abweichung", "A letztes Jahr", "B letztes Jahr"]), use_container_width=True, hide_index=True)
+
+    st.subheader("Abfrage")
+    # Läuft erst auf "Abfragen" (mit den Namens-/Tag-Filtern von oben), danach aus dem Cache bis zum nächsten Schreibzugriff
+    with st.form("store_query"):
+        q1, q2, q3, q4, q5 = st.columns(5)
+        q_metric = q1.selectbox("Kennzahl", METRICS, index=METRICS.index("Kasse vor Finanzierung"), key="store_q_metric")
+        q_op = q2.selectbox("Bedingung", list(STORE_OPS), key="store_q_op")
+        q_target = q3.selectbox("Grenze", ["min_cash", "Fester Wert"], format_func=lambda v: "Mindest-Cash" if v == "min_cash" else v, key="store_q_target")
+        q_value = q4.number_input("Wert (bei Fester Wert)", value=0.0, key="store_q_value")
+        q_year = q5.number_input("Jahr (0 = beliebig)", min_value=0, max_value=MAX_HORIZON_YEARS, value=min(5, last_year), key="store_q_year")
+        if st.form_submit_button("🔎 Abfragen"):
+            st.session_state["store_query_args"] = (q_metric, q_op, q_value if q_target == "Fester Wert" else q_target,
+                                                    int(q_year) or None, filter_name, filter_tag)
+    if "store_query_args" in st.session_state:
+        hits = store_read(store.path, store_version, "query", *st.session_state["store_query_args"])
+        st.caption(f"{len(hits):,} Treffer")
+        st.dataframe(hits, use_container_width=True, hide_index=True)
+
+with tab_group:
+    # Portfolio: je Gesellschaft eine config.json; gerechnet wird nur, was nicht im Ergebnis-Cache liegt
+    st.subheader("Konzern / Portfolio")
+    if "portfolio" not in st.session_state: st.session_state["portfolio"] = Portfolio()
+    pf = st.session_state["portfolio"]
+
+    ups = st.file_uploader("Portfolio-JSON oder einzelne config.json (Name = Dateiname)", type=["json"], accept_multiple_files=True, key="pf_files")
+    if ups and st.button("📥 Gesellschaften laden"):
+        try:
+            for up in ups:
+                d = json.load(up)
+                if "entities" in d:
+                    loaded = Portfolio.from_config(d)
+                    pf = Portfolio({**pf.entities, **loaded.entities}, pf.intercompany + loaded.intercompany, loaded.cash_pool)
+                else: pf = pf.with_entity(up.name.rsplit(".", 1)[0], ModelInputs.from_config(d))
+            st.session_state["portfolio"] = pf
+        except (ValueError, KeyError, TypeError) as e: st.error(f"Laden fehlgeschlagen: {e}")
+
+    g1, g2 = st.columns([2, 1])
+    entity_name = g1.text_input("Name der Gesellschaft", value="Gesellschaft 1", key="pf_name")
+    if g2.button("➕ Aktuelle Eingaben übernehmen", help="Neue Gesellschaft oder bestehende mit den aktuellen Eingaben überschreiben"):
+        st.session_state["portfolio"] = pf = pf.with_entity(entity_name, inputs)
+
+    if pf.entities:
+        e1, e2, e3 = st.columns([2, 1, 1])
+        pick = e1.selectbox("Gesellschaft", list(pf.entities), key="pf_pick")
+
+        def load_entity(name):
+            loaded = st.session_state["portfolio"].entities[name]
+            for k, v in loaded.params.items(): st.session_state[k] = v
+            for table, state_key, editor_key in (("jobs", "current_jobs_df", "ed_jobs"), ("products", "products_df", "ed_prod"), ("cost_centers", "cost_centers_df", "ed_cc")):
+                st.session_state[state_key] = typed(loaded.table(table), table); st.session_state.pop(editor_key, None)
+            st.session_state["pf_name"] = name
+        def remove_entity(name):
+            st.session_state["portfolio"] = st.session_state["portfolio"].without_entity(name)
+        e2.button("📂 In die Eingaben laden", on_click=load_entity, args=(pick,), key="pf_load")
+        e3.button("🗑️ Entfernen", on_click=remove_entity, args=(pick,), key="pf_remove")
+
+        st.markdown("##### Konzerninterne Lieferungen")
+        ic_df = pd.DataFrame([{"Verkäufer": ic.seller, "Käufer": ic.buyer, "Betrag Jahr 1 (€)": ic.amount, "Wachstum (%)": ic.growth_pct, "Aufwand beim Käufer": ic.cost}
+                              for ic in pf.intercompany], columns=["Verkäufer", "Käufer", "Betrag Jahr 1 (€)", "Wachstum (%)", "Aufwand beim Käufer"])
+        names = list(pf.entities)
+        ic_edit = st.data_editor(ic_df, num_rows="dynamic", use_container_width=True, key="pf_ic", column_config={
+            "Verkäufer": st.column_config.SelectboxColumn(options=names, required=True), "Käufer": st.column_config.SelectboxColumn(options=names, required=True),
+            "Aufwand beim Käufer": st.column_config.SelectboxColumn(options=list(IC_COST_COLUMNS), default="Kostenstellen")})
+        p1, p2, p3, p4 = st.columns(4)
+        pool_on = p1.toggle("Cash-Pool", value=pf.cash_pool.enabled, help="Konzern finanziert sich gemeinsam statt Kredit-Automatik je Gesellschaft")
+        pool_min = p2.number_input("Mindest-Cash Konzern (€)", value=float(pf.cash_pool.min_cash), step=10000.0, disabled=not pool_on)
+        pool_rate = p3.number_input("Pool-Zins %", value=float(pf.cash_pool.loan_rate), step=0.1, disabled=not pool_on)
+        pool_tax = p4.number_input("Steuersatz Organschaft %", value=float(pf.cash_pool.tax_rate), step=1.0, disabled=not pool_on)
+        try:
+            ics = tuple(Intercompany(r["Verkäufer"], r["Käufer"], float(r["Betrag Jahr 1 (€)"] or 0), float(r["Wachstum (%)"] or 0), r["Aufwand beim Käufer"] or "Kostenstellen")
+                        for r in ic_edit.to_dict("records") if r["Verkäufer"] and r["Käufer"])
+            st.session_state["portfolio"] = pf = Portfolio(pf.entities, ics, CashPool(pool_on, pool_min, pool_rate, pool_tax))
+        except (KeyError, ValueError) as e: st.error(str(e))
+
+        # Gesellschaften im Prozess-Pool rechnen -> als Hintergrund-Job, nicht bei jedem Rerun im Skript
+        k1, k2 = st.columns(2)
+        k2.download_button("Portfolio-JSON speichern", lambda: json.dumps(pf.to_config()), "portfolio.json", "application/json")
+        if k1.button("🏢 Konsolidieren"):
+            start_job(JOBS.submit, evaluate_portfolio, pf, workers=max(1, (os.cpu_count() or 1) // JOBS.max_workers), progress_arg=None,
+                      label=f"Konsolidierung ({len(pf.entities)} Gesellschaften)", meta={"state_key": "pf_result"})
+        job_notice("pf_result")
+    group = st.session_state.get("pf_result")
+    if pf.entities and group is not None:
+        if group.portfolio != pf: st.info("Portfolio seit der letzten Konsolidierung geändert: Ergebnis zeigt den alten Stand.")
+        st.caption(f"{len(group.entities)} Gesellschaften · neu gerechnet: {', '.join(group.recomputed) or 'keine'} · {group.seconds * 1000:,.0f} ms")
+        for w in group.warnings: st.warning(w)
+        view = st.radio("Ansicht", ["GuV", "Cashflow", "Bilanz"], horizontal=True, key="pf_view")
+        view_cols = {"GuV": GUV_COLS, "Cashflow": CF_COLS, "Bilanz": BIL_COLS}[view]
+        st.dataframe(group.consolidated[view_cols].style.format("{:,.0f}", subset=view_cols[1:]), use_container_width=True, hide_index=True)
+        pf_metric = st.selectbox("Beitrag je Gesellschaft", ["Umsatz", "EBITDA", "Kasse", "FTE Total"], key="pf_metric")
+        st.bar_chart(group.contributions(pf_metric))
+        if len(group.eliminations):
+            with st.expander("Eliminierungen"):
+                st.dataframe(group.eliminations.style.format("{:,.0f}", subset=["Umsatz/Aufwand", "Forderungen/Verbindlichkeiten"]), use_container_width=True, hide_index=True)
+        export_button(portfolio_sheets(group), "konzern", "export_group")
+
+# Job-Panel zuletzt: enthält auch die in diesem Rerun gestarteten Jobs; pollt nur, solange einer läuft
+running_at_start = {j.id for j in session_jobs.values() if not j.done}
+@st.fragment(run_every=1.0 if running_at_start else None)
+def job_panel():
+    for job in sorted(session_jobs.values(), key=lambda j: -j.id):
+        st.markdown(f"**{job.label}** · {job.status}" + (f" · {job.seconds:,.1f} s" if job.started else ""))
+        if not job.done:
+            st.progress(job.progress or 0.0, text=job.message or None)
+            st.button("✖ Abbrechen", key=f"job_cancel_{job.id}", on_click=job.cancel)
+        elif job.status == FAILED: st.caption(job.error)
+        elif job.status == DONE and job.meta.get("file_name"):
+            st.download_button(f"⬇️ {job.meta['file_name']}", job.result, job.meta["file_name"], "application/pdf", key=f"job_dl_{job.id}")
+    def clear_finished():
+        for job_id in [j.id for j in session_jobs.values() if j.done]: del session_jobs[job_id]
+    if any(j.done for j in session_jobs.values()): st.button("🧹 Erledigte entfernen", key="jobs_clear", on_click=clear_finished)
+    pool = JOBS.stats()
+    st.caption(f"Server: {pool['running']} laufend · {pool['waiting']} wartend · {pool['workers']} Worker")
+    if any(session_jobs[i].done for i in running_at_start if i in session_jobs): st.rerun()  # Ergebnisse übernehmen, Polling beenden
+if session_jobs:
+    with jobs_panel.expander("⏳ Hintergrund-Jobs", expanded=bool(running_at_start)): job_panel()
+
+# ==========================================
+# 6. PROFILING (nur Admin)
+# ==========================================
+if profiling_on:
+    prof_run = tracer.end_run()
+    with profiling_panel.expander("⏱️ Profiling (letzter Rerun)", expanded=True):
+        mem = f" · RSS {prof_run['rss'] / 2**20:,.0f} MB ({prof_run['rss_delta'] / 2**20:+,.1f} MB)" if prof_run["rss"] is not None else ""
+        st.caption(f"Rerun {(prof_run['end'] - prof_run['start']) / 1e6:,.0f} ms{mem}")
+        if prof_run["rss"] is not None:
+            st.caption("RSS gilt für den ganzen Server-Prozess: parallele Sessions und Hintergrund-Jobs zählen mit, Spitzen innerhalb des Reruns nicht.")
+        spans = pd.DataFrame(tracer.summary(prof_run))
+        if not spans.empty: st.dataframe(spans.style.format("{:,.1f}", subset=["Summe (ms)", "Max (ms)"]), hide_index=True)
+        counters = prof_run["counters"]
+        if counters: st.caption(" · ".join(f"{k} {v:,}" for k, v in sorted(counters.items())))
+        st.download_button("Trace exportieren (Chrome JSON)", tracer.export(), "finmod_trace.json", "application/json")
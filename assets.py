@@ -0,0 +1,86 @@
+import numpy as np
+
+# ==========================================
+# ANLAGENREGISTER (Vintage-Matrix)
+# ==========================================
+
+
+class AssetRegister:
+    """Anlagenregister als Vintage-Matrix: Kaufperiode × Asset-Klasse × Szenario.
+
+    Ein Kauf in Periode v ist in den Perioden v .. v+L-1 im Bestand (L = Nutzungsdauer in Perioden),
+    wird linear über L Perioden abgeschrieben und geht am Ende von Periode v+L-1 ab. Fällt der
+    Bestand unter den Bedarf, wird nachgekauft (Ersatzbeschaffung)."""
+
+    def __init__(self, classes, prices, lives):
+        self.classes = list(classes)
+        self.prices = np.asarray(prices, dtype=np.float64)                   # (Klassen, n) oder (Klassen, 1)
+        self.lives = np.maximum(1, np.asarray(lives)).astype(np.int64)       # dito, in Perioden
+        self.units = self.values = self._stock = None
+
+    def _gather(self, cum, idx):
+        # cum[idx[c, j], c, j] -- bei einheitlicher Nutzungsdauer je Klasse (idx (C, 1)) ganze Zeilen kopieren
+        C, n = cum.shape[-2:]
+        if idx.shape[-1] == 1: return cum[idx[..., 0], np.arange(C)]
+        flat = (idx * (C * n) + np.arange(C * n).reshape(C, n)).ravel()
+        return np.take(cum.reshape(-1), flat).reshape(idx.shape[:-2] + (C, n))
+
+    def build(self, needs, forced=None):
+        """needs: Soll-Bestand (Perioden, Klassen, n); forced: feste Zukäufe je Periode (gleiche Form)."""
+        T, C, n = needs.shape
+        units = np.empty((T, C, n)); stock = np.empty((T, C, n))
+        cum = np.empty((T + 1, C, n)); cum[0] = 0.0  # cum[t] = Summe der Käufe vor Periode t
+        for t in range(T):
+            alive = cum[t] - self._gather(cum, np.maximum(t - self.lives + 1, 0))
+            np.maximum(0.0, needs[t] - alive, out=units[t])
+            if forced is not None: units[t] += forced[t]
+            np.add(alive, units[t], out=stock[t])
+            np.add(cum[t], units[t], out=cum[t + 1])
+        self.units = units; self._stock = stock
+        self.values = units * self.prices
+        return self
+
+    def _window(self, arr):
+        # Summe über die im Bestand befindlichen Jahrgänge je Periode: cum[t+1] - cum[t-L+1]
+        T, C, n = arr.shape
+        cum = np.zeros((T + 1, C, n)); np.cumsum(arr, axis=0, out=cum[1:])
+        start = np.maximum(np.arange(T)[:, None, None] - self.lives + 1, 0)
+        return cum[1:] - np.stack([self._gather(cum, s) for s in start])
+
+    def _retiring(self, arr):
+        # Jahrgang, der am Ende von Periode t seine Nutzungsdauer erreicht: v = t - L + 1
+        v = np.arange(arr.shape[0])[:, None, None] - self.lives + 1
+        return np.where(v >= 0, np.stack([self._gather(arr, s) for s in np.maximum(v, 0)]), 0.0)
+
+    def depreciation(self):
+        # Preise je Klasse sind über die Zeit konstant -> AfA = Bestand × Preis / Nutzungsdauer
+        return self._stock * (self.prices / self.lives)
+
+    def net_book_value(self):
+        # Restbuchwert am Periodenende: Σ value_v * (L - (t - v) - 1) / L über den Bestand
+        t = np.arange(self.values.shape[0])[:, None, None]
+        vintage = np.arange(self.values.shape[0])[:, None, None]
+        return ((self.lives - t - 1) * self._window(self.values) + self._window(self.values * vintage)) / self.lives
+
+    def stock(self):
+        return self._stock
+
+    def disposals(self):
+        """Abgänge (Stück, Anschaffungswert) am Ende der Nutzungsdauer je Periode."""
+        return self._retiring(self.units), self._retiring(self.values)
+
+    def replacements(self):
+        # Zukäufe, die im Vorperiodenende abgegangene Stücke ersetzen
+        retired = np.zeros_like(self.units); retired[1:] = self._retiring(self.units)[:-1]
+        return np.minimum(self.units, retired)
+
+    def summary(self, scenario=0):
+        """Tabellarische Sicht je Klasse und Periode für ein Szenario (Perioden × Klassen je Kennzahl)."""
+        dis_units, dis_values = self.disposals()
+        return {
+            "Zugang (Stück)": self.units[:, :, scenario], "Zugang (€)": self.values[:, :, scenario],
+            "Bestand (Stück)": self.stock()[:, :, scenario], "Abschreibung (€)": self.depreciation()[:, :, scenario],
+            "Restbuchwert (€)": self.net_book_value()[:, :, scenario],
+            "Abgang (Stück)": dis_units[:, :, scenario], "Abgang (€)": dis_values[:, :, scenario],
+            "Ersatzbeschaffung (Stück)": self.replacements()[:, :, scenario],
+        }
@@ -0,0 +1,142 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from cache import cached_calculate
+from engine import ModelInputs
+from export import Sheet, available_formats, write
+
+# ==========================================
+# BATCH-LAUF (Kommandozeile, ohne Streamlit)
+# ==========================================
+# python batch.py configs/ "portfolio/**/*.json" -o ergebnisse.parquet --workers 8 --pdf-dir pdf/
+
+
+def collect_configs(patterns):
+    """Verzeichnisse (alle *.json darin) und Glob-Muster -> sortierte, eindeutige Dateiliste."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern): paths.update(glob.glob(os.path.join(pattern, "*.json")))
+        else: paths.update(glob.glob(pattern, recursive=True) or [pattern])  # kein Treffer -> Fehler je Datei statt stillem Auslassen
+    return sorted(os.path.normpath(p) for p in paths)
+
+
+def pdf_names(paths):
+    # Dateiname ohne Endung; bei gleichen Namen aus verschiedenen Ordnern der ganze Pfad
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    return [
+        stem if stems.count(stem) == 1 else os.path.splitext(p)[0].replace(os.sep, "__").strip("._")
+        for p, stem in zip(paths, stems)
+    ]
+
+
+def evaluate_config(path, pdf_path=None, periods=False):
+    """Rechnet das Haupt-Szenario einer config.json wie die App (p, q, Marktanteil aus der Datei)."""
+    with open(path, encoding="utf-8") as f: inputs = ModelInputs.from_config(json.load(f))
+    res = cached_calculate(inputs, inputs["p_pct"], inputs["q_pct"], inputs["cap_pct"] / 100)
+    df_res = res.annual().to_frame()
+    if pdf_path:
+        from report import create_detailed_pdf  # matplotlib/fpdf nur laden, wenn PDFs gewünscht sind
+        pdf_bytes = create_detailed_pdf(df_res, dict(inputs.params), inputs.table("jobs"), inputs.table("products"), inputs.table("cost_centers"), f"({os.path.basename(path)})")
+        with open(pdf_path, "wb") as f: f.write(pdf_bytes)
+    return res.to_frame() if periods else df_res
+
+
+def _run_one(path, pdf_path, periods):
+    # Fehler einer Datei als Ergebnis zurückgeben -> der Rest des Batches läuft weiter
+    t0 = time.perf_counter()
+    try: return evaluate_config(path, pdf_path, periods), None, time.perf_counter() - t0
+    except Exception as e: return None, f"{type(e).__name__}: {e}", time.perf_counter() - t0
+
+
+def run_batch(paths, workers=None, pdf_dir=None, periods=False, progress=None):
+    """Rechnet alle Dateien im Prozess-Pool; liefert (Ergebnisse aller Dateien, {Pfad: Fehler})."""
+    workers = workers or os.cpu_count() or 1
+    if pdf_dir: os.makedirs(pdf_dir, exist_ok=True)
+    pdfs = [os.path.join(pdf_dir, f"{name}.pdf") for name in pdf_names(paths)] if pdf_dir else [None] * len(paths)
+    frames, errors = {}, {}
+
+    def record(done, path, result):
+        df, err, secs = result
+        if err: errors[path] = err
+        else: frames[path] = df
+        if progress: progress(done, len(paths), path, err, secs)
+
+    if workers == 1:
+        for done, (path, pdf) in enumerate(zip(paths, pdfs), 1): record(done, path, _run_one(path, pdf, periods))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_one, path, pdf, periods): path for path, pdf in zip(paths, pdfs)}
+            for done, fut in enumerate(as_completed(futures), 1):
+                try: result = fut.result()
+                except Exception as e: result = (None, f"{type(e).__name__}: {e}", 0.0)  # z.B. abgestürzter Worker
+                record(done, futures[fut], result)
+
+    ok = [p for p in paths if p in frames]  # Reihenfolge der Eingabe, nicht der Fertigstellung
+    results = pd.concat([frames[p].assign(Config=p) for p in ok], ignore_index=True) if ok else pd.DataFrame()
+    if ok: results = results[["Config"] + [c for c in results.columns if c != "Config"]]
+    return results, errors
+
+
+def write_results(df, path):
+    # Blockweise über export.write; .xlsx als Excel-Mappe, alles außer .parquet/.xlsx als CSV
+    fmt = path.lower().rsplit(".", 1)[-1]
+    if fmt == "parquet": df = df.astype({"Config": "category"})
+    write([Sheet.from_frame("Ergebnisse", df)], fmt if fmt in ("parquet", "xlsx") else "csv", path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rechnet config.json-Dateien (Import/Export der App) ohne Browser.")
+    parser.add_argument("configs", nargs="+", help="Verzeichnisse oder Glob-Muster (z.B. 'configs/**/*.json')")
+    parser.add_argument("-o", "--output", default="ergebnisse.csv", help="Ergebnisdatei (.csv, .parquet oder .xlsx)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Anzahl Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--pdf-dir", help="Zusätzlich einen PDF Report je Konfiguration in dieses Verzeichnis schreiben")
+    parser.add_argument("--combined-pdf", help="Alle Konfigurationen als Vergleich in einem PDF")
+    parser.add_argument("--periods", action="store_true", help="Perioden-Detail statt Jahreswerten ausgeben")
+    parser.add_argument("--errors", help="Fehlgeschlagene Dateien zusätzlich als CSV schreiben")
+    parser.add_argument("--store", help="Ergebnisse zusätzlich im Szenario-Speicher (SQLite-Datei) ablegen")
+    parser.add_argument("--tag", default="batch", help="Tag der gespeicherten Szenarien (mit --store)")
+    args = parser.parse_args(argv)
+
+    if args.output.endswith(".parquet"):
+        try: pd.io.parquet.get_engine("auto")
+        except ImportError as e: parser.error(f"Parquet-Ausgabe nicht möglich: {e}")
+    if args.output.endswith(".xlsx") and "xlsx" not in available_formats(): parser.error("Excel-Ausgabe braucht openpyxl")
+    if args.combined_pdf and args.periods: parser.error("--combined-pdf braucht Jahreswerte (ohne --periods)")
+    if args.store and args.periods: parser.error("--store braucht Jahreswerte (ohne --periods)")
+    paths = collect_configs(args.configs)
+    if not paths: parser.error("keine Konfigurationsdateien gefunden")
+
+    t0 = time.perf_counter()
+    def progress(done, total, path, err, secs):
+        status = f"FEHLER {err}" if err else f"ok ({secs:.2f} s)"
+        print(f"[{done}/{total} · {time.perf_counter() - t0:.1f} s] {path}: {status}", file=sys.stderr, flush=True)
+
+    results, errors = run_batch(paths, args.workers, args.pdf_dir, args.periods, progress)
+    if not results.empty: write_results(results, args.output)
+    if args.combined_pdf and not results.empty:
+        from report import create_comparison_pdf
+        scenarios = {os.path.basename(p): df.drop(columns="Config").reset_index(drop=True) for p, df in results.groupby("Config", sort=False)}
+        with open(args.combined_pdf, "wb") as f: f.write(create_comparison_pdf(scenarios, {}, title="Batch-Vergleich"))
+    if args.store and not results.empty:
+        from store import ScenarioStore
+        store = ScenarioStore(args.store)
+        for path, df in results.groupby("Config", sort=False):
+            with open(path, encoding="utf-8") as f: inputs = ModelInputs.from_config(json.load(f))
+            store.save(path, inputs, df.drop(columns="Config"), tag=args.tag)
+        store.close()
+    if args.errors and errors:
+        pd.DataFrame({"Config": list(errors), "Fehler": list(errors.values())}).to_csv(args.errors, index=False)
+    print(f"{len(paths) - len(errors)}/{len(paths)} Konfigurationen gerechnet in {time.perf_counter() - t0:.1f} s"
+          + (f" -> {args.output}" if not results.empty else "") + (f", {len(errors)} fehlgeschlagen" if errors else ""), file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engine import DEFAULTS, ModelInputs, calculate, calculate_batch, strategy_grid, unit_economics
+
+# ==========================================
+# BENCHMARKS (ohne Browser, feste Seeds)
+# ==========================================
+# python benchmark.py -o bench.json                                  -> Messung speichern
+# python benchmark.py --baseline bench.json --threshold 0.25         -> gegen Baseline prüfen (Exit-Code 1 bei Regression)
+
+SEED = 20240601
+# Mindestanstieg für eine Regression, damit Rauschen bei sehr kleinen Werten nicht anschlägt
+MIN_DELTA = {"median_s": 1e-3, "peak_mb": 1.0}
+
+
+def make_jobs(n, rng):
+    flags = rng.random((n, 5)) < [0.8, 0.5, 0.15, 0.05, 0.7]
+    return pd.DataFrame({
+        "Job Titel": [f"Rolle {i}" for i in range(n)],
+        "Jahresgehalt (€)": rng.uniform(30000, 120000, n).round(-2),
+        "FTE Jahr 1": np.where(rng.random(n) < 0.7, rng.integers(1, 4, n), 0).astype(float),
+        **{c: flags[:, j] for j, c in enumerate(["Laptop", "Smartphone", "Auto", "LKW", "Büro"])},
+        "Sonstiges (€)": rng.uniform(0, 1000, n).round(),
+    })
+
+
+def make_products(n, rng):
+    return pd.DataFrame({
+        "Produkt": [f"Produkt {i}" for i in range(n)],
+        "Preis (€)": rng.uniform(10, 500, n).round(2), "Avg. Rabatt (%)": rng.uniform(0, 20, n).round(1),
+        "Herstellungskosten (COGS €)": rng.uniform(1, 100, n).round(2), "Take Rate (%)": rng.uniform(0, 100 / max(n, 1) * 3, n),
+        "Wiederkauf Rate (%)": rng.uniform(0, 95, n).round(1), "Wiederkauf alle (Monate)": rng.choice([0, 1, 3, 6, 12], n),
+    })
+
+
+def make_cost_centers(n, rng):
+    return pd.DataFrame({
+        "Kostenstelle": [f"KST {i}" for i in range(n)],
+        "Grundwert Jahr 1 (€)": rng.uniform(0, 20000, n).round(-1), "Umsatz-Kopplung (%)": rng.choice([0, 1, 2, 5, 10], n),
+    })
+
+
+def messy(df, rng, share=0.2):
+    # Wie aus dem Data-Editor / JSON: Zahlen teils als Text, leere Zellen, None -> safe_float-Pfad
+    out = df.astype(object)
+    for col in df.columns[1:]:
+        if df[col].dtype == bool: continue
+        mask = rng.random(len(df)) < share
+        out.loc[mask, col] = [rng.choice(["", None, str(v)]) for v in df.loc[mask, col]]
+    return out
+
+
+def model(jobs=12, products=3, cost_centers=3, **params):
+    rng = np.random.default_rng(SEED)
+    return ModelInputs.build({**DEFAULTS, **params}, make_jobs(jobs, rng), make_products(products, rng), make_cost_centers(cost_centers, rng))
+
+
+def calculate_scenario(inputs):
+    # Wie calculate_scenario() der App, ohne Cache
+    return calculate(inputs, inputs["p_pct"], inputs["q_pct"], inputs["cap_pct"] / 100).annual().to_frame()
+
+
+def _build_case(rows, make):
+    rng = np.random.default_rng(SEED)
+    tables = messy(make(rows, rng), rng)
+    return lambda: unit_economics(ModelInputs.build(DEFAULTS, None, tables, None))
+
+
+def _config_case(inputs):
+    def roundtrip():
+        return ModelInputs.from_config(json.loads(json.dumps(inputs.to_config())))
+    return roundtrip
+
+
+def _pdf_case(horizon_years, periods_per_year):
+    from report import create_detailed_pdf
+    inputs = model(periods_per_year=periods_per_year, horizon_years=horizon_years)
+    df = calculate(inputs, inputs["p_pct"], inputs["q_pct"], inputs["cap_pct"] / 100).to_frame()
+    if "Periode" in df.columns: df = df.assign(Jahr=df["Periode"]).drop(columns="Periode")  # eine Tabellenzeile je Periode
+    return lambda: create_detailed_pdf(df, dict(inputs.params), inputs.table("jobs"), inputs.table("products"), inputs.table("cost_centers"))
+
+
+def _calibration_case(lines, periods=48):
+    from calibration import fit_many
+    from engine import bass_step
+    rng = np.random.default_rng(SEED)
+    p, q, m, churn = rng.uniform(0.005, 0.05, lines), rng.uniform(0.2, 0.8, lines), rng.uniform(500, 5000, lines), rng.uniform(0, 0.2, lines)
+    n = np.empty((periods, lines)); n[0] = 10.0
+    for t in range(1, periods): n[t] = bass_step(n[t - 1], p / 12, q / 12, m, churn / 12)
+    histories = pd.DataFrame(n * rng.normal(1, 0.02, n.shape), columns=[f"Linie {i}" for i in range(lines)])
+    return lambda: fit_many(histories, churn)
+
+
+def _export_case(fmt, steps=5):
+    from export import batch_sheet, to_bytes
+    inputs = model(periods_per_year=12, horizon_years=10)
+    sheet = batch_sheet("Gitter", calculate_batch(inputs, *strategy_grid(inputs, "Standard", steps)))
+    return lambda: to_bytes([sheet], fmt)
+
+
+def cases():
+    """Name -> Fabrik, die die Eingaben vorbereitet und die zu messende Funktion liefert."""
+    c = {}
+    for n in (12, 1000, 10000): c[f"calculate/jobs={n}"] = lambda n=n: (lambda i=model(jobs=n): calculate_scenario(i))
+    for n in (3, 500, 5000): c[f"calculate/products={n}"] = lambda n=n: (lambda i=model(products=n): calculate_scenario(i))
+    for n in (3, 200, 2000): c[f"calculate/cost_centers={n}"] = lambda n=n: (lambda i=model(cost_centers=n): calculate_scenario(i))
+    for years, f in ((10, 1), (50, 1), (30, 12), (50, 12)):
+        c[f"calculate/horizon={years}x{f}"] = lambda years=years, f=f: (lambda i=model(horizon_years=years, periods_per_year=f): calculate_scenario(i))
+    c["calculate_batch/grid=20^3"] = lambda: (lambda i=model(): calculate_batch(i, *strategy_grid(i, "Standard", 20)))
+    for n in (3, 5000): c[f"arpu/messy_products={n}"] = lambda n=n: _build_case(n, make_products)
+    for n in (12, 10000): c[f"config/roundtrip jobs={n}"] = lambda n=n: _config_case(model(jobs=n, products=n // 2, cost_centers=n // 5))
+    for n in (1, 300): c[f"calibration/lines={n}"] = lambda n=n: _calibration_case(n)
+    for fmt in ("csv", "parquet"): c[f"export/{fmt} grid=5^3x120"] = lambda fmt=fmt: _export_case(fmt)
+    c["pdf/annual 10y"] = lambda: _pdf_case(10, 1)
+    c["pdf/monthly 30y"] = lambda: _pdf_case(30, 12)
+    return c
+
+
+def measure(fn, repeat=5, min_time=0.2):
+    """Median/Minimum über `repeat` Läufe (bei schnellen Fällen mehrere Aufrufe je Lauf), Spitzenspeicher separat."""
+    fn()  # Aufwärmen (Importe, Caches)
+    t = time.perf_counter(); fn(); single = time.perf_counter() - t
+    loops = max(1, int(min_time / max(single, 1e-9)))
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(loops): fn()
+        times.append((time.perf_counter() - t) / loops)
+    tracemalloc.start()
+    try:
+        fn(); peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"median_s": float(np.median(times)), "min_s": float(np.min(times)), "repeat": repeat, "loops": loops, "peak_mb": peak / 2**20}
+
+
+def compare(results, baseline, threshold):
+    """Fälle, deren Median-Zeit oder Spitzenspeicher mehr als `threshold` (und MIN_DELTA) über der Baseline liegt."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base: continue
+        for key in ("median_s", "peak_mb"):
+            ratio = r[key] / base[key] if base[key] else 1.0
+            r[f"{key}_ratio"] = ratio
+            if ratio > 1 + threshold and r[key] - base[key] > MIN_DELTA[key]: regressions.append((name, key, base[key], r[key], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks für Engine, Import/Export und PDF Report.")
+    parser.add_argument("-o", "--output", help="Ergebnisse als JSON schreiben")
+    parser.add_argument("-k", "--filter", default="*", help="Nur Fälle, deren Name auf das Muster passt (fnmatch)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help="Frühere JSON-Ausgabe zum Vergleich")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Erlaubter Anstieg gegenüber der Baseline (0.25 = +25 %%)")
+    args = parser.parse_args(argv)
+
+    selected = {name: factory for name, factory in cases().items() if fnmatch.fnmatch(name, args.filter)}
+    if not selected: parser.error("kein Benchmark passt auf den Filter")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)["results"]
+
+    results = {}
+    for name, factory in selected.items():
+        results[name] = r = measure(factory(), args.repeat)
+        print(f"{name:<34} {r['median_s'] * 1000:>10.2f} ms  (min {r['min_s'] * 1000:.2f})  peak {r['peak_mb']:>8.1f} MB", file=sys.stderr, flush=True)
+
+    regressions = compare(results, baseline, args.threshold)
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "platform": platform.platform(), "cpus": os.cpu_count(), "seed": SEED,
+        },
+        "results": results,
+        "regressions": [{"case": n, "metric": k, "baseline": b, "current": c, "ratio": q} for n, k, b, c, q in regressions],
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    for n, k, b, c, q in regressions:
+        print(f"REGRESSION {n} {k}: {b:.4g} -> {c:.4g} ({q:.2f}x)", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from engine import DEFAULTS, calculate, calculate_batch
+from profiling import count
+
+# ==========================================
+# ERGEBNIS-CACHE (prozessweit, optional auf Disk)
+# ==========================================
+
+# Bei Änderungen an der Berechnungslogik erhöhen -> alte Disk-Einträge werden nicht mehr getroffen
+CACHE_VERSION = 3
+
+log = logging.getLogger(__name__)
+
+# Parameter, die calculate()/calculate_batch() nicht lesen (kommen als Argumente oder nur in UI/Monte Carlo vor)
+_NON_ENGINE_KEYS = {"p_pct", "q_pct", "cap_pct", "wacc"} | {k for k in DEFAULTS if k.startswith("roa_")}
+ENGINE_KEYS = sorted(k for k in DEFAULTS if k not in _NON_ENGINE_KEYS)
+
+
+def input_key(inputs):
+    """Stabiler Hash der normalisierten Eingaben: Engine-Parameter + Tabellen ohne Bezeichnungen, Zeilen sortiert."""
+    h = hashlib.sha256()
+    h.update(json.dumps({k: inputs[k] for k in ENGINE_KEYS}, sort_keys=True).encode())
+    for name in ("jobs", "products", "cost_centers"):
+        table = getattr(inputs, name)
+        cols = [np.asarray(arr, dtype=np.float64) for arr in table.values() if arr.dtype != object]
+        h.update(name.encode())
+        if cols and len(cols[0]):
+            mat = np.column_stack(cols)
+            mat = mat[np.lexsort(mat.T[::-1])]
+            h.update(np.ascontiguousarray(mat).tobytes())
+    return h.hexdigest()
+
+
+def scenario_key(tag, inputs, *args, **kwargs):
+    h = hashlib.sha256(f"{CACHE_VERSION}|{tag}|{input_key(inputs)}".encode())
+    for a in args:
+        # Form mit hashen: gleiche Bytes in anderer Form (Skalar vs. [x], (2, 3) vs. (3, 2)) sind andere Argumente
+        a = np.asarray(a, dtype=np.float64)
+        h.update(repr(a.shape).encode()); h.update(np.ascontiguousarray(a).tobytes()); h.update(b"|")
+    for k in sorted(kwargs):
+        v = kwargs[k]
+        if isinstance(v, dict):
+            v = {kk: np.asarray(vv, dtype=np.float64).tolist() for kk, vv in sorted(v.items())}
+        h.update(json.dumps([k, v], sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _arrays(value):
+    if isinstance(getattr(value, "values", None), np.ndarray): return [value.values]
+    if isinstance(getattr(value, "columns", None), dict): return list(value.columns.values())
+    return []
+
+
+class ResultCache:
+    """LRU-Cache im Speicher (Anzahl + Bytes begrenzt) mit optionaler Disk-Ebene; thread-safe."""
+
+    def __init__(self, maxsize=256, max_bytes=512 * 2**20, disk_dir=None):
+        self.maxsize = maxsize; self.max_bytes = max_bytes; self.disk_dir = disk_dir
+        self._mem = OrderedDict(); self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = self.disk_hits = self.misses = self.evictions = self.disk_errors = 0
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key); self.hits += 1
+                count("cache.hits")
+                return self._mem[key][0]
+        if self.disk_dir and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), "rb") as f: value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = None
+            if value is not None:
+                with self._lock: self.disk_hits += 1
+                count("cache.disk_hits")
+                self._put_mem(key, value)
+                return value
+        with self._lock: self.misses += 1
+        count("cache.misses")
+        return default
+
+    def put(self, key, value):
+        self._put_mem(key, value)
+        if self.disk_dir:
+            # Platte voll / keine Rechte: Eintrag bleibt im Speicher, Rechnung läuft weiter
+            path = self._path(key); tmp = None
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                with os.fdopen(fd, "wb") as f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except OSError as e:
+                with self._lock: self.disk_errors += 1
+                count("cache.disk_errors")
+                log.warning("Ergebnis-Cache: Schreiben nach %s fehlgeschlagen, nur im Speicher: %s", path, e)
+                if tmp and os.path.exists(tmp):
+                    try: os.remove(tmp)
+                    except OSError: pass
+
+    def _put_mem(self, key, value):
+        # Geteilte Ergebnisse schreibgeschützt, damit kein Aufrufer den Cache-Inhalt verändert
+        arrays = _arrays(value)
+        for arr in arrays: arr.flags.writeable = False
+        size = sum(arr.nbytes for arr in arrays) or 1024
+        with self._lock:
+            if key in self._mem: self._bytes -= self._mem.pop(key)[1]
+            self._mem[key] = (value, size); self._bytes += size
+            while len(self._mem) > self.maxsize or (self._bytes > self.max_bytes and len(self._mem) > 1):
+                _, (_, old) = self._mem.popitem(last=False)
+                self._bytes -= old; self.evictions += 1
+
+    def get_or_compute(self, key, fn):
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = fn(); self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._mem: self._bytes -= self._mem.pop(key)[1]
+        if self.disk_dir and os.path.exists(self._path(key)): os.remove(self._path(key))
+
+    def clear(self, disk=True):
+        with self._lock:
+            self._mem.clear(); self._bytes = 0
+        if disk and self.disk_dir and os.path.isdir(self.disk_dir):
+            for root, _, files in os.walk(self.disk_dir):
+                for f in files:
+                    if f.endswith(".pkl"): os.remove(os.path.join(root, f))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "evictions": self.evictions, "disk_errors": self.disk_errors,
+                "entries": len(self._mem), "bytes": self._bytes,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Prozessweiter Cache: Streamlit importiert Module einmal pro Server -> geteilt zwischen allen Sessions
+RESULT_CACHE = ResultCache(
+    maxsize=int(os.environ.get("FINMOD_CACHE_SIZE", 256)),
+    disk_dir=os.environ.get("FINMOD_CACHE_DIR") or None,
+)
+
+
+def cached_calculate(inputs, p_input, q_input, market_share_input, discount_pct=0.0, cache=None):
+    cache = cache or RESULT_CACHE
+    key = scenario_key("calculate", inputs, p_input, q_input, market_share_input, discount_pct)
+    return cache.get_or_compute(key, lambda: calculate(inputs, p_input, q_input, market_share_input, discount_pct))
+
+
+def cached_calculate_batch(inputs, p, q, market_share, discount_pct=0.0, overrides=None, cache=None, annual=False):
+    """Batch aus dem Cache; annual=True -> Jahresverdichtung als eigener Eintrag (kein erneutes Verdichten je Rerun)."""
+    cache = cache or RESULT_CACHE
+    args = (inputs, p, q, market_share, discount_pct)
+    if annual:
+        return cache.get_or_compute(scenario_key("batch_annual", *args, overrides=overrides or {}),
+                                    lambda: cached_calculate_batch(*args, overrides, cache).annual())
+    key = scenario_key("batch", *args, overrides=overrides or {})
+    return cache.get_or_compute(key, lambda: calculate_batch(inputs, p, q, market_share, discount_pct, overrides))
@@ -0,0 +1,260 @@
+import io
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from engine import bass_step
+from importer import sniff
+
+# ==========================================
+# KALIBRIERUNG (Bass-Parameter aus Kundenhistorie)
+# ==========================================
+# Gleiche Rekursion wie die Engine (bass_step). Alle Reihen gemeinsam: Grobgitter über (p, q, Marktpotenzial)
+# als ein Array je Periode, dann Levenberg-Marquardt ab den besten Gitterpunkten, ebenfalls für alle Reihen zugleich.
+# Churn ist Eingabe, nicht Schätzwert: unterhalb des Deckels ist ein Schritt n -> p·m + (1 - churn - p + q)·n - q/m·n²,
+# also drei Koeffizienten für vier Parameter. Mit bekanntem Churn sind p, q und m bestimmt; ob die Daten sie auch
+# trennen, zeigt die Kondition von JᵀJ (sonst "nicht identifizierbar" statt Konfidenzintervall). Der Startbestand wird
+# mitgeschätzt: als fester Wert ginge das Rauschen der ersten Beobachtung in den ganzen Pfad ein.
+
+PARAMS = ("p", "q", "m")   # geschätzt: p, q je Jahr (wie p_pct, q_pct), m = Marktpotenzial in Kunden; churn je Jahr vorgegeben
+# Grobgitter in Jahreswerten; m als Vielfaches des höchsten beobachteten Kundenstands
+GRID = {"p": (1e-4, 0.5), "q": (0.0, 1.5), "m": (1.0, 10.0)}
+# Grenzen im Suchraum (log p, q, log m und Startbestand relativ zum Maximum)
+_LO = np.array([np.log(1e-6), 0.0, np.log(0.5), 0.0])
+_HI = np.array([np.log(2.0), 5.0, np.log(100.0), 2.0])
+_MAX_CELLS = 2_000_000  # Reihen × Gitterpunkte je Block
+Z95 = 1.959964
+# Richtungen mit Eigenwert der normierten JᵀJ unter MIN_EIGEN × größtem Eigenwert gelten als nicht bestimmt;
+# Parameter mit Anteil über MIN_LOADING an einer solchen Richtung bekommen kein Intervall
+MIN_EIGEN = 1e-8
+MIN_LOADING = 0.1
+_PERIOD_COLUMNS = {"periode", "jahr", "quartal", "monat", "t"}
+
+
+@dataclass
+class BassFit:
+    name: str
+    p: float
+    q: float
+    m: float
+    churn: float             # vorgegeben, nicht geschätzt
+    ci: dict                 # Parameter -> (untere, obere) Grenze des 95 %-Konfidenzintervalls; None = nicht identifizierbar
+    r2: float
+    rmse: float
+    mape: float
+    observations: int
+    periods_per_year: int
+    fitted: np.ndarray
+    observed: np.ndarray
+
+    def params(self, sam):
+        """Modell-Eingaben: p_pct, q_pct, cap_pct (Marktpotenzial als Anteil von sam) und churn in %."""
+        return {"p_pct": self.p, "q_pct": self.q, "cap_pct": 100 * self.m / sam if sam else 0.0, "churn": 100 * self.churn}
+
+    @property
+    def unidentified(self):
+        return [k for k in PARAMS if self.ci[k] is None]
+
+    def roa_ranges(self, sam, prefix):
+        """ROA Ranges aus den Konfidenzintervallen (C = Marktpotenzial / sam) unter den Schlüsseln {prefix}_p_min usw.
+
+        Eine Historie beschreibt einen Markt, keine Strategie: welche Strategie die Ranges bekommt, entscheidet der Aufrufer."""
+        if self.unidentified: raise ValueError(f"{self.name}: {', '.join(self.unidentified)} nicht identifizierbar, keine ROA Ranges")
+        out = {}
+        for key, name, scale in (("p", "p", 1.0), ("q", "q", 1.0), ("c", "m", 1 / sam if sam else 0.0)):
+            lo, hi = self.ci[name]
+            out[f"{prefix}_{key}_min"], out[f"{prefix}_{key}_max"] = lo * scale, hi * scale
+        return out
+
+
+def read_histories(source, encoding="utf-8-sig"):
+    """CSV mit einer Spalte je Produktlinie und einer Zeile je Periode (Pfad, Bytes oder Datei-Objekt) -> Zahlenspalten."""
+    if hasattr(source, "read"): source = source.read()
+    if isinstance(source, (bytes, bytearray)): text = bytes(source).decode(encoding, errors="replace")
+    else:
+        with open(source, encoding=encoding, errors="replace") as f: text = f.read()
+    text = text.lstrip("\ufeff")
+    sep, decimal = sniff(text)
+    df = pd.read_csv(io.StringIO(text), sep=sep, decimal=decimal, thousands="." if decimal == "," else None)
+    df = df.select_dtypes("number").drop(columns=[c for c in df.columns if str(c).strip().lower() in _PERIOD_COLUMNS], errors="ignore")
+    if df.empty: raise ValueError("Keine Spalten mit Kundenzahlen gefunden")
+    return df
+
+
+@dataclass
+class CalibrationResult:
+    fits: list
+    seconds: float
+
+
+def _series(histories):
+    # dict/DataFrame/Liste -> Namen, (Perioden × Reihen) mit NaN am Ende kürzerer Reihen
+    if isinstance(histories, pd.DataFrame): histories = {str(c): histories[c].to_numpy(dtype=np.float64) for c in histories.columns}
+    elif not isinstance(histories, dict): histories = {"Reihe 1": histories}
+    names = list(histories)
+    arrays = [np.asarray(pd.to_numeric(pd.Series(np.asarray(v).ravel()), errors="coerce"), dtype=np.float64) for v in histories.values()]
+    arrays = [a[:len(a) - np.argmax(~np.isnan(a[::-1]))] if (~np.isnan(a)).any() else a[:0] for a in arrays]  # NaN am Ende weg
+    for name, a in zip(names, arrays):
+        if np.count_nonzero(~np.isnan(a)) < 5: raise ValueError(f"{name}: mindestens 5 Beobachtungen nötig")
+        if np.isnan(a[0]): raise ValueError(f"{name}: erster Wert fehlt (Startbestand)")
+        if (a[~np.isnan(a)] < 0).any(): raise ValueError(f"{name}: negative Kundenzahlen")
+    y = np.full((max(len(a) for a in arrays), len(arrays)), np.nan)
+    for j, a in enumerate(arrays): y[:len(a), j] = a
+    return names, y
+
+
+def _churn(churn, names):
+    # Zahl für alle Reihen, dict Name -> Wert oder eine Zahl je Reihe; Anteil je Jahr
+    values = np.array([churn[name] for name in names] if isinstance(churn, dict) else np.broadcast_to(np.asarray(churn, dtype=np.float64), (len(names),)), dtype=np.float64)
+    if not ((values >= 0) & (values <= 1)).all(): raise ValueError("Churn muss je Jahr zwischen 0 und 1 liegen")
+    return values
+
+
+def _per_period(theta, churn, f):
+    # Suchraum -> Parameter je Periode wie in der Engine (p, q, churn / Perioden je Jahr); churn passend zu theta[..., 0]
+    return np.exp(theta[..., 0]) / f, theta[..., 1] / f, np.exp(theta[..., 2]), churn / f
+
+
+def _sse(y, w, theta, churn, f):
+    """Fehlerquadratsumme je (Reihe, Kandidat) ohne die Pfade zu speichern; y, w: (T, S), theta: (S, K, 4), churn: (S,)."""
+    p, q, m, churn = _per_period(theta, churn[:, None], f)
+    safe_m = np.where(m > 0, m, 1.0)
+    n = theta[..., 3].copy(); sse = w[0][:, None] * (n - y[0][:, None]) ** 2
+    for t in range(1, len(y)):
+        n = bass_step(n, p, q, m, churn, safe_m=safe_m)
+        sse += w[t][:, None] * (n - y[t][:, None]) ** 2
+    return sse
+
+
+def _paths(theta, churn, f, periods):
+    """Kundenpfade (T, *Form von theta ohne letzte Achse)."""
+    p, q, m, churn = _per_period(theta, churn, f)
+    safe_m = np.where(m > 0, m, 1.0)
+    out = np.empty((periods,) + p.shape)
+    out[0] = theta[..., 3]
+    for t in range(1, periods): bass_step(out[t - 1], p, q, m, churn, out=out[t], safe_m=safe_m)
+    return out
+
+
+def _grid(size):
+    axes = [np.log(np.geomspace(*GRID["p"], size)), np.linspace(*GRID["q"], size), np.log(np.geomspace(*GRID["m"], size))]
+    return np.stack([a.ravel() for a in np.meshgrid(*axes, indexing="ij")], axis=1)
+
+
+def _jacobian(y, w, theta, churn, f):
+    # Residuen und Vorwärtsdifferenzen für alle Reihen in einem Simulationslauf: (S, 5, 4) Varianten
+    k = theta.shape[1]
+    h = 1e-6 * np.maximum(1.0, np.abs(theta))
+    variants = np.repeat(theta[:, None, :], k + 1, axis=1)
+    variants[:, 1:, :] += np.eye(k)[None] * h[:, None, :]
+    path = _paths(variants, churn[:, None], f, len(y))           # (T, S, 5)
+    r = (path[:, :, 0] - y) * w                                  # (T, S)
+    J = (path[:, :, 1:] - path[:, :, :1]) / h[None] * w[:, :, None]  # (T, S, 4)
+    return r.T, J.transpose(1, 0, 2)
+
+
+def _levenberg_marquardt(y, w, theta, churn, f, iterations):
+    k = theta.shape[1]
+    lam = np.full(len(theta), 1e-2)
+    sse = (np.nan_to_num(_jacobian(y, w, theta, churn, f)[0]) ** 2).sum(axis=1)
+    for _ in range(iterations):
+        r, J = _jacobian(y, w, theta, churn, f)
+        A = np.einsum("stj,stk->sjk", J, J); g = np.einsum("stj,st->sj", J, r)
+        damp = lam[:, None, None] * (np.eye(k) * np.diagonal(A, axis1=1, axis2=2)[:, None, :] + 1e-12 * np.eye(k))
+        step = np.linalg.solve(A + damp, -g[..., None])[..., 0]
+        trial = np.clip(theta + step, _LO, _HI)
+        trial_sse = _sse(y, w, trial[:, None, :], churn, f)[:, 0]
+        better = trial_sse < sse
+        theta = np.where(better[:, None], trial, theta); sse = np.where(better, trial_sse, sse)
+        lam = np.where(better, lam / 3, lam * 4)
+        if (lam > 1e8).all() or (np.abs(step) < 1e-8).all(): break
+    return theta, sse
+
+
+def _covariance(J, s2):
+    # Kovarianz im Suchraum aus JᵀJ, normiert auf Einheitsdiagonale; schlecht bestimmte Richtungen abgeschnitten
+    A = np.einsum("stj,stk->sjk", J, J)
+    d = np.sqrt(np.clip(np.diagonal(A, axis1=1, axis2=2), 0, None)); d = np.where(d > 0, d, 1.0)
+    C = A / (d[:, :, None] * d[:, None, :])
+    eig, vec = np.linalg.eigh(C)
+    weak = eig <= MIN_EIGEN * eig.max(axis=1, keepdims=True)
+    identified = ~((np.abs(vec) > MIN_LOADING) & weak[:, None, :]).any(axis=2)
+    inv = np.einsum("sjk,sk,slk->sjl", vec, np.where(weak, 0.0, 1 / np.where(weak, 1.0, eig)), vec)
+    return inv / (d[:, :, None] * d[:, None, :]) * s2[:, None, None], identified
+
+
+def fit_many(histories, churn, periods_per_year=12, grid=8, starts=3, iterations=40):
+    """Bass-Parameter je Kundenreihe (dict Name -> Reihe, DataFrame mit einer Spalte je Reihe oder eine Reihe).
+
+    Kundenstände je Periode (periods_per_year: 12 = Monatswerte); der erste Wert ist der Startbestand.
+    churn je Jahr (0.1 = 10 %) für alle Reihen, als dict Name -> Wert oder eine Zahl je Reihe; wird nicht geschätzt."""
+    t0 = time.perf_counter()
+    names, raw = _series(histories)
+    churn = _churn(churn, names)
+    f = int(periods_per_year)
+    scale = np.nanmax(raw, axis=0); scale = np.where(scale > 0, scale, 1.0)
+    y = np.nan_to_num(raw / scale); w = (~np.isnan(raw)).astype(np.float64)
+    S = y.shape[1]
+
+    # 1. Grobgitter: alle Kandidaten für einen Block Reihen gleichzeitig
+    cand = _grid(grid); K = len(cand)
+    best = np.empty((S, min(starts, K)), dtype=np.int64)
+    per_block = max(1, _MAX_CELLS // K)
+    for a in range(0, S, per_block):
+        b = min(S, a + per_block)
+        theta = np.concatenate([np.broadcast_to(cand, (b - a, K, 3)), np.broadcast_to(y[0, a:b, None, None], (b - a, K, 1))], axis=2)
+        sse = _sse(y[:, a:b], w[:, a:b], theta, churn[a:b], f)
+        best[a:b] = np.argsort(sse, axis=1)[:, :best.shape[1]]
+
+    # 2. Verfeinerung ab den besten Gitterpunkten (Startbestand ab erster Beobachtung), alle Reihen × Starts als ein Batch
+    theta0 = np.concatenate([cand[best], np.broadcast_to(y[0][:, None, None], best.shape + (1,))], axis=2).reshape(-1, 4)
+    reps = best.shape[1]
+    theta, sse = _levenberg_marquardt(np.repeat(y, reps, axis=1), np.repeat(w, reps, axis=1), theta0, np.repeat(churn, reps), f, iterations)
+    pick = sse.reshape(S, reps).argmin(axis=1)
+    theta = theta.reshape(S, reps, 4)[np.arange(S), pick]; sse = sse.reshape(S, reps)[np.arange(S), pick]
+
+    # 3. Güte und Konfidenzintervalle (lineare Näherung am Optimum, im Suchraum -> zurücktransformiert)
+    r, J = _jacobian(y, w, theta, churn, f)
+    nobs = w.sum(axis=0)
+    cov, identified = _covariance(J, sse / np.maximum(nobs - 4, 1))
+    sd = np.sqrt(np.clip(np.diagonal(cov, axis1=1, axis2=2), 0, None))
+    lo, hi = np.clip(theta - Z95 * sd, _LO, _HI), np.clip(theta + Z95 * sd, _LO, _HI)
+    fitted = _paths(theta, churn, f, len(y)) * scale
+    fits = []
+    for j, name in enumerate(names):
+        obs = raw[:, j]; ok = ~np.isnan(obs); n = int(ok.sum())
+        resid = obs[ok] - fitted[ok, j]
+        sst = ((obs[ok] - obs[ok].mean()) ** 2).sum()
+        nz = ok & (obs > 0)
+        ci = {
+            "p": (float(np.exp(lo[j, 0])), float(np.exp(hi[j, 0]))), "q": (float(lo[j, 1]), float(hi[j, 1])),
+            "m": (float(np.exp(lo[j, 2]) * scale[j]), float(np.exp(hi[j, 2]) * scale[j])),
+        }
+        ci = {k: bounds if identified[j, i] else None for i, (k, bounds) in enumerate(ci.items())}
+        fits.append(BassFit(
+            name, float(np.exp(theta[j, 0])), float(theta[j, 1]), float(np.exp(theta[j, 2]) * scale[j]), float(churn[j]), ci,
+            r2=float(1 - (resid ** 2).sum() / sst) if sst > 0 else float("nan"), rmse=float(np.sqrt((resid ** 2).mean())),
+            mape=float(np.mean(np.abs((obs[nz] - fitted[nz, j]) / obs[nz]))) if nz.any() else float("nan"),
+            observations=n, periods_per_year=f, fitted=fitted[:len(obs[:np.flatnonzero(ok)[-1] + 1]), j], observed=obs[:np.flatnonzero(ok)[-1] + 1],
+        ))
+    return CalibrationResult(fits, time.perf_counter() - t0)
+
+
+def fit_bass(series, churn, periods_per_year=12, **kwargs):
+    """Eine Kundenreihe -> BassFit."""
+    return fit_many({"Reihe 1": series}, churn, periods_per_year, **kwargs).fits[0]
+
+
+def summary(fits):
+    """Eine Zeile je Reihe: Parameter, Konfidenzintervalle (leer, wenn nicht identifizierbar) und Güte."""
+    rows = []
+    for fit in fits:
+        row = {"Reihe": fit.name}
+        for k in PARAMS:
+            row[k] = getattr(fit, k); row[f"{k} von"], row[f"{k} bis"] = fit.ci[k] or (np.nan, np.nan)
+        row.update({"churn (vorgegeben)": fit.churn, "Nicht identifizierbar": ", ".join(fit.unidentified),
+                    "R²": fit.r2, "RMSE": fit.rmse, "MAPE": fit.mape, "Beobachtungen": fit.observations})
+        rows.append(row)
+    return pd.DataFrame(rows)
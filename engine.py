@@ -0,0 +1,633 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from assets import AssetRegister
+from profiling import count, span
+
+# ==========================================
+# 0. STAMMDATEN (ohne Streamlit)
+# ==========================================
+
+DEFAULTS = {
+    # Markt (Basis)
+    "sam": 50000.0, "cap_pct": 5.0, "p_pct": 0.03, "q_pct": 0.38, "churn": 5.0,
+
+    # ARPU Steuerung
+    "use_manual_arpu": False,
+    "manual_arpu_val": 1500.0,
+
+    # ROA Strategie Defaults
+    "roa_std_p_min": 0.005, "roa_std_p_max": 0.010,
+    "roa_std_q_min": 0.150, "roa_std_q_max": 0.250,
+    "roa_std_c_min": 0.030, "roa_std_c_max": 0.050,
+
+    "roa_fight_p_min": 0.030, "roa_fight_p_max": 0.050,
+    "roa_fight_q_min": 0.200, "roa_fight_q_max": 0.300,
+    "roa_fight_c_min": 0.080, "roa_fight_c_max": 0.120,
+    "roa_fight_discount": 25.0,
+
+    # Finanzierung
+    "equity": 50000.0, "loan_initial": 0.0, "min_cash": 10000.0, "loan_rate": 5.0, "wacc": 10.0,
+    # Personal
+    "wage_inc": 2.0, "inflation": 2.0, "lnk_pct": 25.0, "target_rev_per_fte": 120000.0,
+    # Zeitachse (Horizont in Jahren, Perioden je Jahr: 1 = jährlich, 12 = monatlich)
+    "horizon_years": 10, "periods_per_year": 1,
+    # Ops
+    "tax_rate": 25.0, "dso": 30, "dpo": 30, "cac": 250.0,
+    "capex_annual": 2000, "depreciation_misc": 5,
+    # Hardware Preise
+    "price_laptop": 1500, "ul_laptop": 3,
+    "price_phone": 800, "ul_phone": 2,
+    "price_car": 35000, "ul_car": 6,
+    "price_truck": 50000, "ul_truck": 8,
+    "price_desk": 1000, "ul_desk": 10,
+}
+
+# Spalten-Schemata der drei Tabellen: "text", "float" oder "bool"
+JOB_SCHEMA = {
+    "Job Titel": "text", "Jahresgehalt (€)": "float", "FTE Jahr 1": "float",
+    "Laptop": "bool", "Smartphone": "bool", "Auto": "bool", "LKW": "bool", "Büro": "bool",
+    "Sonstiges (€)": "float",
+}
+PRODUCT_SCHEMA = {
+    "Produkt": "text", "Preis (€)": "float", "Avg. Rabatt (%)": "float",
+    "Herstellungskosten (COGS €)": "float", "Take Rate (%)": "float",
+    "Wiederkauf Rate (%)": "float", "Wiederkauf alle (Monate)": "float",
+}
+COST_CENTER_SCHEMA = {
+    "Kostenstelle": "text", "Grundwert Jahr 1 (€)": "float", "Umsatz-Kopplung (%)": "float",
+}
+
+# Asset-Klasse -> (Preis-Key, Nutzungsdauer-Key); "Misc" läuft über capex_annual
+ASSET_CONF = {
+    "Laptop": ("price_laptop", "ul_laptop"), "Smartphone": ("price_phone", "ul_phone"),
+    "Auto": ("price_car", "ul_car"), "LKW": ("price_truck", "ul_truck"), "Büro": ("price_desk", "ul_desk"),
+}
+
+ASSET_CLASSES = list(ASSET_CONF) + ["Misc"]
+
+RESULT_COLUMNS = [
+    "Periode", "Jahr", "Kunden", "Umsatz", "Wareneinsatz (COGS)", "Personalkosten", "FTE Total",
+    "Kostenstellen", "Marketing (CAC)", "Gesamtkosten (OPEX)", "EBITDA", "Abschreibungen", "EBIT",
+    "Zinsen", "EBT", "Steuern", "Jahresüberschuss", "Verlustvortrag",
+    "Investitionen (Assets)", "Operativer Cashflow", "Kasse vor Finanzierung", "Kreditaufnahme", "Tilgung", "Net Cash Change",
+    "Anlagevermögen", "Forderungen LL", "Kasse", "Summe Aktiva",
+    "Eigenkapital", "Bankdarlehen", "Verb. LL", "Summe Passiva",
+]
+
+# Bestimmen die Form der Zeitachse bzw. den Rechenweg -> nicht je Szenario variierbar
+STRUCTURAL_KEYS = {"use_manual_arpu", "horizon_years", "periods_per_year"}
+PERIODS_PER_YEAR = {1: "Jahr", 4: "Quartal", 12: "Monat"}
+MAX_HORIZON_YEARS = 50
+
+# Verdichtung von Perioden auf Jahre: Bestände -> Periodenende, Kasse vor Finanzierung -> Tiefstwert, Flüsse -> Summe
+STOCK_METRICS = {
+    "Kunden", "FTE Total", "Verlustvortrag", "Anlagevermögen", "Forderungen LL", "Kasse", "Summe Aktiva",
+    "Eigenkapital", "Bankdarlehen", "Verb. LL", "Summe Passiva",
+}
+MIN_METRICS = {"Kasse vor Finanzierung"}
+
+TABLES = ("jobs", "products", "cost_centers")
+# Schlüssel der Tabellen in config.json (Import/Export) -> Tabelle
+CONFIG_TABLES = {"jobs": "jobs", "prod": "products", "cc": "cost_centers"}
+
+N_START = 10.0
+
+
+def safe_float(value, default=0.0):
+    try:
+        if value is None or (isinstance(value, str) and not value.strip()) or pd.isna(value):
+            return default
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+# ==========================================
+# 1. MODELL-EINGABEN
+# ==========================================
+
+def _normalize_param(key, value):
+    default = DEFAULTS[key]
+    if isinstance(default, bool): return bool(value)
+    if key in STRUCTURAL_KEYS: return int(safe_float(value, default))
+    return safe_float(value, float(default))
+
+
+def _freeze_table(data, schema):
+    df = pd.DataFrame(data) if data is not None else pd.DataFrame()
+    n = len(df)
+    cols = {}
+    for col, kind in schema.items():
+        raw = df[col] if col in df.columns else pd.Series([None] * n, dtype=object)
+        # Typisierte Spalten (Bulk-Import) ohne Umweg übernehmen; immer kopieren, da das Ergebnis schreibgeschützt wird
+        if kind == "float":
+            if raw.dtype.kind not in "fiub": raw = pd.to_numeric(raw, errors="coerce")
+            arr = raw.to_numpy(dtype=np.float64, na_value=0.0, copy=True)
+        elif kind == "bool":
+            arr = raw.to_numpy(dtype=bool, copy=True) if raw.dtype == bool else raw.map(lambda v: bool(v) and not pd.isna(v)).to_numpy(dtype=bool)
+        elif isinstance(raw.dtype, pd.CategoricalDtype):
+            codes = raw.cat.codes.to_numpy()
+            arr = np.append(raw.cat.categories.astype(str).to_numpy(dtype=object), "")[codes]  # Code -1 (fehlend) -> ""
+        else:
+            arr = raw.astype(object).where(raw.notna(), "").astype(str).to_numpy(dtype=object)
+        arr.flags.writeable = False
+        cols[col] = arr
+    return MappingProxyType(cols)
+
+
+def _table_digest(table):
+    h = hashlib.sha256()
+    for col, arr in table.items():
+        h.update(col.encode())
+        if arr.dtype == object: h.update("\x1f".join(arr).encode())
+        else: h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+@dataclass(frozen=True, eq=False)
+class ModelInputs:
+    """Unveränderlicher, hashbarer Snapshot aller Modell-Eingaben."""
+    params: MappingProxyType
+    jobs: MappingProxyType
+    products: MappingProxyType
+    cost_centers: MappingProxyType
+    digest: str = field(init=False, repr=False)
+    table_digests: MappingProxyType = field(init=False, repr=False)
+
+    def __post_init__(self):
+        tables = {name: _table_digest(getattr(self, name)) for name in TABLES}
+        h = hashlib.sha256(json.dumps(dict(self.params), sort_keys=True).encode())
+        for name in TABLES: h.update(tables[name].encode())
+        object.__setattr__(self, "table_digests", MappingProxyType(tables))
+        object.__setattr__(self, "digest", h.hexdigest())
+
+    @classmethod
+    def build(cls, params=None, jobs=None, products=None, cost_centers=None):
+        params = params or {}
+        norm = {k: _normalize_param(k, params.get(k, v)) for k, v in DEFAULTS.items()}
+        return cls(
+            params=MappingProxyType(norm),
+            jobs=_freeze_table(jobs, JOB_SCHEMA),
+            products=_freeze_table(products, PRODUCT_SCHEMA),
+            cost_centers=_freeze_table(cost_centers, COST_CENTER_SCHEMA),
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        """Eingaben aus einer config.json (DEFAULTS-Keys + jobs/prod/cc), fehlende Keys -> DEFAULTS."""
+        if not isinstance(config, dict): raise ValueError("Konfiguration muss ein JSON-Objekt sein")
+        return cls.build(config, **{name: config.get(key) for key, name in CONFIG_TABLES.items()})
+
+    def to_config(self):
+        config = dict(self.params)
+        for key, name in CONFIG_TABLES.items(): config[key] = self.table(name).to_dict("records")
+        return config
+
+    def __getitem__(self, key):
+        return self.params[key]
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __eq__(self, other):
+        return isinstance(other, ModelInputs) and other.digest == self.digest
+
+    def __reduce__(self):
+        return (_restore_inputs, (dict(self.params), dict(self.jobs), dict(self.products), dict(self.cost_centers)))
+
+    def table(self, name):
+        return pd.DataFrame(dict(getattr(self, name)))
+
+    def replace(self, **params):
+        merged = dict(self.params); merged.update(params)
+        return ModelInputs.build(merged, dict(self.jobs), dict(self.products), dict(self.cost_centers))
+
+
+def _restore_inputs(params, jobs, products, cost_centers):
+    for table in (jobs, products, cost_centers):
+        for arr in table.values(): arr.flags.writeable = False
+    return ModelInputs(MappingProxyType(params), MappingProxyType(jobs), MappingProxyType(products), MappingProxyType(cost_centers))
+
+
+def _rollup(arr, f, metric):
+    # (..., Perioden) -> (..., Jahre)
+    shaped = arr.reshape(*arr.shape[:-1], -1, f)
+    if metric in STOCK_METRICS: return shaped[..., -1]
+    if metric in MIN_METRICS: return shaped.min(axis=-1)
+    return shaped.sum(axis=-1)
+
+
+@dataclass(frozen=True)
+class ScenarioResult:
+    """Spaltenorientiertes Ergebnis: ein NumPy-Array je GuV/Cashflow/Bilanz-Kennzahl und Periode."""
+    columns: dict
+    periods_per_year: int = 1
+
+    def __getitem__(self, col):
+        return self.columns[col]
+
+    def __len__(self):
+        return len(self.columns["Jahr"])
+
+    def to_frame(self):
+        return pd.DataFrame(self.columns, columns=[c for c in RESULT_COLUMNS if c in self.columns])
+
+    def annual(self):
+        f = self.periods_per_year
+        if f == 1: return self
+        cols = {"Jahr": np.arange(1, len(self) // f + 1)}
+        cols.update({m: _rollup(v, f, m) for m, v in self.columns.items() if m not in ("Jahr", "Periode")})
+        return ScenarioResult(cols)
+
+# ==========================================
+# 2. BERECHNUNGSLOGIK
+# ==========================================
+
+def unit_economics(inputs):
+    """ARPU und COGS-Quote aus der Produkttabelle (oder manuellem ARPU)."""
+    prods = inputs.products
+    price = prods["Preis (€)"]; cogs = prods["Herstellungskosten (COGS €)"]
+    active = price > 0
+    has_prod = bool(active.any())
+    if inputs["use_manual_arpu"]:
+        w_arpu = price[active].sum(); w_cogs = cogs[active].sum()
+        base_arpu = inputs["manual_arpu_val"]
+    else:
+        take = prods["Take Rate (%)"] / 100
+        months = prods["Wiederkauf alle (Monate)"]
+        rep = prods["Wiederkauf Rate (%)"] / 100
+        cycles = np.divide(12.0, months, out=np.zeros_like(months), where=months > 0)
+        freq = np.where((months > 0) & (cycles >= 1), 1.0 + rep * (cycles - 1), 1.0)
+        w_arpu = (price * take * freq)[active].sum()
+        w_cogs = (cogs * take * freq)[active].sum()
+        base_arpu = w_arpu if has_prod and w_arpu > 0 else 1500.0
+    base_cogs_ratio = (w_cogs / w_arpu) if (has_prod and w_arpu > 0) else 0.15
+    return base_arpu, float(base_cogs_ratio)
+
+
+METRICS = RESULT_COLUMNS[2:]
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """Szenario × Periode × Kennzahl als ein 3-D Array (Achse 2 folgt METRICS)."""
+    values: np.ndarray
+    periods_per_year: int = 1
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def periods(self):
+        return np.arange(1, self.values.shape[1] + 1)
+
+    @property
+    def years(self):
+        return (self.periods - 1) // self.periods_per_year + 1
+
+    def metric(self, name):
+        return self.values[:, :, METRICS.index(name)]
+
+    def scenario(self, i):
+        cols = {"Periode": self.periods} if self.periods_per_year > 1 else {}
+        cols["Jahr"] = self.years
+        cols.update({m: self.values[i, :, k].copy() for k, m in enumerate(METRICS)})
+        return ScenarioResult(cols, self.periods_per_year)
+
+    def annual(self):
+        f = self.periods_per_year
+        if f == 1: return self
+        return BatchResult(np.stack([_rollup(self.values[:, :, k], f, m) for k, m in enumerate(METRICS)], axis=2))
+
+
+class _Run:
+    """Kontext eines Rechenlaufs: Parameter (mit Overrides je Szenario), Tabellen, Szenario-Arrays.
+
+    Jeder Zugriff wird in `reads` protokolliert -> daraus ergibt sich, welche Eingaben eine Stufe liest."""
+
+    def __init__(self, inputs, scenario, overrides, cols):
+        self.inputs = inputs; self.scenario = scenario; self.cols = cols
+        self.n = len(scenario["p"]); self.T = cols["Kunden"].shape[0]
+        self.overrides = {}; self.aux = {}; self.reads = set()
+        for k, v in (overrides or {}).items():
+            if k not in DEFAULTS: raise KeyError(f"Unbekannter Parameter: {k}")
+            if k in STRUCTURAL_KEYS: raise ValueError(f"{k} kann nicht je Szenario variiert werden")
+            self.overrides[k] = np.broadcast_to(np.asarray(v, dtype=np.float64), (self.n,))
+
+    def __getitem__(self, key):
+        self.reads.add(key)
+        if key in self.scenario: return self.scenario[key]
+        return self.overrides[key] if key in self.overrides else self.inputs[key]
+
+    def table(self, name):
+        self.reads.add(name)
+        return getattr(self.inputs, name)
+
+    products = property(lambda self: self.table("products"))
+    jobs = property(lambda self: self.table("jobs"))
+    cost_centers = property(lambda self: self.table("cost_centers"))
+
+    def fingerprint(self, keys):
+        h = hashlib.sha256()
+        for key in sorted(keys):
+            h.update(key.encode())
+            if key in TABLES: h.update(self.inputs.table_digests[key].encode())
+            else: h.update(np.ascontiguousarray(self[key], dtype=np.float64).tobytes())
+        return h.hexdigest()
+
+
+def _products(run):
+    run.aux["econ"] = unit_economics(run)
+
+
+def bass_step(n_prev, p, q, m, churn, out=None, safe_m=None):
+    """Kunden der Folgeperiode: Bass-Adoption plus verbliebene Kunden, gedeckelt auf das Marktpotenzial m (p, q, churn je Periode)."""
+    if safe_m is None: safe_m = np.where(m > 0, m, 1.0)
+    adoption = np.where(m > 0, p * (m - n_prev) + q * (n_prev / safe_m) * (m - n_prev), 0.0)
+    return np.minimum(n_prev * (1 - churn) + adoption, m, out=out)
+
+
+def _diffusion(run):
+    base_arpu, base_cogs_ratio = run.aux["econ"]
+    P, Q, C, D = run["p"], run["q"], run["market_share"], run["discount_pct"]
+    cols = run.cols
+    calc_arpu = base_arpu * (1 - (D / 100.0))
+    abs_cogs_per_customer = base_arpu * base_cogs_ratio
+    f = run["periods_per_year"]
+    M = run["sam"] * C; churn = run["churn"] / 100 / f; P = P / f; Q = Q / f
+    safe_m = np.where(M > 0, M, 1.0)
+    kunden = cols["Kunden"]; acquired = np.empty_like(kunden)
+    kunden[0] = N_START; acquired[0] = N_START
+    for t in range(1, len(kunden)):
+        n_prev = kunden[t - 1]
+        bass_step(n_prev, P, Q, M, churn, out=kunden[t], safe_m=safe_m)
+        np.maximum(0.0, kunden[t] - n_prev * (1 - churn), out=acquired[t])
+    np.multiply(kunden, calc_arpu / f, out=cols["Umsatz"])
+    np.multiply(kunden, abs_cogs_per_customer / f, out=cols["Wareneinsatz (COGS)"])
+    run.aux["acquired"] = acquired
+
+
+def _personnel(run):
+    # FTE je Rolle = max(Basis, Ziel-FTE * Anteil) -> alle Rollen skalieren mit demselben Faktor,
+    # die Jobtabelle reduziert sich daher auf gewichtete Summen.
+    cols = run.cols
+    jobs = run.jobs; base = jobs["FTE Jahr 1"]; base_ftes = base.sum()
+    f = run["periods_per_year"]
+    rev = cols["Umsatz"]; T = len(rev)
+    tgt = run["target_rev_per_fte"]
+    target_fte = np.where(tgt > 0, rev * f / np.where(tgt > 0, tgt, 1.0), 0.0)
+    pos = base >= 0
+    ratio = target_fte / base_ftes if base_ftes > 0 else None
+    up = None if ratio is None else np.maximum(1.0, ratio)
+    down = None if ratio is None or pos.all() else np.minimum(1.0, ratio)
+
+    def agg(w):
+        if ratio is None: return np.zeros_like(rev)
+        wb = w * base
+        res = wb[pos].sum() * up
+        return res if down is None else res + wb[~pos].sum() * down
+
+    # Gehalt mit Lohnsteigerung und Lohnnebenkosten; "Sonstiges (€)" je FTE und Jahr mit Inflation, ohne Lohnnebenkosten
+    years = (np.arange(T) // f)[:, None]
+    wage_idx = (1 + run["wage_inc"] / 100) ** years; infl_idx = (1 + run["inflation"] / 100) ** years
+    cols["Personalkosten"][:] = (agg(jobs["Jahresgehalt (€)"]) * wage_idx * (1 + run["lnk_pct"] / 100) + agg(jobs["Sonstiges (€)"]) * infl_idx) / f
+    cols["FTE Total"][:] = agg(1.0)
+    run.aux["hw_needs"] = {hw: agg(jobs[hw].astype(np.float64)) for hw in ASSET_CONF}
+    run.aux["fte_factor"] = (up, down)
+
+
+def _role_detail(run):
+    # FTE und Personalkosten je Rolle (Perioden × Rollen, Szenario 0) aus den Faktoren von _personnel
+    jobs = run.jobs; base = jobs["FTE Jahr 1"]; up, down = run.aux["fte_factor"]
+    T = run.T; f = run["periods_per_year"]
+    if up is None: fte = np.zeros((T, len(base)))
+    else: fte = base * np.where(base >= 0, up[:, :1], (up if down is None else down)[:, :1])
+    years = (np.arange(T) // f)[:, None]
+    wage_idx = (1 + run["wage_inc"] / 100) ** years; infl_idx = (1 + run["inflation"] / 100) ** years
+    cost = fte * (jobs["Jahresgehalt (€)"] * wage_idx * (1 + run["lnk_pct"] / 100) + jobs["Sonstiges (€)"] * infl_idx) / f
+    return {"FTE": fte, "Personalkosten": cost}
+
+
+def _cost_centers(run):
+    # Kostenstellen mit gleicher Umsatz-Kopplung entwickeln sich proportional -> Gruppen je Kopplung
+    ccs = run.cost_centers
+    coupling, inv = np.unique(ccs["Umsatz-Kopplung (%)"] / 100, return_inverse=True)
+    f = run["periods_per_year"]
+    base = np.bincount(inv, weights=ccs["Grundwert Jahr 1 (€)"], minlength=len(coupling)) / f
+    rev = run.cols["Umsatz"]; out = run.cols["Kostenstellen"]
+    state = np.tile(base[:, None], (1, rev.shape[1]))
+    infl = (1 + run["inflation"] / 100) ** (1 / f)
+    out[0] = base.sum()
+    for t in range(1, len(rev)):
+        prev = rev[t - 1]
+        growth = np.where(prev > 0, (rev[t] - prev) / np.where(prev > 0, prev, 1.0), 0.0)
+        state = state * infl * (1 + coupling[:, None] * growth)
+        out[t] = state.sum(axis=0)
+
+
+def _assets(run):
+    # Vintage-Matrix je Asset-Klasse; "Misc" kauft jede Periode capex_annual / f fest zu
+    cols = run.cols; hw_needs = run.aux["hw_needs"]
+    T, n = cols["Investitionen (Assets)"].shape
+    f = run["periods_per_year"]; capex = run["capex_annual"]
+    plans = [(run[pk], run[uk]) for pk, uk in ASSET_CONF.values()]
+    plans.append((np.where(capex > 0, capex, 0.0) / f, run["depreciation_misc"]))
+    # (Klassen, 1) solange kein Preis/keine Nutzungsdauer je Szenario variiert -> schneller Pfad im Register
+    width = n if any(np.ndim(x) for plan in plans for x in plan) else 1
+    prices = np.stack([np.broadcast_to(price, (width,)) for price, _ in plans])
+    lives = np.stack([np.broadcast_to(np.maximum(1, np.trunc(ul)) * f, (width,)) for _, ul in plans])
+    needs = np.zeros((T, len(plans), n)); forced = np.zeros_like(needs)
+    for c, hw in enumerate(ASSET_CONF): needs[:, c] = hw_needs[hw]
+    forced[:, -1] = 1.0
+    reg = AssetRegister(ASSET_CLASSES, prices, lives).build(needs, forced)
+    reg.values.sum(axis=1, out=cols["Investitionen (Assets)"])
+    reg.depreciation().sum(axis=1, out=cols["Abschreibungen"])
+    np.cumsum(cols["Investitionen (Assets)"] - cols["Abschreibungen"], axis=0, out=cols["Anlagevermögen"])
+    run.aux["assets"] = reg
+
+
+def _operating(run):
+    cols = run.cols
+    np.multiply(run.aux["acquired"], run["cac"], out=cols["Marketing (CAC)"])
+    np.add(cols["Personalkosten"] + cols["Kostenstellen"], cols["Marketing (CAC)"], out=cols["Gesamtkosten (OPEX)"])
+    cols["EBITDA"][:] = cols["Umsatz"] - cols["Wareneinsatz (COGS)"] - cols["Gesamtkosten (OPEX)"]
+    np.subtract(cols["EBITDA"], cols["Abschreibungen"], out=cols["EBIT"])
+    f = run["periods_per_year"]  # Bestände auf Basis des annualisierten Periodenvolumens
+    cols["Forderungen LL"][:] = cols["Umsatz"] * (f * run["dso"] / 365)
+    cols["Verb. LL"][:] = (cols["Wareneinsatz (COGS)"] + cols["Kostenstellen"]) * (f * run["dpo"] / 365)
+
+
+def _financing(run):
+    # Zinsen, Steuern mit Verlustvortrag, Cashflow und Kredit-Automatik (hält Mindest-Cash).
+    # Zinsen mindern die Steuerbasis und hängen vom Kreditstand ab -> Steuern und Finanzierung bilden eine Stufe.
+    cols = run.cols; T, n = cols["EBIT"].shape
+    debt = np.broadcast_to(run["loan_initial"], (n,)).astype(np.float64)
+    cash = run["equity"] + debt
+    loss_carry = np.zeros(n); retained = np.zeros(n); ar_prev = np.zeros(n); ap_prev = np.zeros(n)
+    rate = run["loan_rate"] / 100 / run["periods_per_year"]; tax_rate = run["tax_rate"] / 100; min_cash = run["min_cash"]
+    for t in range(T):
+        interest = debt * rate
+        ebt = cols["EBIT"][t] - interest
+        neg = ebt < 0
+        used = np.where(neg, 0.0, np.minimum(loss_carry, ebt))
+        tax = np.where(neg, 0.0, (ebt - used) * tax_rate)
+        loss_carry = np.where(neg, loss_carry - ebt, loss_carry - used)
+        net = ebt - tax; retained = retained + net
+        ar = cols["Forderungen LL"][t]; ap = cols["Verb. LL"][t]
+        ocf = net + cols["Abschreibungen"][t] - (ar - ar_prev) + (ap - ap_prev)
+        cash_pre = cash + ocf - cols["Investitionen (Assets)"][t]
+        short = cash_pre < min_cash
+        borrow = np.where(short, min_cash - cash_pre, 0.0)
+        repay = np.where(short, 0.0, np.minimum(debt, cash_pre - min_cash))
+        debt = debt + borrow - repay
+        new_cash = cash_pre + borrow - repay
+        for name, val in (("Zinsen", interest), ("EBT", ebt), ("Steuern", tax), ("Jahresüberschuss", net),
+                          ("Verlustvortrag", loss_carry), ("Operativer Cashflow", ocf), ("Kasse vor Finanzierung", cash_pre),
+                          ("Kreditaufnahme", borrow), ("Tilgung", repay), ("Net Cash Change", new_cash - cash),
+                          ("Kasse", new_cash), ("Bankdarlehen", debt)):
+            cols[name][t] = val
+        cols["Eigenkapital"][t] = retained; cols["Eigenkapital"][t] += run["equity"]
+        cash = new_cash; ar_prev, ap_prev = ar, ap
+    np.add(cols["Anlagevermögen"] + cols["Forderungen LL"], cols["Kasse"], out=cols["Summe Aktiva"])
+    np.add(cols["Eigenkapital"] + cols["Bankdarlehen"], cols["Verb. LL"], out=cols["Summe Passiva"])
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: object
+    deps: tuple
+    writes: tuple
+
+
+# Rechenstufen in topologischer Reihenfolge: (Name, Funktion, vorgelagerte Stufen, geschriebene Kennzahlen)
+STAGES = [
+    Stage("products", _products, (), ()),
+    Stage("diffusion", _diffusion, ("products",), ("Kunden", "Umsatz", "Wareneinsatz (COGS)")),
+    Stage("personnel", _personnel, ("diffusion",), ("Personalkosten", "FTE Total")),
+    Stage("cost_centers", _cost_centers, ("diffusion",), ("Kostenstellen",)),
+    Stage("assets", _assets, ("personnel",), ("Investitionen (Assets)", "Abschreibungen", "Anlagevermögen")),
+    Stage("operating", _operating, ("diffusion", "personnel", "cost_centers", "assets"),
+          ("Marketing (CAC)", "Gesamtkosten (OPEX)", "EBITDA", "EBIT", "Forderungen LL", "Verb. LL")),
+]
+_WRITTEN = {m for st in STAGES for m in st.writes}
+STAGES.append(Stage("financing", _financing, ("operating", "assets"), tuple(m for m in METRICS if m not in _WRITTEN)))
+
+
+def timeline(inputs):
+    """(Horizont in Jahren, Perioden je Jahr) aus den Eingaben, validiert."""
+    years = int(inputs["horizon_years"]); f = int(inputs["periods_per_year"])
+    if f not in PERIODS_PER_YEAR: raise ValueError(f"periods_per_year muss einer von {sorted(PERIODS_PER_YEAR)} sein")
+    if not 1 <= years <= MAX_HORIZON_YEARS: raise ValueError(f"horizon_years muss zwischen 1 und {MAX_HORIZON_YEARS} liegen")
+    return years, f
+
+
+def _prepare(inputs, p, q, market_share, discount_pct, overrides):
+    # Overrides zählen mit -> Szenario-Anzahl auch allein über Override-Arrays bestimmbar
+    args = [np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (p, q, market_share, discount_pct, *(overrides or {}).values())]
+    P, Q, C, D = np.broadcast_arrays(*args)[:4]
+    years, f = timeline(inputs)
+    # Spalten vorab allokiert, intern Kennzahl × Periode × Szenario -> jeder Perioden-Schritt liegt zusammenhängend
+    buf = np.zeros((len(METRICS), years * f, P.shape[0]))
+    scenario = {"p": P, "q": Q, "market_share": C, "discount_pct": D}
+    return _Run(inputs, scenario, overrides, dict(zip(METRICS, buf))), buf
+
+
+def calculate_batch(inputs, p, q, market_share, discount_pct=0.0, overrides=None):
+    """Viele Szenarien auf einmal: p, q, Marktanteil, Discount (und Overrides) als Arrays der Länge n."""
+    run, buf = _prepare(inputs, p, q, market_share, discount_pct, overrides)
+    count("engine.calls"); count("engine.scenarios", run.n)
+    for stage in STAGES:
+        with span(f"engine.{stage.name}", n=run.n): stage.fn(run)
+    return BatchResult(buf.transpose(2, 1, 0), run["periods_per_year"])
+
+
+def calculate(inputs, p_input, q_input, market_share_input, discount_pct=0.0):
+    return calculate_batch(inputs, p_input, q_input, market_share_input, discount_pct).scenario(0)
+
+
+def calculate_detail(inputs, p_input, q_input, market_share_input, discount_pct=0.0):
+    """Ein Szenario mit Detail für Exporte: (ScenarioResult, {"FTE", "Personalkosten"} je Periode × Rolle, AssetRegister)."""
+    run, buf = _prepare(inputs, p_input, q_input, market_share_input, discount_pct, None)
+    count("engine.calls"); count("engine.scenarios", run.n)
+    for stage in STAGES:
+        with span(f"engine.{stage.name}", n=run.n): stage.fn(run)
+    return BatchResult(buf.transpose(2, 1, 0), run["periods_per_year"]).scenario(0), _role_detail(run), run.aux["assets"]
+
+
+def finance(inputs, cols):
+    """Nur die Finanzierungsstufe auf gegebene operative Kennzahlen (je Kennzahl Perioden × Szenarien), z.B. Konzern-Cash-Pool.
+
+    cols muss alle METRICS enthalten; Zinsen, Steuern, Kasse, Kredit und Bilanzsummen werden darin überschrieben."""
+    n = cols["Kunden"].shape[1]
+    _financing(_Run(inputs, {"p": np.zeros(n)}, None, cols))
+    return cols
+
+# ==========================================
+# 3. STRATEGIE-VERGLEICH (ROA)
+# ==========================================
+
+# Strategie -> (Prefix der ROA Ranges, Discount-Key)
+STRATEGIES = {"Standard": ("roa_std", None), "Fighter": ("roa_fight", "roa_fight_discount")}
+
+
+def strategy_grid(inputs, strategy, steps=5):
+    """Gleichmäßiges Gitter über die p/q/C-Ranges einer Strategie -> (p, q, C, Discount) Arrays."""
+    prefix, disc_key = STRATEGIES[strategy]
+    axes = [np.linspace(inputs[f"{prefix}_{k}_min"], inputs[f"{prefix}_{k}_max"], steps) for k in ("p", "q", "c")]
+    p, q, c = (a.ravel() for a in np.meshgrid(*axes, indexing="ij"))
+    return p, q, c, np.full(p.shape, inputs[disc_key] if disc_key else 0.0)
+
+
+def strategy_midpoint(inputs, strategy):
+    """Mitte der p/q/C-Ranges einer Strategie -> (p, q, C, Discount) als Skalare."""
+    prefix, disc_key = STRATEGIES[strategy]
+    p, q, c = ((inputs[f"{prefix}_{k}_min"] + inputs[f"{prefix}_{k}_max"]) / 2 for k in ("p", "q", "c"))
+    return p, q, c, inputs[disc_key] if disc_key else 0.0
+
+# ==========================================
+# 4. INKREMENTELLE NEUBERECHNUNG
+# ==========================================
+
+class IncrementalEngine:
+    """Hält die Zwischenergebnisse des letzten Laufs und rechnet nur Stufen neu, deren gelesene Eingaben
+    sich geändert haben, plus alle nachgelagerten Stufen. `last_run` zeigt je Stufe "reused"/"computed"."""
+
+    def __init__(self):
+        self._buf = None; self._aux = {}
+        self._stage_state = {}  # Stufe -> (gelesene Keys, Fingerprint)
+        self.last_run = {}
+
+    @property
+    def stage_reads(self):
+        return {name: sorted(reads) for name, (reads, _) in self._stage_state.items()}
+
+    def reset(self):
+        self.__init__()
+
+    def run(self, inputs, p, q, market_share, discount_pct=0.0, overrides=None):
+        run, buf = _prepare(inputs, p, q, market_share, discount_pct, overrides)
+        same_shape = self._buf is not None and self._buf.shape == buf.shape
+        count("engine.calls"); count("engine.scenarios", run.n)
+        if same_shape:
+            buf[:] = self._buf; run.aux = dict(self._aux)
+        computed = set(); report = {}
+        for stage in STAGES:
+            prev = self._stage_state.get(stage.name)
+            dirty = (not same_shape or prev is None or any(d in computed for d in stage.deps)
+                     or run.fingerprint(prev[0]) != prev[1])
+            if dirty:
+                for m in stage.writes: run.cols[m][:] = 0.0
+                run.reads = set()
+                with span(f"engine.{stage.name}", n=run.n): stage.fn(run)
+                self._stage_state[stage.name] = (frozenset(run.reads), run.fingerprint(run.reads))
+                computed.add(stage.name)
+            report[stage.name] = "computed" if dirty else "reused"
+            count(f"engine.stages_{report[stage.name]}")
+        self._buf = buf; self._aux = run.aux; self.last_run = report
+        return BatchResult(buf.copy().transpose(2, 1, 0), run["periods_per_year"])
@@ -0,0 +1,233 @@
+import functools
+import io
+import re
+import tempfile
+import zipfile
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from engine import ASSET_CLASSES, METRICS, RESULT_COLUMNS, calculate_detail, timeline
+
+# ==========================================
+# EXPORT (Excel / CSV / Parquet, blockweise)
+# ==========================================
+# Jede Tabelle liefert ihre Zeilen als Folge von Blöcken (höchstens ROW_GROUP Zeilen) -> weder die Ergebnisse
+# noch die Ausgabe werden vorher als ein großer DataFrame aufgebaut. Mehrere Tabellen: Excel als Blätter einer
+# Mappe (write-only), CSV/Parquet als ZIP mit einer Datei je Tabelle.
+
+GUV_COLS = ["Jahr", "Kunden", "Umsatz", "Wareneinsatz (COGS)", "Personalkosten", "Kostenstellen", "Marketing (CAC)", "Gesamtkosten (OPEX)", "EBITDA", "Abschreibungen", "EBIT", "Zinsen", "Steuern", "Jahresüberschuss"]
+CF_COLS = ["Jahr", "Jahresüberschuss", "Abschreibungen", "Operativer Cashflow", "Investitionen (Assets)", "Kreditaufnahme", "Tilgung", "Net Cash Change", "Kasse"]
+BIL_COLS = ["Jahr", "Anlagevermögen", "Forderungen LL", "Kasse", "Summe Aktiva", "Eigenkapital", "Bankdarlehen", "Verb. LL", "Summe Passiva"]
+STATEMENTS = {"GuV": GUV_COLS, "Cashflow": CF_COLS, "Bilanz": BIL_COLS}
+ASSET_METRICS = ["Zugang (Stück)", "Zugang (€)", "Bestand (Stück)", "Abschreibung (€)", "Restbuchwert (€)", "Abgang (Stück)", "Abgang (€)", "Ersatzbeschaffung (Stück)"]
+
+ROW_GROUP = 50_000
+XLSX_MAX_ROWS = 1_048_575   # Excel-Grenze je Blatt ohne Kopfzeile -> Fortsetzungsblätter "Name (2)" ...
+FORMATS = {
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "text/csv"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+}
+# Dateigröße je Zelle, gemessen an Modellergebnissen -> Schätzung vor dem Export; ZIP (CSV mit mehreren Tabellen) ca. 40 %
+BYTES_PER_CELL = {"xlsx": 8.5, "csv": 15.0, "parquet": 5.6}
+ZIP_RATIO = 0.4
+SPOOL_BYTES = 64 * 2**20  # Download-Exporte ab dieser Größe beim Erzeugen auf Platte statt im Speicher
+
+
+@dataclass
+class Sheet:
+    """Eine Exporttabelle: Spalten und Zeilenzahl vorab bekannt, Zeilen erst beim Schreiben als Blöcke."""
+    name: str
+    columns: list
+    rows: int
+    blocks: Callable   # () -> Iterator[pd.DataFrame] mit genau diesen Spalten
+
+    @classmethod
+    def from_frame(cls, name, df):
+        return cls(name, list(df.columns), len(df), lambda: (df.iloc[a:a + ROW_GROUP] for a in range(0, len(df), ROW_GROUP)))
+
+
+def _periods(T, f):
+    # Zeitspalten wie ScenarioResult: "Periode" nur bei unterjähriger Rechnung
+    period = np.arange(1, T + 1)
+    return {"Periode": period, "Jahr": (period - 1) // f + 1} if f > 1 else {"Jahr": period}
+
+
+def _chunked(rows_per_unit, units):
+    # Einheiten (Perioden, Szenarien, ...) je Block, sodass ein Block etwa ROW_GROUP Zeilen hat
+    per = max(1, ROW_GROUP // max(rows_per_unit, 1))
+    return ((a, min(units, a + per)) for a in range(0, units, per))
+
+
+def detail_sheets(inputs, p_input, q_input, market_share_input, discount_pct=0.0):
+    """Ein Szenario komplett: GuV, Cashflow, Bilanz (Jahre), Perioden-Detail, FTE je Rolle und Anlagenregister.
+
+    Gerechnet wird erst, wenn der erste Block geschrieben wird (einmal für alle Tabellen)."""
+    years, f = timeline(inputs); T = years * f
+    titles = np.asarray(inputs.jobs["Job Titel"], dtype=object); R = len(titles)
+    detail = functools.cache(lambda: calculate_detail(inputs, p_input, q_input, market_share_input, discount_pct))
+    annual = functools.cache(lambda: detail()[0].annual().to_frame())
+    time_cols = list(_periods(1, f))
+
+    def statement(cols):
+        return lambda: iter([annual()[cols]])
+
+    def periods():
+        df = detail()[0].to_frame()
+        return (df.iloc[a:a + ROW_GROUP] for a in range(0, len(df), ROW_GROUP))
+
+    def roles():
+        _, role, _ = detail()
+        for a, b in _chunked(R, T):
+            cols = {c: np.repeat(v[a:b], R) for c, v in _periods(T, f).items()}
+            cols.update({"Rolle": np.tile(np.arange(1, R + 1), b - a), "Job Titel": np.tile(titles, b - a)})
+            cols.update({k: v[a:b].ravel() for k, v in role.items()})
+            yield pd.DataFrame(cols)
+
+    def assets():
+        summary = detail()[2].summary()
+        cols = {c: np.repeat(v, len(ASSET_CLASSES)) for c, v in _periods(T, f).items()}
+        cols["Klasse"] = np.tile(np.asarray(ASSET_CLASSES, dtype=object), T)
+        cols.update({k: summary[k].ravel() for k in ASSET_METRICS})
+        yield pd.DataFrame(cols)
+
+    sheets = [Sheet(name, cols, years, statement(cols)) for name, cols in STATEMENTS.items()]
+    if f > 1: sheets.append(Sheet("Perioden", list(RESULT_COLUMNS), T, periods))
+    sheets.append(Sheet("Personal", time_cols + ["Rolle", "Job Titel", "FTE", "Personalkosten"], T * R, roles))
+    sheets.append(Sheet("Anlagen", time_cols + ["Klasse"] + ASSET_METRICS, T * len(ASSET_CLASSES), assets))
+    return sheets
+
+
+def batch_sheet(name, batch, params=None):
+    """BatchResult als lange Tabelle (Szenario × Periode), Blöcke über Szenarien; params: Spalte -> Wert je Szenario."""
+    n, T, _ = batch.values.shape
+    params = {k: np.broadcast_to(np.asarray(v), (n,)) for k, v in (params or {}).items()}
+    time_cols = _periods(T, batch.periods_per_year)
+
+    def blocks():
+        for a, b in _chunked(T, n):
+            cols = {"Szenario": np.repeat(np.arange(a + 1, b + 1), T)}
+            cols.update({k: np.repeat(v[a:b], T) for k, v in params.items()})
+            cols.update({k: np.tile(v, b - a) for k, v in time_cols.items()})
+            values = batch.values[a:b].reshape(-1, len(METRICS))
+            cols.update({m: values[:, j] for j, m in enumerate(METRICS)})
+            yield pd.DataFrame(cols)
+    return Sheet(name, ["Szenario", *params, *time_cols, *METRICS], n * T, blocks)
+
+
+def portfolio_sheets(group):
+    """Konzern: konsolidierte Jahreswerte, Gesellschaften (lang, eine nach der anderen) und Eliminierungen."""
+    def entities():
+        for name, df in group.entities.items(): yield df.assign(Gesellschaft=name)[["Gesellschaft", *df.columns]]
+    columns = ["Gesellschaft", *next(iter(group.entities.values())).columns] if group.entities else ["Gesellschaft"]
+    return [Sheet.from_frame("Konzern", group.consolidated),
+            Sheet("Gesellschaften", columns, sum(len(df) for df in group.entities.values()), entities),
+            Sheet.from_frame("Eliminierungen", group.eliminations)]
+
+
+def monte_carlo_sheet(results):
+    """Perzentile je Strategie, Kennzahl und Jahr (die Ziehungen selbst werden nicht gespeichert)."""
+    return Sheet.from_frame("Monte Carlo", pd.concat([r.to_frame() for r in results.values()], ignore_index=True))
+
+
+def estimate(sheets, fmt):
+    """(Zeilen, geschätzte Bytes) vor dem Export."""
+    rows = sum(s.rows for s in sheets)
+    size = sum((s.rows + 1) * len(s.columns) for s in sheets) * BYTES_PER_CELL[fmt]
+    return rows, int(size * ZIP_RATIO if fmt == "csv" and len(sheets) > 1 else size)
+
+
+def file_name(base, sheets, fmt):
+    # Excel: alle Tabellen in einer Mappe; CSV/Parquet mit mehreren Tabellen als ZIP
+    if fmt == "xlsx" or len(sheets) == 1: return f"{base}.{fmt}", FORMATS[fmt][1]
+    return f"{base}_{fmt}.zip", "application/zip"
+
+
+def format_for(path):
+    fmt = str(path).lower().rsplit(".", 1)[-1]
+    if fmt not in FORMATS: raise ValueError(f"Unbekanntes Exportformat: {path} (erlaubt: {', '.join(FORMATS)})")
+    return fmt
+
+
+def available_formats():
+    """Formate, deren optionale Bibliotheken installiert sind (Reihenfolge wie FORMATS)."""
+    out = []
+    for fmt, module in (("xlsx", "openpyxl"), ("csv", None), ("parquet", "pyarrow.parquet")):
+        try:
+            if module: __import__(module)
+        except ImportError: continue
+        out.append(fmt)
+    return out
+
+
+def _write_csv(sheet, fh, sep=",", decimal=".", encoding="utf-8"):
+    text = io.TextIOWrapper(fh, encoding=encoding, newline="", write_through=True)
+    header = True
+    for block in sheet.blocks():
+        block.to_csv(text, sep=sep, decimal=decimal, index=False, header=header); header = False
+    if header: pd.DataFrame(columns=sheet.columns).to_csv(text, sep=sep, index=False)
+    text.flush(); text.detach()  # fh bleibt offen (ZIP-Eintrag / Datei des Aufrufers)
+
+
+def _write_parquet(sheet, fh, **_):
+    try: import pyarrow as pa, pyarrow.parquet as pq
+    except ImportError as e: raise ImportError("Parquet-Export braucht pyarrow") from e
+    writer = None
+    for block in sheet.blocks():
+        table = pa.Table.from_pandas(block, preserve_index=False)
+        if writer is None: writer = pq.ParquetWriter(fh, table.schema)
+        writer.write_table(table.cast(writer.schema))  # ein Row Group je Block
+    if writer is None: pq.write_table(pa.Table.from_pandas(pd.DataFrame(columns=sheet.columns), preserve_index=False), fh)
+    else: writer.close()
+
+
+def _sheet_title(name, part):
+    # Excel: höchstens 31 Zeichen, keine []:*?/\
+    suffix = f" ({part})" if part > 1 else ""
+    return re.sub(r"[\[\]:*?/\\]", "_", name)[:31 - len(suffix)] + suffix
+
+
+def _write_xlsx(sheets, fh):
+    try: from openpyxl import Workbook
+    except ImportError as e: raise ImportError("Excel-Export braucht openpyxl") from e
+    wb = Workbook(write_only=True)  # Zeilen gehen sofort in eine temporäre Datei je Blatt
+    for sheet in sheets:
+        ws = None; part = 0; filled = XLSX_MAX_ROWS
+        for block in sheet.blocks():
+            values = block.to_numpy(dtype=object)
+            values[pd.isna(values)] = None  # NaN wäre in Excel eine ungültige Zahl
+            for row in values:
+                if filled >= XLSX_MAX_ROWS:
+                    part += 1; filled = 0
+                    ws = wb.create_sheet(_sheet_title(sheet.name, part)); ws.append(sheet.columns)
+                ws.append(row.tolist()); filled += 1
+        if ws is None: wb.create_sheet(_sheet_title(sheet.name, 1)).append(sheet.columns)
+    wb.save(fh)
+
+
+_WRITERS = {"csv": _write_csv, "parquet": _write_parquet}
+
+
+def write(sheets, fmt, target, **csv_options):
+    """Tabellen blockweise in eine Datei schreiben (Pfad oder binäres Datei-Objekt); csv_options: sep, decimal, encoding."""
+    if fmt not in FORMATS: raise ValueError(f"Unbekanntes Exportformat: {fmt}")
+    if isinstance(target, str):
+        with open(target, "wb") as fh: return write(sheets, fmt, fh, **csv_options)
+    if fmt == "xlsx": return _write_xlsx(sheets, target)
+    writer = _WRITERS[fmt]
+    if len(sheets) == 1: return writer(sheets[0], target, **csv_options)
+    compression = zipfile.ZIP_STORED if fmt == "parquet" else zipfile.ZIP_DEFLATED  # Parquet ist schon komprimiert
+    with zipfile.ZipFile(target, "w", compression, compresslevel=1) as zf:  # Stufe 1: ~3x schneller, kaum größer
+        for sheet in sheets:
+            with zf.open(f"{sheet.name}.{fmt}", "w", force_zip64=True) as fh: writer(sheet, fh, **csv_options)
+
+
+def to_bytes(sheets, fmt, **csv_options):
+    """Für st.download_button(data=...): sheets (oder eine Funktion, die sie liefert) exportieren und als Bytes zurückgeben."""
+    if callable(sheets): sheets = sheets()
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as fh:
+        write(sheets, fmt, fh, **csv_options)
+        fh.seek(0); return fh.read()
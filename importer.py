@@ -0,0 +1,178 @@
+import io
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from engine import COST_CENTER_SCHEMA, JOB_SCHEMA, PRODUCT_SCHEMA
+
+# ==========================================
+# BULK-IMPORT (CSV / Parquet, blockweise)
+# ==========================================
+
+SCHEMAS = {"jobs": JOB_SCHEMA, "products": PRODUCT_SCHEMA, "cost_centers": COST_CENTER_SCHEMA}
+
+# Zulässige Wertebereiche; Zeilen außerhalb gelten als fehlerhaft
+RANGES = {
+    "Jahresgehalt (€)": (0, None), "FTE Jahr 1": (0, None), "Sonstiges (€)": (0, None),
+    "Preis (€)": (0, None), "Avg. Rabatt (%)": (0, 100), "Herstellungskosten (COGS €)": (0, None),
+    "Take Rate (%)": (0, 100), "Wiederkauf Rate (%)": (0, 100), "Wiederkauf alle (Monate)": (0, 120),
+    "Grundwert Jahr 1 (€)": (0, None), "Umsatz-Kopplung (%)": (-100, 100),
+}
+TRUE_WORDS = {"true", "wahr", "ja", "yes", "y", "x", "1", "1.0"}
+FALSE_WORDS = {"false", "falsch", "nein", "no", "n", "0", "0.0", ""}
+
+MAX_REPORTED = 1000  # Fehlerliste begrenzen, gezählt wird alles
+
+
+@dataclass
+class ImportResult:
+    table: pd.DataFrame                      # typisiert: float64, bool, Titel als category
+    errors: pd.DataFrame                     # Zeile (CSV: Dateizeile, sonst Datensatz ab 1), Spalte, Wert, Fehler
+    rows: int                                # gelesene Datenzeilen
+    bad_rows: int                            # fehlerhafte Zeilen (verworfen, außer kept_invalid)
+    missing_columns: list = field(default_factory=list)   # mit Standardwerten aufgefüllt
+    ignored_columns: list = field(default_factory=list)
+    seconds: float = 0.0
+    kept_invalid: bool = False               # fehlerhafte Zeilen nur gemeldet und wie von der Engine gelesen übernommen
+
+    @property
+    def ok(self):
+        return self.bad_rows == 0 and not self.missing_columns
+
+
+def _numbers(raw, decimal):
+    # Text -> float64 in einem Schritt je Spalte: Einheiten/Leerzeichen weg, deutsches Format auf Punkt
+    s = raw.astype("string").str.strip().str.replace(r"[€%\s]", "", regex=True)
+    if decimal == ",": s = s.str.replace(r"\.(?=\d{3}(?:\D|$))", "", regex=True).str.replace(",", ".", regex=False)  # nur Tausenderpunkte
+    empty = s.isna() | (s == "")
+    values = pd.to_numeric(s.mask(empty), errors="coerce").astype(np.float64)
+    return values, empty
+
+
+def coerce_frame(df, schema, decimal=".", first_line=2, keep_invalid=False):
+    """Ein Block roher Spalten -> (typisierter Block ohne fehlerhafte Zeilen, Fehlerliste, Anzahl fehlerhafter Zeilen).
+
+    keep_invalid: fehlerhafte Zeilen behalten wie die Engine sie liest (Nicht-Zahlen -> 0, Wertebereiche nicht erzwungen)."""
+    n = len(df)
+    bad = np.zeros(n, dtype=bool); issues = []
+    out = {}
+    for col, kind in schema.items():
+        if col not in df.columns:
+            out[col] = np.zeros(n) if kind == "float" else np.zeros(n, dtype=bool) if kind == "bool" else np.full(n, "", dtype=object)
+            continue
+        raw = df[col]
+        if kind == "float":
+            if raw.dtype.kind in "fiu": values, empty = raw.astype(np.float64), raw.isna()
+            else: values, empty = _numbers(raw, decimal)
+            finite = values.to_numpy(dtype=np.float64, na_value=0.0)
+            nan = (values.isna() & ~empty).to_numpy() | ~np.isfinite(finite)
+            lo, hi = RANGES.get(col, (None, None))
+            out_of_range = ((finite < lo) if lo is not None else False) | ((finite > hi) if hi is not None else False)
+            out_of_range = np.asarray(out_of_range) & ~nan
+            reason = np.where(nan, "keine Zahl", np.where(out_of_range, f"außerhalb {lo if lo is not None else '-∞'}..{hi if hi is not None else '∞'}", ""))
+            err = nan | out_of_range
+            out[col] = np.where(nan if keep_invalid else err, 0.0, finite)
+        elif kind == "bool":
+            if raw.dtype == bool: values, err = raw.to_numpy(), np.zeros(n, dtype=bool)
+            else:
+                s = raw.astype("string").str.strip().str.lower().fillna("")
+                values = s.isin(TRUE_WORDS).to_numpy(); err = ~(values | s.isin(FALSE_WORDS).to_numpy())
+            reason = np.where(err, "kein Ja/Nein", "")
+            out[col] = values
+        else:
+            out[col] = raw.astype("string").str.strip().fillna("").to_numpy(dtype=object)
+            continue
+        if err.any():
+            bad |= err
+            if len(issues) < MAX_REPORTED:
+                idx = np.flatnonzero(err)[:MAX_REPORTED - len(issues)]
+                vals = raw.to_numpy()[idx]
+                issues += [(first_line + i, col, str(v), r) for i, v, r in zip(idx, vals, reason[idx])]
+    keep = np.ones(n, dtype=bool) if keep_invalid else ~bad
+    block = pd.DataFrame({col: arr[keep] for col, arr in out.items()})
+    return block, issues, int(bad.sum())
+
+
+def sniff(head):
+    """(Trenner, Dezimalzeichen) aus der ersten Zeile; deutsche ERP-Exporte: ";" als Trenner und "," als Dezimalzeichen."""
+    first = head.splitlines()[0] if head else ""
+    if first.count(";") > first.count(","): return ";", ","
+    if first.count("\t") > first.count(","): return "\t", "."
+    return ",", "."
+
+
+def _csv_chunks(source, chunksize, sep, decimal, encoding):
+    if isinstance(source, (bytes, bytearray)): source = io.BytesIO(source)
+    if sep is None:
+        if hasattr(source, "read"):
+            pos = source.tell(); head = source.read(4096); source.seek(pos)
+            head = head.decode(encoding, errors="replace") if isinstance(head, bytes) else head
+        else:
+            with open(source, encoding=encoding, errors="replace") as f: head = f.read(4096)
+        sep, sniffed_decimal = sniff(head.lstrip("﻿"))
+        decimal = decimal or sniffed_decimal
+    # Alles als Text lesen -> Umwandlung und Prüfung einmal je Spalte und Block in coerce_frame
+    reader = pd.read_csv(source, sep=sep, dtype=str, keep_default_na=False, chunksize=chunksize, encoding=encoding, skipinitialspace=True)
+    return reader, decimal or "."
+
+
+def _parquet_chunks(source, chunksize):
+    try: import pyarrow.parquet as pq
+    except ImportError as e: raise ImportError("Parquet-Import braucht pyarrow") from e
+    if isinstance(source, (bytes, bytearray)): source = io.BytesIO(source)
+    return (batch.to_pandas() for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize))
+
+
+def read_table(source, table, fmt=None, chunksize=50_000, sep=None, decimal=None, encoding="utf-8-sig", progress=None):
+    """CSV/Parquet blockweise lesen, prüfen und typisieren (Pfad, Bytes oder Datei-Objekt)."""
+    t0 = time.perf_counter()
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    fmt = fmt or ("parquet" if str(name).lower().endswith((".parquet", ".pq")) else "csv")
+    if fmt == "parquet": return _import_chunks(_parquet_chunks(source, chunksize), table, ".", 1, progress, t0)
+    chunks, decimal = _csv_chunks(source, chunksize, sep, decimal, encoding)
+    return _import_chunks(chunks, table, decimal, 2, progress, t0)  # Zeile 1 = Kopfzeile
+
+
+def read_records(records, table, keep_invalid=False):
+    """Tabelle aus JSON-Records (config.json, Data-Editor) über dieselbe Prüfung typisieren.
+
+    keep_invalid: fehlerhafte Zeilen nur melden und so übernehmen, wie die Engine sie liest (Nicht-Zahlen -> 0,
+    Wertebereiche ungeprüft) -> bestehende Konfigurationen und Tabellen verlieren keine Zeilen."""
+    res = _import_chunks([pd.DataFrame(records if records is not None else [])], table, ".", 1, None, time.perf_counter(), keep_invalid)
+    res.kept_invalid = keep_invalid
+    return res
+
+
+def _import_chunks(chunks, table, decimal, first_line, progress, t0, keep_invalid=False):
+    schema = SCHEMAS[table]
+    blocks, issues = [], []; rows = bad_rows = 0; columns = None
+    for chunk in chunks:
+        if columns is None:
+            # Spaltennamen tolerant zuordnen (Groß/Klein, Leerzeichen)
+            lookup = {c.strip().lower(): c for c in schema}
+            columns = {str(c).strip(): lookup.get(str(c).strip().lower(), str(c).strip()) for c in chunk.columns}
+        chunk.columns = [columns[str(c).strip()] for c in chunk.columns]
+        block, block_issues, block_bad = coerce_frame(chunk, schema, decimal, first_line=rows + first_line, keep_invalid=keep_invalid)
+        blocks.append(block); rows += len(chunk); bad_rows += block_bad
+        issues += block_issues[:MAX_REPORTED - len(issues)]
+        if progress: progress(rows)
+
+    present = set((columns or {}).values())
+    result = pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame({c: [] for c in schema})
+    return ImportResult(
+        table=typed(result, table),
+        errors=pd.DataFrame(issues, columns=["Zeile", "Spalte", "Wert", "Fehler"]),
+        rows=rows, bad_rows=bad_rows,
+        missing_columns=[c for c in schema if c not in present] if rows else [],
+        ignored_columns=[c for c in (columns or {}).values() if c not in schema],
+        seconds=time.perf_counter() - t0,
+    )
+
+
+def typed(df, table):
+    """Schema-Spalten in Speicherform: float64, bool, Text als category."""
+    kinds = {"float": np.float64, "bool": bool, "text": "category"}
+    schema = SCHEMAS[table]
+    return df[list(schema)].astype({col: kinds[kind] for col, kind in schema.items()})
@@ -0,0 +1,125 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from profiling import bind, count, span
+
+# ==========================================
+# HINTERGRUND-JOBS (Pool, Fortschritt, Abbruch)
+# ==========================================
+# Ein Pool für alle Sessions des Servers -> höchstens max_workers Rechnungen/Reports gleichzeitig.
+# Die Session hält nur das Job-Handle; Reruns fragen Status und Fortschritt ab, ohne zu warten.
+
+WAITING, RUNNING, DONE, FAILED, CANCELLED, EXPIRED = "wartet", "läuft", "fertig", "fehlgeschlagen", "abgebrochen", "abgelaufen"
+FINISHED = {DONE, FAILED, CANCELLED, EXPIRED}
+_COUNTERS = {DONE: "jobs.done", FAILED: "jobs.failed", CANCELLED: "jobs.cancelled"}
+
+
+class Cancelled(Exception):
+    """Im Job beim nächsten Fortschritts-Aufruf ausgelöst, nachdem cancel() angefordert wurde."""
+
+
+class Job:
+    """Handle eines Hintergrund-Jobs; Status, Fortschritt und Ergebnis werden vom Worker-Thread gesetzt."""
+
+    def __init__(self, job_id, label, owner=None, meta=None):
+        self.id = job_id; self.label = label; self.owner = owner; self.meta = dict(meta or {})
+        self.status = WAITING; self.progress = None; self.message = ""
+        self.result = None; self.error = None; self.picked_up = False
+        self.submitted = time.time(); self.started = self.finished = None
+        self._cancel = threading.Event(); self._future = None
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def seconds(self):
+        if self.started is None: return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def report(self, fraction=None, message=None):
+        """Fortschritts-Callback für die Rechnung (0..1); bricht ab, wenn cancel() angefordert wurde."""
+        if self._cancel.is_set(): raise Cancelled()
+        if fraction is not None: self.progress = float(fraction)
+        if message is not None: self.message = message
+
+    def cancel(self):
+        # Wartende Jobs sofort, laufende beim nächsten report()
+        self._cancel.set()
+        if self._future is not None and self._future.cancel(): self._finish(CANCELLED)
+
+    def _finish(self, status):
+        self.finished = time.time(); self.status = status
+        count(_COUNTERS[status])
+
+
+class JobManager:
+    """Thread-Pool mit globalem Limit, Limit je Besitzer (Session) und TTL für fertige Jobs."""
+
+    def __init__(self, max_workers=2, ttl=1800.0, max_per_owner=4):
+        self.max_workers = max_workers; self.ttl = ttl; self.max_per_owner = max_per_owner
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}; self._lock = threading.Lock(); self._ids = itertools.count(1)
+
+    def submit(self, fn, *args, label="", owner=None, meta=None, progress_arg="progress", **kwargs):
+        """fn(*args, **kwargs) im Pool; mit progress_arg bekommt fn job.report als Fortschritts-Callback."""
+        self.evict()
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if j.owner == owner and not j.done)
+            if owner is not None and active >= self.max_per_owner:
+                raise RuntimeError(f"Höchstens {self.max_per_owner} offene Jobs je Sitzung")
+            job = Job(next(self._ids), label or getattr(fn, "__name__", "Job"), owner, meta)
+            self._jobs[job.id] = job
+        if progress_arg: kwargs[progress_arg] = job.report
+        job._future = self._pool.submit(self._run, job, bind(fn), args, kwargs)  # Spans im Tracer des Aufrufers
+        count("jobs.submitted")
+        return job
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        if job._cancel.is_set(): return job._finish(CANCELLED)
+        job.status = RUNNING; job.started = time.time()
+        try:
+            with span("job", label=job.label): result = fn(*args, **kwargs)
+        except Cancelled: job._finish(CANCELLED)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"; job._finish(FAILED)
+        else:
+            job.result = result; job.progress = 1.0; job._finish(DONE)
+
+    def get(self, job_id):
+        with self._lock: return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        self.evict()
+        with self._lock: return [j for j in self._jobs.values() if owner is None or j.owner == owner]
+
+    def evict(self):
+        # Fertige Jobs nach Ablauf der TTL verwerfen; Ergebnis freigeben, auch wenn eine Session das Handle noch hält
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            old = [j for j in self._jobs.values() if j.done and j.finished < cutoff]
+            for j in old:
+                del self._jobs[j.id]; j.status = EXPIRED; j.result = None
+        return len(old)
+
+    def stats(self):
+        self.evict()
+        with self._lock: statuses = [j.status for j in self._jobs.values()]
+        return {"running": statuses.count(RUNNING), "waiting": statuses.count(WAITING), "finished": sum(s in FINISHED for s in statuses),
+                "workers": self.max_workers}
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for j in self.jobs(): j.cancel()
+        self._pool.shutdown(wait=True)
+
+
+# Prozessweiter Pool: Streamlit importiert Module einmal pro Server -> Limit gilt für alle Sessions
+JOBS = JobManager(
+    max_workers=int(os.environ.get("FINMOD_JOB_WORKERS", 2)),
+    ttl=float(os.environ.get("FINMOD_JOB_TTL", 1800)),
+)
@@ -0,0 +1,153 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from engine import STRATEGIES, calculate_batch
+
+# ==========================================
+# MONTE CARLO (ROA Strategien)
+# ==========================================
+
+MC_METRICS = ["Kasse", "EBITDA", "NPV", "Min. Kasse"]
+QUANTILES = {"P5": 0.05, "P50": 0.50, "P95": 0.95}
+
+
+class QuantileSketch:
+    """Mergebarer Quantil-Sketch: je Spalte höchstens parts * k gewichtete Stützstellen (k=4096: P5/P50/P95 auf < 0,5 % genau)."""
+
+    def __init__(self, k=4096, parts=8):
+        self.k = k; self.max_parts = parts
+        self.parts = []  # (Stützstellen (m, Spalten), Gewicht je Stützstelle)
+
+    @property
+    def count(self):
+        return sum(len(pts) * w for pts, w in self.parts)
+
+    def update(self, x):
+        x = np.sort(np.asarray(x, dtype=np.float64), axis=0)
+        m = len(x)
+        if m > self.k:
+            x = x[((np.arange(self.k) + 0.5) * m / self.k).astype(np.int64)]
+        self._add(x, m / len(x))
+
+    def merge(self, other):
+        for pts, w in other.parts: self._add(pts, w)
+        return self
+
+    def _add(self, pts, w):
+        self.parts.append((pts, w))
+        if len(self.parts) > self.max_parts: self.compact()
+
+    def _weighted(self, ranks):
+        pts = np.concatenate([p for p, _ in self.parts])
+        w = np.concatenate([np.full(len(p), wt) for p, wt in self.parts])
+        order = np.argsort(pts, axis=0)
+        cum = np.cumsum(w[order], axis=0)
+        total = cum[-1, 0]
+        out = np.empty((len(ranks), pts.shape[1]))
+        for j in range(pts.shape[1]):
+            idx = np.minimum(np.searchsorted(cum[:, j], ranks * total), len(pts) - 1)
+            out[:, j] = pts[order[idx, j], j]
+        return out, total
+
+    def compact(self):
+        if len(self.parts) <= 1: return
+        pts, total = self._weighted((np.arange(self.k) + 0.5) / self.k)
+        self.parts = [(pts, total / self.k)]
+
+    def quantile(self, q):
+        return self._weighted(np.atleast_1d(np.asarray(q, dtype=np.float64)))[0]
+
+
+@dataclass
+class _Partial:
+    sketch: QuantileSketch
+    n: int
+    total: np.ndarray
+    breach: np.ndarray
+
+
+@dataclass
+class MonteCarloResult:
+    strategy: str
+    draws: int
+    years: np.ndarray
+    quantiles: dict  # Kennzahl -> DataFrame (Jahr × P5/P50/P95)
+    mean: pd.DataFrame
+    breach_by_year: np.ndarray  # P(Kasse vor Finanzierung < min_cash bis einschl. Jahr t)
+
+    @property
+    def breach_prob(self):
+        return float(self.breach_by_year[-1])
+
+    def to_frame(self):
+        parts = [df.assign(Kennzahl=m) for m, df in self.quantiles.items()]
+        return pd.concat(parts, ignore_index=True).assign(Strategie=self.strategy)
+
+
+def sample_strategy(inputs, strategy, n, rng):
+    prefix, disc_key = STRATEGIES[strategy]
+    p, q, c = (rng.uniform(inputs[f"{prefix}_{k}_min"], inputs[f"{prefix}_{k}_max"], n) for k in ("p", "q", "c"))
+    return p, q, c, inputs[disc_key] if disc_key else 0.0
+
+
+def _run_chunk(inputs, strategy, size, seed, chunk_id, k):
+    # Eigener Seed je (Strategie, Chunk) -> reproduzierbar unabhängig von der Worker-Verteilung
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(list(STRATEGIES).index(strategy), chunk_id)))
+    res = calculate_batch(inputs, *sample_strategy(inputs, strategy, size, rng)).annual()
+    disc = (1 + inputs["wacc"] / 100) ** -res.years.astype(np.float64)
+    fcf = res.metric("Operativer Cashflow") - res.metric("Investitionen (Assets)")
+    min_cash = np.minimum.accumulate(res.metric("Kasse vor Finanzierung"), axis=1)
+    x = np.concatenate([res.metric("Kasse"), res.metric("EBITDA"), np.cumsum(fcf * disc, axis=1), min_cash], axis=1)
+    sketch = QuantileSketch(k); sketch.update(x)
+    return _Partial(sketch, size, x.sum(axis=0), (min_cash < inputs["min_cash"]).sum(axis=0))
+
+
+def _ordered_results(pool, fn, arg_list, window):
+    # Höchstens `window` Chunks gleichzeitig unterwegs -> Speicher unabhängig von der Anzahl Draws
+    pending = deque()
+    for args in arg_list:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= window: yield pending.popleft().result()
+    while pending: yield pending.popleft().result()
+
+
+def run_monte_carlo(inputs, strategies=None, draws=100_000, seed=42, workers=None, chunk_size=20_000, k=4096, progress=None):
+    """Zieht `draws` Szenarien je Strategie aus den ROA Ranges und aggregiert streamend."""
+    strategies = list(strategies or STRATEGIES)
+    workers = workers or os.cpu_count() or 1
+    tasks = []
+    for s in strategies:
+        for i, start in enumerate(range(0, draws, chunk_size)):
+            tasks.append((s, min(chunk_size, draws - start), seed, i))
+    acc = {s: None for s in strategies}
+
+    def consume(results):
+        for done, ((s, *_), part) in enumerate(zip(tasks, results), 1):
+            if acc[s] is None: acc[s] = part
+            else:
+                acc[s].sketch.merge(part.sketch); acc[s].n += part.n
+                acc[s].total += part.total; acc[s].breach += part.breach
+            if progress: progress(done / len(tasks))
+
+    if workers == 1:
+        consume(_run_chunk(inputs, *t, k) for t in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            consume(_ordered_results(pool, _run_chunk, [(inputs, *t, k) for t in tasks], 2 * workers))
+
+    years = np.arange(1, len(acc[strategies[0]].breach) + 1)
+    T = len(years); out = {}
+    for s, part in acc.items():
+        qs = part.sketch.quantile(list(QUANTILES.values()))
+        quantiles = {
+            m: pd.DataFrame({"Jahr": years, **{name: qs[i, j * T:(j + 1) * T] for i, name in enumerate(QUANTILES)}})
+            for j, m in enumerate(MC_METRICS)
+        }
+        mean = pd.DataFrame({"Jahr": years, **{m: part.total[j * T:(j + 1) * T] / part.n for j, m in enumerate(MC_METRICS)}})
+        out[s] = MonteCarloResult(s, part.n, years, quantiles, mean, part.breach / part.n)
+    return out
@@ -0,0 +1,183 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+from cache import RESULT_CACHE, scenario_key
+from engine import METRICS, STAGES, ModelInputs, calculate, finance
+
+# ==========================================
+# PORTFOLIO / KONZERN (Konsolidierung)
+# ==========================================
+# Jede Gesellschaft ist eine normale config.json und wird eigenständig gerechnet (Ergebnis-Cache je Gesellschaft ->
+# nach einer Änderung wird nur die geänderte neu gerechnet). Konsolidierung auf Jahreswerten:
+# Summe der Gesellschaften - konzerninterne Umsätze/Aufwände und Forderungen/Verbindlichkeiten.
+# Mit Cash-Pool finanziert sich der Konzern als Einheit: die Finanzierungsstufe der Engine läuft einmal auf den
+# konsolidierten operativen Zahlen (gemeinsamer Mindest-Cash, Pool-Kredit, Steuern als Organschaft).
+
+IC_COST_COLUMNS = ("Kostenstellen", "Wareneinsatz (COGS)")  # Aufwandsposition des Käufers
+# Von der Engine vor der Finanzierung geschrieben -> mit Cash-Pool die Basis der Konzern-Finanzierung
+OPERATING_METRICS = {m for stage in STAGES if stage.name != "financing" for m in stage.writes}
+
+
+@dataclass(frozen=True)
+class Intercompany:
+    """Konzerninterne Lieferung: Umsatz beim Verkäufer, Aufwand (cost) beim Käufer; Betrag in Jahr 1, dann mit growth_pct p.a."""
+    seller: str
+    buyer: str
+    amount: float
+    growth_pct: float = 0.0
+    cost: str = "Kostenstellen"
+
+    def amounts(self, years):
+        return self.amount * (1 + self.growth_pct / 100) ** np.arange(years)
+
+
+@dataclass(frozen=True)
+class CashPool:
+    enabled: bool = False
+    min_cash: float = 0.0     # Mindest-Cash des Konzerns statt je Gesellschaft
+    loan_rate: float = 5.0    # Zins des Pool-Kredits %
+    tax_rate: float = 25.0    # Steuersatz der Organschaft %
+
+
+@dataclass(frozen=True)
+class Portfolio:
+    entities: dict = field(default_factory=dict)   # Name -> ModelInputs
+    intercompany: tuple = ()
+    cash_pool: CashPool = CashPool()
+
+    def __post_init__(self):
+        for ic in self.intercompany:
+            for role in ("seller", "buyer"):
+                if getattr(ic, role) not in self.entities: raise KeyError(f"Unbekannte Gesellschaft: {getattr(ic, role)}")
+            if ic.seller == ic.buyer: raise ValueError(f"{ic.seller}: Verkäufer und Käufer sind gleich")
+            if ic.cost not in IC_COST_COLUMNS: raise ValueError(f"Aufwandsposition muss eine von {IC_COST_COLUMNS} sein")
+
+    @classmethod
+    def from_config(cls, config):
+        """{"entities": {Name: config.json}, "intercompany": [...], "cash_pool": {...}}"""
+        if not isinstance(config, dict) or not isinstance(config.get("entities"), dict):
+            raise ValueError("Portfolio braucht ein Objekt 'entities' (Name -> Konfiguration)")
+        entities = {str(name): ModelInputs.from_config(c) for name, c in config["entities"].items()}
+        ics = tuple(Intercompany(**ic) for ic in config.get("intercompany", []))
+        return cls(entities, ics, CashPool(**config.get("cash_pool", {})))
+
+    def to_config(self):
+        return {
+            "entities": {name: inputs.to_config() for name, inputs in self.entities.items()},
+            "intercompany": [ic.__dict__.copy() for ic in self.intercompany],
+            "cash_pool": self.cash_pool.__dict__.copy(),
+        }
+
+    def with_entity(self, name, inputs):
+        return replace(self, entities={**self.entities, name: inputs})
+
+    def without_entity(self, name):
+        return replace(self, entities={k: v for k, v in self.entities.items() if k != name},
+                       intercompany=tuple(ic for ic in self.intercompany if name not in (ic.seller, ic.buyer)))
+
+
+@dataclass
+class PortfolioResult:
+    entities: dict               # Name -> Jahreswerte (eigenständig finanziert)
+    consolidated: pd.DataFrame   # Konzern-Jahreswerte nach Eliminierung (und ggf. Cash-Pool)
+    eliminations: pd.DataFrame   # je Jahr und Lieferung: eliminierter Umsatz/Aufwand und Saldo
+    recomputed: list             # in diesem Lauf gerechnete Gesellschaften (übrige aus dem Cache)
+    warnings: list
+    seconds: float
+    portfolio: Portfolio = None  # gerechneter Stand -> App erkennt veraltete Ergebnisse
+
+    def contributions(self, metric):
+        """Beitrag je Gesellschaft (vor Eliminierung) als Jahr × Gesellschaft."""
+        years = self.consolidated["Jahr"]
+        return pd.DataFrame({name: df[metric].to_numpy()[:len(years)] for name, df in self.entities.items()}, index=years)
+
+
+def _args(inputs):
+    # Haupt-Szenario wie in der App und in batch.py
+    return inputs["p_pct"], inputs["q_pct"], inputs["cap_pct"] / 100, 0.0
+
+
+def _calculate_entity(inputs):
+    return calculate(inputs, *_args(inputs))
+
+
+def evaluate_entities(portfolio, workers=None, cache=None):
+    """Ergebnis je Gesellschaft; nur Gesellschaften ohne Cache-Treffer werden gerechnet, mehrere parallel im Prozess-Pool."""
+    cache = cache or RESULT_CACHE
+    keys = {name: scenario_key("calculate", inputs, *_args(inputs)) for name, inputs in portfolio.entities.items()}
+    results = {name: cache.get(key) for name, key in keys.items()}
+    missing = [name for name, res in results.items() if res is None]
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            computed = list(pool.map(_calculate_entity, [portfolio.entities[name] for name in missing]))
+    else:
+        computed = [_calculate_entity(portfolio.entities[name]) for name in missing]
+    for name, res in zip(missing, computed):
+        cache.put(keys[name], res); results[name] = res
+    return results, missing
+
+
+def _eliminate(portfolio, annual, total, years, warnings):
+    # Noch nicht eliminierte Werte je Gesellschaft: mehrere Lieferungen derselben Gesellschaft teilen sich ihren Umsatz/Aufwand
+    left = {name: {m: np.maximum(a[m][:years], 0.0) for m in ("Umsatz", *IC_COST_COLUMNS, "Forderungen LL", "Verb. LL")} for name, a in annual.items()}
+    rows = []
+    for ic in portfolio.intercompany:
+        seller, buyer = left[ic.seller], left[ic.buyer]
+        dso = portfolio.entities[ic.seller]["dso"]
+        amount = ic.amounts(years)
+        # Nicht mehr eliminieren, als Verkäufer an Umsatz bzw. Käufer an Aufwand in der Periode hat (Eingabefehler sonst
+        # als fremder Umsatz/Aufwand einer anderen Gesellschaft eliminiert)
+        flow = np.minimum(amount, np.minimum(seller["Umsatz"], buyer[ic.cost]))
+        balance = np.minimum(flow * dso / 365, np.minimum(seller["Forderungen LL"], buyer["Verb. LL"]))
+        if (flow < amount - 1e-6).any(): warnings.append(f"{ic.seller} -> {ic.buyer}: Betrag übersteigt Umsatz von {ic.seller} bzw. {ic.cost} von {ic.buyer}, gekürzt")
+        seller["Umsatz"] -= flow; buyer[ic.cost] -= flow
+        seller["Forderungen LL"] -= balance; buyer["Verb. LL"] -= balance
+        total["Umsatz"] -= flow; total[ic.cost] -= flow
+        if ic.cost == "Kostenstellen": total["Gesamtkosten (OPEX)"] -= flow
+        total["Forderungen LL"] -= balance; total["Verb. LL"] -= balance
+        total["Summe Aktiva"] -= balance; total["Summe Passiva"] -= balance
+        rows.append(pd.DataFrame({"Jahr": np.arange(1, years + 1), "Verkäufer": ic.seller, "Käufer": ic.buyer,
+                                  "Umsatz/Aufwand": flow, "Forderungen/Verbindlichkeiten": balance}))
+    columns = ["Jahr", "Verkäufer", "Käufer", "Umsatz/Aufwand", "Forderungen/Verbindlichkeiten"]
+    return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=columns)
+
+
+def _pool_financing(portfolio, total, years):
+    # Konzern als eine Einheit finanzieren: Eigenkapital und Start-Kredite addiert, gemeinsamer Mindest-Cash
+    pool = portfolio.cash_pool; entities = portfolio.entities.values()
+    group = ModelInputs.build({
+        "equity": sum(e["equity"] for e in entities), "loan_initial": sum(e["loan_initial"] for e in entities),
+        "min_cash": pool.min_cash, "loan_rate": pool.loan_rate, "tax_rate": pool.tax_rate,
+        "periods_per_year": 1, "horizon_years": years,
+    })
+    cols = {m: (total[m] if m in OPERATING_METRICS else np.zeros(years)).reshape(-1, 1).copy() for m in METRICS}
+    finance(group, cols)
+    return {m: v[:, 0] for m, v in cols.items()}
+
+
+def consolidate(portfolio, results, recomputed=(), t0=None):
+    t0 = t0 or time.perf_counter()
+    if not results: raise ValueError("Portfolio enthält keine Gesellschaft")
+    annual = {name: res.annual() for name, res in results.items()}
+    years = min(len(a) for a in annual.values())
+    warnings = []
+    if any(len(a) != years for a in annual.values()): warnings.append(f"Unterschiedliche Planungshorizonte: Konsolidierung über {years} Jahre")
+    total = {m: np.sum([a[m][:years] for a in annual.values()], axis=0) for m in METRICS}
+    eliminations = _eliminate(portfolio, annual, total, years, warnings)
+    if portfolio.cash_pool.enabled: total = _pool_financing(portfolio, total, years)
+    consolidated = pd.DataFrame({"Jahr": np.arange(1, years + 1), **total})
+    return PortfolioResult({name: a.to_frame() for name, a in annual.items()}, consolidated, eliminations,
+                           list(recomputed), warnings, time.perf_counter() - t0, portfolio)
+
+
+def evaluate(portfolio, workers=None, cache=None):
+    """Gesellschaften rechnen (nur geänderte) und konsolidieren."""
+    t0 = time.perf_counter()
+    results, recomputed = evaluate_entities(portfolio, workers, cache)
+    return consolidate(portfolio, results, recomputed, t0)
@@ -0,0 +1,165 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+
+# ==========================================
+# PROFILING (Spans, Zähler, Speicher je Rerun)
+# ==========================================
+# Bibliothekscode ruft nur span()/count() auf. Ohne aktiven Tracer im aktuellen Thread sind das ein
+# Thread-Local-Lookup und ein None-Vergleich -> im Normalbetrieb praktisch kostenlos.
+# Speicher: RSS des Prozesses zu Beginn und Ende eines Reruns (ein Lesezugriff, bremst keine anderen Sessions).
+# Der Wert ist prozessweit -> parallel laufende Sessions und Hintergrund-Jobs sind enthalten, eine Spitze
+# innerhalb des Reruns wird nicht erfasst.
+
+_local = threading.local()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss():
+    """Resident Set Size des Prozesses in Bytes (Linux /proc) oder None, wenn nicht lesbar."""
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _NoSpan:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "t0")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer; self.name = name; self.args = args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns(); return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, self.t0, time.perf_counter_ns(), self.args); return False
+
+
+class Tracer:
+    """Spans und Zähler einer Session; Puffer begrenzt, Reruns einzeln auswertbar."""
+
+    def __init__(self, max_events=50_000, track_memory=True):
+        self.events = deque(maxlen=max_events)   # (Name, Start ns, Ende ns, Thread-ID, Args)
+        self.runs = deque(maxlen=100)            # je Rerun: Start, Ende, RSS (Prozess), Zähler
+        self.counters = Counter()
+        self.track_memory = track_memory
+        self._run = None; self._lock = threading.Lock(); self._threads = {}
+
+    def span(self, name, **args):
+        return _Span(self, name, args)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+            if self._run is not None: self._run["counters"][name] += n
+
+    def _record(self, name, t0, t1, args):
+        tid = threading.get_ident()
+        with self._lock:
+            self.events.append((name, t0, t1, tid, args))
+            if tid not in self._threads: self._threads[tid] = threading.current_thread().name
+
+    def begin_run(self):
+        if self._run is not None: self.end_run()  # abgebrochener Rerun (st.rerun/st.stop)
+        activate(self)
+        self._run = {"start": time.perf_counter_ns(), "counters": Counter(), "rss_start": rss() if self.track_memory else None,
+                     "rss": None, "rss_delta": None}
+
+    def end_run(self):
+        run, self._run = self._run, None
+        if run is None: return None
+        run["end"] = time.perf_counter_ns()
+        if run["rss_start"] is not None:
+            run["rss"] = rss()
+            if run["rss"] is not None: run["rss_delta"] = run["rss"] - run["rss_start"]
+        self.runs.append(run)
+        activate(None)
+        return run
+
+    def summary(self, run=None):
+        """Spans eines Reruns je Name verdichtet: Anzahl, Summe und Maximum in ms, nach Summe sortiert."""
+        run = run or (self.runs[-1] if self.runs else None)
+        if run is None: return []
+        agg = {}
+        with self._lock: events = [e for e in self.events if run["start"] <= e[1] <= run["end"]]
+        for name, t0, t1, _, _ in events:
+            n, total, peak = agg.get(name, (0, 0, 0))
+            agg[name] = (n + 1, total + t1 - t0, max(peak, t1 - t0))
+        rows = [{"Span": k, "Anzahl": n, "Summe (ms)": total / 1e6, "Max (ms)": peak / 1e6} for k, (n, total, peak) in agg.items()]
+        return sorted(rows, key=lambda r: -r["Summe (ms)"])
+
+    def chrome_trace(self):
+        """Chrome Trace Event Format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        with self._lock: events = list(self.events); threads = dict(self._threads)
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}} for tid, name in threads.items()]
+        for name, t0, t1, tid, args in events:
+            trace.append({"name": name, "cat": name.split(".", 1)[0], "ph": "X", "ts": t0 / 1e3, "dur": (t1 - t0) / 1e3,
+                          "pid": pid, "tid": tid, "args": {k: _jsonable(v) for k, v in args.items()}})
+        for run in self.runs:
+            trace.append({"name": "rerun", "ph": "C", "ts": run["end"] / 1e3, "pid": pid,
+                          "args": {**run["counters"], **({"rss_mb": run["rss"] / 2**20} if run["rss"] is not None else {})}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export(self):
+        return json.dumps(self.chrome_trace())
+
+    def clear(self):
+        with self._lock: self.events.clear(); self.runs.clear(); self.counters.clear()
+
+
+def _jsonable(v):
+    return v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+
+
+def activate(tracer):
+    _local.tracer = tracer
+
+
+def current():
+    return getattr(_local, "tracer", None)
+
+
+def span(name, **args):
+    tracer = getattr(_local, "tracer", None)
+    return _NO_SPAN if tracer is None else tracer.span(name, **args)
+
+
+def count(name, n=1):
+    tracer = getattr(_local, "tracer", None)
+    if tracer is not None: tracer.count(name, n)
+
+
+def traced(name):
+    """Decorator: ganze Funktion als Span."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name): return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def bind(fn, tracer=None):
+    """fn so verpacken, dass sie in einem anderen Thread in den Tracer des Aufrufers schreibt."""
+    tracer = tracer or current()
+    if tracer is None: return fn
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        previous = current(); activate(tracer)
+        try: return fn(*args, **kwargs)
+        finally: activate(previous)
+    return inner
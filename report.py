@@ -0,0 +1,250 @@
+import os
+import tempfile
+import zlib
+from datetime import datetime
+from functools import lru_cache
+
+import fpdf
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from jobs import JOBS
+from profiling import span, traced
+
+# ==========================================
+# PDF GENERATOR
+# ==========================================
+
+# Latin-1 Ersatz für die Arial-Kernschrift von FPDF (Tabelle einmal gebaut, Ergebnisse je Text gecacht)
+# Rohe RGB-Bilder nur mit dem internen Bild-Layout von PyFPDF 1.7 (requirements.txt pinnt 1.7.2), sonst PNG über image()
+_RAW_IMAGES = fpdf.__version__.startswith("1.7.")
+
+_LATIN1 = str.maketrans({"€": "EUR", "ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+@lru_cache(maxsize=8192)
+def latin1(text):
+    return text.translate(_LATIN1).encode('latin-1', 'replace').decode('latin-1')
+
+
+def format_column(values):
+    """Ganze Spalte auf einmal formatieren -> (Texte, Ausrichtung); Zahlenspalten ohne Übersetzung."""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return [f"{v:,.0f}" for v in values.tolist()], 'R'
+    texts = [f"{v:,.0f}" if isinstance(v, (int, float)) else latin1(str(v)) for v in values.tolist()]
+    return texts, 'R' if all(isinstance(v, (int, float)) for v in values.tolist()) else 'L'
+
+
+class PDFReport(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created = datetime.now().strftime("%d.%m.%Y")
+
+    def fix_text(self, text):
+        if isinstance(text, (int, float)): return str(text)
+        if text is None: return ""
+        return latin1(str(text))
+
+    def header(self):
+        self.set_font('Arial', 'B', 16); self.set_text_color(44, 62, 80)
+        self.cell(0, 10, self.fix_text('Business Plan & Finanzmodell'), 0, 1, 'L')
+        self.set_font('Arial', 'I', 9); self.set_text_color(100, 100, 100)
+        self.cell(0, 5, self.fix_text(f'Generiert am: {self.created}'), 0, 1, 'L')
+        self.set_draw_color(200, 200, 200); self.line(10, 25, 287, 25); self.ln(10)
+
+    def footer(self):
+        self.set_y(-15); self.set_font('Arial', 'I', 8); self.set_text_color(128, 128, 128)
+        self.cell(0, 10, self.fix_text(f'Seite {self.page_no()}/{{nb}}'), 0, 0, 'C')
+
+    def section_title(self, title):
+        self.set_font('Arial', 'B', 14); self.set_text_color(0, 51, 102); self.set_fill_color(230, 240, 255)
+        self.cell(0, 10, self.fix_text(title), 0, 1, 'L', 1); self.ln(4)
+
+    def sub_title(self, title):
+        self.set_font('Arial', 'B', 11); self.set_text_color(0, 0, 0)
+        self.cell(0, 8, self.fix_text(title), 0, 1, 'L')
+
+    def add_key_value_table(self, data_dict, title="Parameter"):
+        self.sub_title(title); self.set_font('Arial', '', 9)
+        col_width = 80; row_height = 6
+        for k, v in data_dict.items():
+            self.set_font('Arial', 'B', 9); self.cell(col_width, row_height, self.fix_text(str(k)), 1)
+            self.set_font('Arial', '', 9)
+            val = f"{v:,.2f}" if isinstance(v, float) else str(v)
+            self.cell(col_width, row_height, self.fix_text(val), 1); self.ln()
+        self.ln(5)
+
+    def add_dataframe_table(self, df, col_widths=None):
+        with span("pdf.table", rows=len(df), cols=len(df.columns)): self._dataframe_table(df, col_widths)
+
+    def _dataframe_table(self, df, col_widths):
+        self.set_font('Arial', 'B', 8); self.set_fill_color(240, 240, 240)
+        if not col_widths: col_width = 277 / len(df.columns); widths = [col_width] * len(df.columns)
+        else: widths = col_widths
+        for i, col in enumerate(df.columns): self.cell(widths[i], 7, self.fix_text(str(col)), 1, 0, 'C', 1)
+        self.ln(); self.set_font('Arial', '', 8)
+        cols = [format_column(df.iloc[:, i]) for i in range(len(df.columns))]
+        for r in range(len(df)):
+            for (texts, align), width in zip(cols, widths): self.cell(width, 6, texts[r], 1, 0, align)
+            self.ln()
+        self.ln(5)
+
+    def add_chart(self, fig):
+        # Raster direkt aus dem Agg-Canvas als RGB-Bild einbetten: kein PNG, keine Temp-Datei und kein
+        # Alpha-Kanal (FPDF 1.7 liest PNGs nur von Platte und trennt Alpha zeilenweise per Regex ab)
+        canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+        if not (_RAW_IMAGES and isinstance(getattr(self, "images", None), dict)): return self._add_png(canvas)
+        with span("pdf.chart_render"): canvas.draw()
+        rgb = np.asarray(canvas.buffer_rgba())[:, :, :3]
+        h, w = rgb.shape[:2]
+        rows = np.zeros((h, 1 + 3 * w), dtype=np.uint8); rows[:, 1:] = rgb.reshape(h, -1)  # Zeilenfilter 0 (Predictor 15)
+        name = f"chart-{len(self.images) + 1}"
+        self.images[name] = {
+            'i': len(self.images) + 1, 'w': w, 'h': h, 'cs': 'DeviceRGB', 'bpc': 8, 'f': 'FlateDecode',
+            'dp': f'/Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns {w}', 'pal': '', 'trns': '',
+            'data': zlib.compress(rows.tobytes()),
+        }
+        self.image(name, x=30, w=230)
+        self.ln(5)
+
+    def _add_png(self, canvas):
+        # Öffentliche API (auch fpdf2): PNG über eine Temp-Datei, die FPDF beim image()-Aufruf einliest
+        fd, path = tempfile.mkstemp(suffix=".png")
+        try:
+            with span("pdf.chart_render"), os.fdopen(fd, "wb") as f: canvas.print_png(f)
+            self.image(path, x=30, w=230)
+        finally:
+            os.remove(path)
+        self.ln(5)
+
+
+class ChartSet:
+    """Wiederverwendbare Figuren je Report (ohne pyplot -> auch im Hintergrund-Thread nutzbar)."""
+
+    def __init__(self, dpi=150):
+        self.dpi = dpi; self._figs = {}
+
+    def get(self, key, figsize):
+        fig = self._figs.get(key)
+        if fig is None:
+            fig = self._figs[key] = Figure(figsize=figsize, dpi=self.dpi)
+            fig.subplots_adjust(left=0.07, right=0.98, top=0.94, bottom=0.08)  # feste Ränder statt tight_layout je Zeichnung
+            FigureCanvasAgg(fig); fig.add_subplot()
+        else:
+            fig.axes[0].cla()
+        return fig, fig.axes[0]
+
+
+def _summary_chart(pdf, charts, df):
+    fig, ax = charts.get("summary", (10, 4))
+    ax.plot(df["Jahr"], df["Umsatz"], label="Umsatz", marker='o')
+    ax.plot(df["Jahr"], df["Gesamtkosten (OPEX)"] + df["Wareneinsatz (COGS)"], label="Kosten", linestyle='--', color='red')
+    ax.bar(df["Jahr"], df["EBITDA"], label="EBITDA", alpha=0.3, color='green')
+    ax.legend(); ax.grid(True, alpha=0.3); pdf.add_chart(fig)
+
+
+def _cash_chart(pdf, charts, df):
+    fig, ax = charts.get("cash", (10, 3.5))
+    ax.fill_between(df["Jahr"], df["Kasse"], color="skyblue", alpha=0.4, label="Kasse")
+    ax.plot(df["Jahr"], df["Bankdarlehen"], color="red", linestyle="--", label="Kredit")
+    ax.legend(); pdf.add_chart(fig)
+
+
+def _kpi_line(pdf, df):
+    last = df.iloc[-1]
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, pdf.fix_text(f"Jahr {int(last['Jahr'])}: Umsatz {last['Umsatz']:,.0f} EUR | EBITDA {last['EBITDA']:,.0f} EUR | Cash {last['Kasse']:,.0f} EUR"), 0, 1); pdf.ln(5)
+
+
+def _inputs_table(pdf, session_data):
+    pdf.add_key_value_table({
+        "SAM": session_data.get("sam"), "Marktanteil Ziel": session_data.get("cap_pct"),
+        "Equity": session_data.get("equity"), "Min Cash": session_data.get("min_cash")
+    }, "Markt & Finanz")
+
+
+def _guv_table(pdf, df):
+    cols = ["Jahr", "Umsatz", "Wareneinsatz (COGS)", "Gesamtkosten (OPEX)", "EBITDA", "Abschreibungen", "EBIT", "Steuern", "Jahresüberschuss"]
+    exist = [c for c in cols if c in df.columns]; widths = [15] + [30]*(len(exist)-1)
+    pdf.add_dataframe_table(df[exist], col_widths=widths)
+
+
+@traced("pdf.create_detailed_pdf")
+def create_detailed_pdf(df_results, session_data, jobs_data, products_data, cc_data, title_prefix=""):
+    pdf = PDFReport(orientation='L', unit='mm', format='A4'); pdf.alias_nb_pages()
+    charts = ChartSet()
+
+    pdf.add_page(); pdf.section_title(f"1. Management Summary {title_prefix}")
+    if not df_results.empty:
+        _kpi_line(pdf, df_results); _summary_chart(pdf, charts, df_results)
+
+    pdf.add_page(); pdf.section_title("2. Eingaben")
+    _inputs_table(pdf, session_data)
+    if jobs_data is not None: pdf.sub_title("Personal"); pdf.add_dataframe_table(jobs_data[["Job Titel", "Jahresgehalt (€)", "FTE Jahr 1"]].head(10))
+    if products_data is not None: pdf.sub_title("Produkte"); pdf.add_dataframe_table(products_data[["Produkt", "Preis (€)", "Herstellungskosten (COGS €)"]])
+
+    pdf.add_page(); pdf.section_title("3. GuV")
+    _guv_table(pdf, df_results)
+
+    pdf.add_page(); pdf.section_title("4. Cashflow & Bilanz")
+    cols_cf = ["Jahr", "Jahresüberschuss", "Investitionen (Assets)", "Kreditaufnahme", "Tilgung", "Net Cash Change", "Kasse"]
+    exist_cf = [c for c in cols_cf if c in df_results.columns]
+    pdf.add_dataframe_table(df_results[exist_cf])
+
+    pdf.ln(5)
+    cols_bil = ["Jahr", "Eigenkapital", "Bankdarlehen", "Verb. LL", "Summe Passiva"]
+    exist_bil = [c for c in cols_bil if c in df_results.columns]
+    if exist_bil: pdf.sub_title("Bilanz Passiva"); pdf.add_dataframe_table(df_results[exist_bil])
+    _cash_chart(pdf, charts, df_results)
+
+    return pdf.output(dest='S').encode('latin-1', 'replace')
+
+
+@traced("pdf.create_comparison_pdf")
+def create_comparison_pdf(scenarios, session_data, mc_results=None, title="Szenario-Vergleich"):
+    """Ein PDF für viele Szenarien ({Name: Jahres-DataFrame}) und optional Monte Carlo Perzentile je Strategie."""
+    pdf = PDFReport(orientation='L', unit='mm', format='A4'); pdf.alias_nb_pages()
+    charts = ChartSet()
+
+    pdf.add_page(); pdf.section_title(f"1. {title}")
+    overview = pd.DataFrame([{
+        "Szenario": name, "Umsatz": df["Umsatz"].iloc[-1], "EBITDA": df["EBITDA"].iloc[-1], "Kasse": df["Kasse"].iloc[-1],
+        "Max. Bankdarlehen": df["Bankdarlehen"].max(), "Min. Kasse vor Finanzierung": df["Kasse vor Finanzierung"].min(),
+    } for name, df in scenarios.items()])
+    pdf.sub_title(f"Kennzahlen Jahr {int(next(iter(scenarios.values()))['Jahr'].iloc[-1])}" if scenarios else "Kennzahlen")
+    pdf.add_dataframe_table(overview)
+    fig, ax = charts.get("compare", (10, 3.5))
+    for name, df in scenarios.items(): ax.plot(df["Jahr"], df["Kasse"], marker='o', label=name)
+    ax.set_title("Kasse"); ax.legend(); ax.grid(True, alpha=0.3); pdf.add_chart(fig)
+    if session_data: _inputs_table(pdf, session_data)
+
+    section = 2
+    for name, df in scenarios.items():
+        pdf.add_page(); pdf.section_title(f"{section}. Szenario {name}"); section += 1
+        _kpi_line(pdf, df); _summary_chart(pdf, charts, df)
+        pdf.add_page(); pdf.sub_title(f"GuV {name}"); _guv_table(pdf, df)
+        _cash_chart(pdf, charts, df)
+
+    for name, res in (mc_results or {}).items():
+        pdf.add_page(); pdf.section_title(f"{section}. Monte Carlo {name}"); section += 1
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, pdf.fix_text(f"{res.draws:,} Ziehungen | P(Kasse vor Finanzierung < Min Cash) {res.breach_prob:.1%}"), 0, 1)
+        fig, ax = charts.get("fan", (10, 3.5))
+        q = res.quantiles["Kasse"]
+        ax.fill_between(q["Jahr"], q["P5"], q["P95"], color="skyblue", alpha=0.4, label="Kasse P5-P95")
+        ax.plot(q["Jahr"], q["P50"], marker='o', label="Kasse P50")
+        ax.legend(); ax.grid(True, alpha=0.3); pdf.add_chart(fig)
+        table = pd.DataFrame({"Jahr": res.years})
+        for metric, qdf in res.quantiles.items():
+            for qn in ("P5", "P50", "P95"): table[f"{metric} {qn}"] = qdf[qn].to_numpy()
+        pdf.add_dataframe_table(table, col_widths=[13] + [22] * (len(table.columns) - 1))
+
+    return pdf.output(dest='S').encode('latin-1', 'replace')
+
+
+def submit_report(fn, *args, label="PDF Report", owner=None, meta=None, **kwargs):
+    """Report als Hintergrund-Job im gemeinsamen Pool erzeugen -> Job-Handle, job.result sind die PDF-Bytes."""
+    return JOBS.submit(fn, *args, label=label, owner=owner, meta=meta, progress_arg=None, **kwargs)
@@ -0,0 +1,152 @@
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from engine import DEFAULTS, METRICS, STRUCTURAL_KEYS, calculate_batch, timeline
+
+# ==========================================
+# ZIELWERTSUCHE / OPTIMIERUNG
+# ==========================================
+
+# Szenario-Argumente von calculate_batch, die wie Parameter gesucht werden können (Key -> Faktor)
+SCENARIO_KEYS = {"p_pct": 1.0, "q_pct": 1.0, "cap_pct": 0.01}
+OPS = (">=", "<=")
+
+# Speicher je Engine-Aufruf begrenzen (Puffer Kennzahl × Periode × Szenario)
+_MAX_BATCH_BYTES = 64 * 2**20
+
+
+@dataclass(frozen=True)
+class Decision:
+    """Gesuchte Eingabe in [lo, hi]; sense "min" sucht den kleinsten, "max" den größten zulässigen Wert."""
+    key: str
+    lo: float
+    hi: float
+    sense: str = "min"
+    weight: float = 1.0  # Gewicht in der Zielfunktion Σ weight · (±Wert) bei mehreren Entscheidungen
+
+    @property
+    def integer(self):
+        default = DEFAULTS.get(self.key)
+        return isinstance(default, int) and not isinstance(default, bool)
+
+
+@dataclass(frozen=True)
+class Constraint:
+    """Bedingung an eine Ergebnisspalte (Jahreswerte), die in jedem Jahr from_year..to_year gelten muss.
+
+    target ist eine Zahl oder ein DEFAULTS-Key (z.B. "min_cash")."""
+    metric: str
+    op: str = ">="
+    target: object = 0.0
+    from_year: int = 1
+    to_year: int = None
+
+    def slack(self, inputs, annual, overrides):
+        # Kleinster Abstand zur Grenze über die Jahre je Szenario; >= 0 -> erfüllt
+        x = annual.metric(self.metric)[:, self.from_year - 1:self.to_year]
+        if isinstance(self.target, str): target = overrides.get(self.target, inputs[self.target])
+        else: target = self.target
+        target = np.reshape(target, (-1, 1)) if np.ndim(target) else target
+        return (x - target if self.op == ">=" else target - x).min(axis=1)
+
+
+@dataclass
+class SolveResult:
+    solution: dict          # Key -> Wert; ohne zulässigen Punkt der mit der geringsten Verletzung
+    feasible: bool
+    objective: float
+    slack: np.ndarray       # je Bedingung: Abstand zur Grenze im schlechtesten Jahr
+    evaluations: int        # gerechnete Szenarien
+    engine_calls: int
+    steps: int
+    seconds: float
+    history: list = field(default_factory=list)  # je Schritt: (Kandidaten, zulässig, Suchbox)
+
+
+def _validate(inputs, decisions, constraints):
+    years, _ = timeline(inputs)
+    for d in decisions:
+        if d.key not in DEFAULTS and d.key not in SCENARIO_KEYS: raise KeyError(f"Unbekannter Parameter: {d.key}")
+        if d.key in STRUCTURAL_KEYS or isinstance(DEFAULTS.get(d.key), bool): raise ValueError(f"{d.key} kann nicht gesucht werden")
+        if not d.lo < d.hi: raise ValueError(f"{d.key}: untere Grenze muss kleiner als obere sein")
+        if d.sense not in ("min", "max"): raise ValueError(f"{d.key}: sense muss 'min' oder 'max' sein")
+    if len({d.key for d in decisions}) != len(decisions): raise ValueError("Parameter mehrfach als Entscheidung angegeben")
+    for c in constraints:
+        if c.metric not in METRICS: raise KeyError(f"Unbekannte Ergebnisspalte: {c.metric}")
+        if c.op not in OPS: raise ValueError(f"Operator muss einer von {OPS} sein")
+        if isinstance(c.target, str) and c.target not in DEFAULTS: raise KeyError(f"Unbekannter Parameter: {c.target}")
+        if not 1 <= c.from_year <= (c.to_year or years) <= years: raise ValueError(f"{c.metric}: Jahre außerhalb 1..{years}")
+
+
+def _evaluate(inputs, decisions, constraints, candidates, base):
+    """Slack-Matrix (Kandidaten × Bedingungen) in Engine-Aufrufen begrenzter Größe."""
+    years, f = timeline(inputs)
+    chunk = max(1, _MAX_BATCH_BYTES // (len(METRICS) * years * f * 8))
+    slack = np.empty((len(candidates), len(constraints))); calls = 0
+    for start in range(0, len(candidates), chunk):
+        block = candidates[start:start + chunk]
+        args = dict(base); overrides = {}
+        for j, d in enumerate(decisions):
+            if d.key in SCENARIO_KEYS: args[d.key] = block[:, j] * SCENARIO_KEYS[d.key]
+            else: overrides[d.key] = block[:, j]
+        annual = calculate_batch(inputs, args["p_pct"], args["q_pct"], args["cap_pct"], args["discount_pct"], overrides).annual()
+        for i, c in enumerate(constraints): slack[start:start + chunk, i] = c.slack(inputs, annual, overrides)
+        calls += 1
+    return slack, calls
+
+
+def solve(inputs, decisions, constraints, p=None, q=None, market_share=None, discount_pct=0.0,
+          budget=4096, tol=1e-6, max_steps=30, progress=None):
+    """Sucht die beste zulässige Kombination der Entscheidungen durch Gitterverfeinerung.
+
+    Je Schritt wird ein Gitter über die Suchbox als ein Batch gerechnet; die Box schrumpft dann auf die
+    Nachbarzellen des besten zulässigen Punkts. Bei einer Entscheidung und monotoner Bedingung ist das
+    eine Klammersuche, die die Grenze je Schritt um den Faktor (Punkte - 1) / 2 einengt.
+    progress(Anteil) wird nach jedem Schritt aufgerufen (obere Schranke max_steps)."""
+    t0 = time.perf_counter()
+    decisions = list(decisions); constraints = list(constraints)
+    _validate(inputs, decisions, constraints)
+    base = {
+        "p_pct": inputs["p_pct"] if p is None else p, "q_pct": inputs["q_pct"] if q is None else q,
+        "cap_pct": inputs["cap_pct"] / 100 if market_share is None else market_share, "discount_pct": discount_pct,
+    }
+    d = len(decisions)
+    points = int(np.clip(round(budget ** (1 / d)), 3, 65)) | 1  # ungerade -> Boxmitte liegt auf dem Gitter
+    lo0 = np.array([dc.lo for dc in decisions], dtype=np.float64); hi0 = np.array([dc.hi for dc in decisions], dtype=np.float64)
+    sign = np.array([dc.weight * (1 if dc.sense == "min" else -1) for dc in decisions])
+    integer = np.array([dc.integer for dc in decisions])
+    lo, hi = lo0.copy(), hi0.copy()
+    best = best_slack = None; best_obj = np.inf; fallback = (None, -np.inf, None)
+    evaluations = calls = steps = 0; history = []
+
+    while steps < max_steps:
+        axes = [np.unique(np.round(np.linspace(a, b, points))) if is_int else np.linspace(a, b, points)
+                for a, b, is_int in zip(lo, hi, integer)]
+        cand = np.stack([g.ravel() for g in np.meshgrid(*axes, indexing="ij")], axis=1)
+        slack, n_calls = _evaluate(inputs, decisions, constraints, cand, base)
+        evaluations += len(cand); calls += n_calls; steps += 1
+        if progress: progress(steps / max_steps)
+        ok = (slack >= 0).all(axis=1)
+        history.append((len(cand), int(ok.sum()), np.stack([lo, hi], axis=1)))
+        if ok.any():
+            obj = cand @ sign
+            i = np.flatnonzero(ok)[np.lexsort((-slack[ok].min(axis=1), obj[ok]))[0]]
+            if obj[i] <= best_obj: best, best_obj, best_slack = cand[i], obj[i], slack[i]
+            center = best
+        else:
+            worst = slack.min(axis=1); i = int(np.argmax(worst))
+            if worst[i] > fallback[1]: fallback = (cand[i], worst[i], slack[i])
+            if best is None: break  # in den Grenzen nichts zulässig
+            center = best
+        # Neue Box: Nachbarzellen um den besten Punkt (Gitterabstand je Achse), in den Ausgangsgrenzen
+        step = np.array([(b - a) / max(len(ax) - 1, 1) for a, b, ax in zip(lo, hi, axes)])
+        lo, hi = np.maximum(lo0, center - step), np.minimum(hi0, center + step)
+        done = np.where(integer, hi - lo <= 2, hi - lo <= tol * (hi0 - lo0))
+        if done.all(): break
+
+    feasible = best is not None
+    x, obj, slack = (best, float(best_obj), best_slack) if feasible else (fallback[0], np.nan, fallback[2])
+    solution = {dc.key: float(v) for dc, v in zip(decisions, x)}
+    return SolveResult(solution, feasible, obj, slack, evaluations, calls, steps, time.perf_counter() - t0, history)
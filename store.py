@@ -0,0 +1,343 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cache import input_key
+from engine import METRICS, TABLES, ModelInputs
+from profiling import count, span
+
+# ==========================================
+# SZENARIO-SPEICHER (SQLite)
+# ==========================================
+# Je gespeichertem Szenario: Name, Tag, Zeitpunkt, Szenario-Argumente und Jahreswerte (eine Zeile je Jahr,
+# eine Spalte je Kennzahl). Die Konfiguration liegt einmal je Inhalt in `configs` (Batch/Monte Carlo teilen sie),
+# ihre Zahlen-Parameter zusätzlich als Zeilen in `config_params` -> query() vergleicht ohne JSON-Parsing.
+
+SCHEMA_VERSION = 2
+OPS = {"<": "<", "<=": "<=", ">": ">", ">=": ">=", "=": "="}
+# Felder der Szenario-Zeile, die in query()/diff() wie Parameter behandelt werden
+SCENARIO_FIELDS = ("p", "q", "market_share", "discount_pct")
+_INSERT_ROWS = 20_000  # Ergebniszeilen je executemany
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,      -- ModelInputs.digest (inkl. Bezeichnungen)
+    input_key TEXT NOT NULL,          -- cache.input_key: was die Engine rechnet
+    params TEXT NOT NULL,             -- JSON, per json_extract abfragbar
+    tables BLOB NOT NULL              -- zlib(JSON) je Tabelle spaltenweise
+);
+CREATE INDEX IF NOT EXISTS configs_input_key ON configs(input_key);
+CREATE TABLE IF NOT EXISTS config_params (
+    key TEXT NOT NULL,
+    config_id INTEGER NOT NULL REFERENCES configs(id) ON DELETE CASCADE,
+    value REAL,
+    PRIMARY KEY (key, config_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    tag TEXT NOT NULL DEFAULT '',
+    created TEXT NOT NULL,
+    config_id INTEGER NOT NULL REFERENCES configs(id),
+    p REAL, q REAL, market_share REAL, discount_pct REAL,
+    overrides TEXT                    -- JSON je Szenario variierte Parameter (Batch), sonst NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_name ON scenarios(name, created);
+CREATE INDEX IF NOT EXISTS scenarios_tag ON scenarios(tag, created);
+CREATE INDEX IF NOT EXISTS scenarios_created ON scenarios(created);
+CREATE INDEX IF NOT EXISTS scenarios_config ON scenarios(config_id, p, q, market_share, discount_pct);
+"""
+
+
+# Zahlen-Parameter (auch Ja/Nein) einer Konfiguration als (key, config_id, value) aus dem JSON
+_PARAM_ROWS = ("SELECT j.key, c.id, j.value FROM configs c, json_each(c.params) j "
+               "WHERE j.type IN ('integer', 'real', 'true', 'false')")
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _now():
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+class ScenarioStore:
+    """Szenarien mit Konfiguration und Jahreswerten in einer SQLite-Datei; thread-safe über eine Verbindung."""
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL"); self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            self._conn.executescript(_SCHEMA)
+            if 0 < version < 2:  # v1: Parameter nur als JSON -> config_params aus den vorhandenen Konfigurationen füllen
+                self._conn.execute(f"INSERT OR IGNORE INTO config_params (key, config_id, value) {_PARAM_ROWS}")
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE, "
+                f"Jahr INTEGER NOT NULL, {', '.join(f'{_quote(m)} REAL' for m in METRICS)}, PRIMARY KEY (scenario_id, Jahr)) WITHOUT ROWID")
+            self._metrics = [r[1] for r in self._conn.execute("PRAGMA table_info(results)")][2:]
+
+    def version(self):
+        """Ändert sich bei jedem Schreibzugriff (auch aus anderen Prozessen) -> Schlüssel für Caches von Abfragen."""
+        with self._lock: return self._conn.total_changes, self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        with self._lock: self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try: yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK"); raise
+            self._conn.execute("COMMIT")
+
+    def _ensure_metrics(self, conn, names):
+        # Kennzahlen außerhalb METRICS (z.B. Monte Carlo "NPV") als zusätzliche Spalte anlegen
+        for m in names:
+            if m not in self._metrics:
+                conn.execute(f"ALTER TABLE results ADD COLUMN {_quote(m)} REAL"); self._metrics.append(m)
+
+    def _config_id(self, conn, inputs):
+        row = conn.execute("SELECT id FROM configs WHERE digest = ?", (inputs.digest,)).fetchone()
+        if row: return row[0]
+        tables = {name: {col: arr.tolist() for col, arr in getattr(inputs, name).items()} for name in TABLES}
+        config_id = conn.execute(
+            "INSERT INTO configs (digest, input_key, params, tables) VALUES (?, ?, ?, ?)",
+            (inputs.digest, input_key(inputs), json.dumps(dict(inputs.params)), zlib.compress(json.dumps(tables).encode(), 6)),
+        ).lastrowid
+        conn.executemany("INSERT INTO config_params (key, config_id, value) VALUES (?, ?, ?)",
+                         ((k, config_id, float(v)) for k, v in inputs.params.items() if isinstance(v, (int, float))))
+        return config_id
+
+    def _insert(self, conn, config_id, name, tag, args, overrides, years, values, metrics):
+        """args: (n, 4), values: (n, Jahre, Kennzahlen) -> Ids der n neuen Szenarien."""
+        n = len(args)
+        self._ensure_metrics(conn, metrics)
+        first = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM scenarios").fetchone()[0]) + 1  # in BEGIN IMMEDIATE exklusiv
+        ids = np.arange(first, first + n)
+        created = _now()
+        conn.executemany(
+            "INSERT INTO scenarios (id, name, tag, created, config_id, p, q, market_share, discount_pct, overrides) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((int(i), nm, tag, created, config_id, *a, ov) for i, nm, a, ov in zip(ids, name, args.tolist(), overrides)))
+        # Zeilen als Matrix (Id, Jahr, Kennzahlen) blockweise an executemany -> Python-Listen nur je Block im Speicher
+        sql = f"INSERT INTO results (scenario_id, Jahr, {', '.join(map(_quote, metrics))}) VALUES ({', '.join('?' * (len(metrics) + 2))})"
+        per_block = max(1, _INSERT_ROWS // max(len(years), 1))
+        for start in range(0, n, per_block):
+            block = values[start:start + per_block]
+            rows = np.empty(block.shape[:2] + (len(metrics) + 2,))
+            rows[:, :, 0] = ids[start:start + per_block, None]; rows[:, :, 1] = years; rows[:, :, 2:] = block
+            conn.executemany(sql, rows.reshape(-1, rows.shape[2]).tolist())
+        count("store.scenarios_written", n)
+        return ids.tolist()
+
+    def save(self, name, inputs, result, p=None, q=None, market_share=None, discount_pct=0.0, tag=""):
+        """Ein Szenario speichern: result ist ein ScenarioResult oder DataFrame mit Spalte "Jahr" (Jahreswerte)."""
+        df = result.annual().to_frame() if hasattr(result, "annual") else result
+        metrics = [c for c in df.columns if c not in ("Jahr", "Periode")]
+        args = np.array([[inputs["p_pct"] if p is None else p, inputs["q_pct"] if q is None else q,
+                          inputs["cap_pct"] / 100 if market_share is None else market_share, discount_pct]], dtype=np.float64)
+        with span("store.save"), self._transaction() as conn:
+            config_id = self._config_id(conn, inputs)
+            values = df[metrics].to_numpy(dtype=np.float64)[None]
+            return self._insert(conn, config_id, [name], tag, args, [None], df["Jahr"].to_numpy(), values, metrics)[0]
+
+    def save_batch(self, name, inputs, batch, p, q, market_share, discount_pct=0.0, overrides=None, tag="batch"):
+        """BatchResult (Argumente wie calculate_batch) in einer Transaktion; Namen "<name> #i" oder Liste je Szenario."""
+        annual = batch.annual(); n = len(annual)
+        args = np.column_stack([np.broadcast_to(np.asarray(a, dtype=np.float64), (n,)) for a in (p, q, market_share, discount_pct)])
+        names = name if isinstance(name, (list, tuple)) else [f"{name} #{i + 1}" for i in range(n)]
+        ov = [None] * n
+        if overrides:
+            cols = {k: np.broadcast_to(np.asarray(v, dtype=np.float64), (n,)).tolist() for k, v in overrides.items()}
+            ov = [json.dumps({k: v[i] for k, v in cols.items()}) for i in range(n)]
+        with span("store.save_batch", n=n), self._transaction() as conn:
+            config_id = self._config_id(conn, inputs)
+            return self._insert(conn, config_id, names, tag, args, ov, np.unique(annual.years), annual.values, METRICS)
+
+    def save_monte_carlo(self, name, inputs, mc_results, tag="monte_carlo"):
+        """Je Strategie und Quantil (P5/P50/P95, Mittelwert) ein Szenario mit den Monte-Carlo-Kennzahlen."""
+        saved = {}
+        with span("store.save_monte_carlo"), self._transaction() as conn:
+            config_id = self._config_id(conn, inputs)
+            for strategy, r in mc_results.items():
+                labels = list(next(iter(r.quantiles.values())).columns[1:]) + ["Mittel"]
+                metrics = list(r.quantiles)
+                values = np.stack([np.column_stack([r.quantiles[m][lb].to_numpy() if lb != "Mittel" else r.mean[m].to_numpy() for m in metrics])
+                                   for lb in labels])
+                args = np.full((len(labels), 4), np.nan)
+                names = [f"{name} {strategy} {lb}" for lb in labels]
+                ids = self._insert(conn, config_id, names, f"{tag}:{strategy}", args, [None] * len(labels), r.years, values, metrics)
+                saved.update(zip(names, ids))
+        return saved
+
+    def list(self, name=None, tag=None, since=None, until=None, limit=200):
+        """Gespeicherte Szenarien, neueste zuerst; name/tag exakt oder mit SQL-Platzhaltern (%, _)."""
+        where, params = _filters(name, tag)
+        if since: where.append("s.created >= ?"); params.append(str(since))
+        if until: where.append("s.created < ?"); params.append(str(until))
+        sql = ("SELECT s.id, s.name, s.tag, s.created, s.p, s.q, s.market_share, s.discount_pct, c.input_key "
+               "FROM scenarios s JOIN configs c ON c.id = s.config_id"
+               + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY s.created DESC, s.id DESC LIMIT ?")
+        with self._lock: return pd.read_sql_query(sql, self._conn, params=params + [int(limit)])
+
+    def versions(self, name):
+        return self.list(name=name, limit=-1).sort_values(["created", "id"], ignore_index=True)
+
+    def find(self, inputs, p=None, q=None, market_share=None, discount_pct=0.0):
+        """Id des zuletzt gespeicherten Szenarios mit gleichem Rechenergebnis (gleiche Engine-Eingaben + Argumente) oder None."""
+        args = (inputs["p_pct"] if p is None else p, inputs["q_pct"] if q is None else q,
+                inputs["cap_pct"] / 100 if market_share is None else market_share, discount_pct)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.id FROM scenarios s JOIN configs c ON c.id = s.config_id WHERE c.input_key = ? AND s.overrides IS NULL "
+                "AND s.p = ? AND s.q = ? AND s.market_share = ? AND s.discount_pct = ? ORDER BY s.id DESC LIMIT 1",
+                (input_key(inputs), *map(float, args))).fetchone()
+        count("store.hits" if row else "store.misses")
+        return row[0] if row else None
+
+    def results(self, ids):
+        """Jahreswerte eines oder mehrerer Szenarien (Spalte scenario_id bei mehreren); nur belegte Kennzahlen."""
+        single = np.ndim(ids) == 0
+        ids = [int(i) for i in np.atleast_1d(ids)]
+        with span("store.results", n=len(ids)), self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS _ids (id INTEGER PRIMARY KEY)")
+            self._conn.execute("DELETE FROM _ids"); self._conn.executemany("INSERT OR IGNORE INTO _ids VALUES (?)", ((i,) for i in ids))
+            df = pd.read_sql_query("SELECT r.* FROM results r JOIN _ids ON _ids.id = r.scenario_id ORDER BY r.scenario_id, r.Jahr", self._conn)
+        df = df.dropna(axis=1, how="all")
+        return df.drop(columns="scenario_id") if single else df
+
+    def load(self, scenario_id):
+        """(ModelInputs, Jahreswerte, Szenario-Zeile als dict) – ohne Neuberechnung."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT s.*, c.params, c.tables FROM scenarios s JOIN configs c ON c.id = s.config_id WHERE s.id = ?", (int(scenario_id),))
+            row = cur.fetchone()
+            if row is None: raise KeyError(f"Szenario {scenario_id} nicht gespeichert")
+            row = dict(zip([d[0] for d in cur.description], row))
+        params = json.loads(row.pop("params")); tables = json.loads(zlib.decompress(row.pop("tables")))
+        if row["overrides"]: params.update(json.loads(row["overrides"]))
+        inputs = ModelInputs.build(params, **tables)
+        return inputs, self.results(scenario_id), row
+
+    def query(self, metric, op, target, year=None, name=None, tag=None, limit=1000):
+        """Szenarien (Filter wie list()), bei denen `metric` im Jahr `year` (None: irgendein Jahr) `op` `target` erfüllt.
+
+        target ist eine Zahl oder ein Parameter-Key (z.B. "min_cash"); je Szenario variierte Werte haben Vorrang.
+        Beispiel: query("Kasse vor Finanzierung", "<", "min_cash", year=5)."""
+        if metric not in self._metrics: raise KeyError(f"Unbekannte Kennzahl: {metric}")
+        if op not in OPS: raise ValueError(f"Operator muss einer von {tuple(OPS)} sein")
+        # Je Szenario: Grenze über config_params (Primärschlüssel), Jahreswerte über den Primärschlüssel (scenario_id, Jahr)
+        params = []; join = ""
+        if isinstance(target, str):
+            if target in SCENARIO_FIELDS: rhs = f"s.{target}"
+            else:
+                rhs = "COALESCE(json_extract(s.overrides, ?), cp.value)"; params.append("$." + json.dumps(target))
+                join = " LEFT JOIN config_params cp ON cp.key = ? AND cp.config_id = s.config_id"; params.append(target)
+        else:
+            rhs = "?"; params.append(float(target))
+        on = ""
+        if year is not None: on = " AND r.Jahr = ?"; params.append(int(year))
+        where, more_params = _filters(name, tag); params += more_params
+        sql = (f"SELECT id, name, tag, created, MIN(Jahr) AS Jahr, Wert, Grenze FROM ("
+               f"SELECT s.id, s.name, s.tag, s.created, r.Jahr, r.{_quote(metric)} AS Wert, {rhs} AS Grenze "
+               f"FROM scenarios s{join} JOIN results r ON r.scenario_id = s.id{on}"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + f") WHERE Wert {OPS[op]} Grenze GROUP BY id ORDER BY id LIMIT ?")
+        with span("store.query"), self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params + [int(limit)])
+
+    def diff(self, a, b, tol=1e-9):
+        """Unterschiede zweier gespeicherter Versionen: (Parameter, Tabellen-Spalten, Ergebnis-Kennzahlen) als DataFrames."""
+        with span("store.diff"):
+            (in_a, res_a, row_a), (in_b, res_b, row_b) = self.load(a), self.load(b)
+            pa = {**in_a.params, **{f: row_a[f] for f in SCENARIO_FIELDS}}; pb = {**in_b.params, **{f: row_b[f] for f in SCENARIO_FIELDS}}
+            params = pd.DataFrame([{"Parameter": k, "A": pa.get(k), "B": pb.get(k)} for k in sorted(set(pa) | set(pb))
+                                   if not _same(pa.get(k), pb.get(k))], columns=["Parameter", "A", "B"])
+
+            tables = []
+            if in_a.table_digests != in_b.table_digests:
+                for name in TABLES:
+                    if in_a.table_digests[name] == in_b.table_digests[name]: continue
+                    ta, tb = getattr(in_a, name), getattr(in_b, name)
+                    n_a, n_b = len(next(iter(ta.values()))), len(next(iter(tb.values()))); n = min(n_a, n_b)
+                    for col in ta:
+                        x, y = ta[col][:n], tb[col][:n]
+                        changed = int((x != y).sum()) if x.dtype == object or x.dtype == bool else int((~np.isclose(x, y, rtol=0, atol=tol)).sum())
+                        if changed or n_a != n_b:
+                            tables.append({"Tabelle": name, "Spalte": col, "Zeilen A": n_a, "Zeilen B": n_b, "Geänderte Zeilen": changed})
+            tables = pd.DataFrame(tables, columns=["Tabelle", "Spalte", "Zeilen A", "Zeilen B", "Geänderte Zeilen"])
+
+            # Ergebnisse spaltenweise als Matrix vergleichen (gemeinsame Jahre und Kennzahlen)
+            years = np.intersect1d(res_a["Jahr"], res_b["Jahr"])
+            cols = [c for c in res_a.columns if c != "Jahr" and c in res_b.columns]
+            x = res_a.set_index("Jahr").loc[years, cols].to_numpy(); y = res_b.set_index("Jahr").loc[years, cols].to_numpy()
+            delta = y - x; changed = np.abs(delta) > tol
+            i_max = np.abs(delta).argmax(axis=0) if len(years) else np.zeros(len(cols), dtype=int)
+            results = pd.DataFrame({
+                "Kennzahl": cols,
+                "Erstes Jahr": pd.array([int(years[changed[:, j].argmax()]) if changed[:, j].any() else None for j in range(len(cols))], dtype="Int64"),
+                "Max. Abweichung": delta[i_max, np.arange(len(cols))] if len(years) else np.zeros(len(cols)),
+                "Jahr der Max. Abweichung": years[i_max] if len(years) else np.zeros(len(cols), dtype=int),
+                "A letztes Jahr": x[-1] if len(years) else np.nan, "B letztes Jahr": y[-1] if len(years) else np.nan,
+            })[changed.any(axis=0)].reset_index(drop=True)
+        return params, tables, results
+
+    def delete(self, ids):
+        ids = [(int(i),) for i in np.atleast_1d(ids)]
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM results WHERE scenario_id = ?", ids)
+            conn.executemany("DELETE FROM scenarios WHERE id = ?", ids)
+            conn.execute("DELETE FROM configs WHERE id NOT IN (SELECT config_id FROM scenarios)")
+
+    def stats(self):
+        with self._lock:
+            n_s, n_c = (self._conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("scenarios", "configs"))
+        size = os.path.getsize(self.path) if self.path != ":memory:" and os.path.exists(self.path) else 0
+        return {"scenarios": n_s, "configs": n_c, "bytes": size}
+
+
+def _filters(name, tag):
+    # Exakter Vergleich nutzt die Indizes; mit % oder _ als LIKE-Muster
+    where, params = [], []
+    for col, value in (("name", name), ("tag", tag)):
+        if value is None: continue
+        where.append(f"s.{col} {'LIKE' if '%' in value or '_' in value else '='} ?"); params.append(value)
+    return where, params
+
+
+def _same(x, y):
+    if isinstance(x, float) and isinstance(y, float): return x == y or (np.isnan(x) and np.isnan(y))
+    return x == y
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def store_path(configured=None):
+    """Pfad des Speichers: FINMOD_STORE, sonst `configured` (z.B. aus st.secrets), sonst ~/.finmod/scenarios.db."""
+    return os.environ.get("FINMOD_STORE") or configured or os.path.join(os.path.expanduser("~"), ".finmod", "scenarios.db")
+
+
+def default_store(configured=None):
+    """Prozessweiter Speicher unter store_path(configured); der erste Aufruf legt den Pfad fest."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None: _STORE = ScenarioStore(store_path(configured))
+        return _STORE
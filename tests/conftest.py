@@ -0,0 +1,114 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import DEFAULTS, N_START, ModelInputs, unit_economics  # noqa: E402
+
+# ==========================================
+# GEMEINSAME FIXTURES
+# ==========================================
+
+JOBS = [
+    {"Job Titel": "CEO", "Jahresgehalt (€)": 100000, "FTE Jahr 1": 1.0, "Laptop": True, "Smartphone": True, "Auto": True, "LKW": False, "Büro": True, "Sonstiges (€)": 0},
+    {"Job Titel": "Sales", "Jahresgehalt (€)": 60000, "FTE Jahr 1": 1.5, "Laptop": True, "Smartphone": True, "Auto": True, "LKW": False, "Büro": True, "Sonstiges (€)": 500},
+    {"Job Titel": "Tech", "Jahresgehalt (€)": 55000, "FTE Jahr 1": 2.0, "Laptop": True, "Smartphone": False, "Auto": False, "LKW": False, "Büro": True, "Sonstiges (€)": 200},
+    {"Job Titel": "Logistik", "Jahresgehalt (€)": 40000, "FTE Jahr 1": 1.0, "Laptop": False, "Smartphone": True, "Auto": False, "LKW": True, "Büro": False, "Sonstiges (€)": 1200},
+    {"Job Titel": "Offen", "Jahresgehalt (€)": 0, "FTE Jahr 1": 0.0, "Laptop": False, "Smartphone": False, "Auto": False, "LKW": False, "Büro": False, "Sonstiges (€)": 0},
+]
+PRODUCTS = [
+    {"Produkt": "Abo", "Preis (€)": 400.0, "Avg. Rabatt (%)": 0, "Herstellungskosten (COGS €)": 20.0, "Take Rate (%)": 100, "Wiederkauf Rate (%)": 90, "Wiederkauf alle (Monate)": 1},
+    {"Produkt": "Gerät", "Preis (€)": 900.0, "Avg. Rabatt (%)": 5, "Herstellungskosten (COGS €)": 450.0, "Take Rate (%)": 40, "Wiederkauf Rate (%)": 0, "Wiederkauf alle (Monate)": 0},
+]
+COST_CENTERS = [
+    {"Kostenstelle": "Miete", "Grundwert Jahr 1 (€)": 24000, "Umsatz-Kopplung (%)": 0},
+    {"Kostenstelle": "IT", "Grundwert Jahr 1 (€)": 12000, "Umsatz-Kopplung (%)": 10},
+    {"Kostenstelle": "Marketing", "Grundwert Jahr 1 (€)": 30000, "Umsatz-Kopplung (%)": 20},
+]
+
+
+def make_inputs(**params):
+    # Verlust in den ersten Jahren, dann Gewinn -> Kredit, Tilgung, Verlustvortrag, Steuern und FTE-Skalierung kommen vor
+    base = {"sam": 50000.0, "target_rev_per_fte": 200000.0, "loan_initial": 20000.0, "horizon_years": 8}
+    return ModelInputs.build({**DEFAULTS, **base, **params}, pd.DataFrame(JOBS), pd.DataFrame(PRODUCTS), pd.DataFrame(COST_CENTERS))
+
+
+@pytest.fixture
+def inputs():
+    return make_inputs()
+
+
+def reference(inputs, p, q, market_share, discount_pct=0.0):
+    """Skalare Referenz der Engine: ein Szenario, Periode für Periode, je Rolle/Kostenstelle/Asset einzeln."""
+    prm = inputs.params; f = int(prm["periods_per_year"]); T = int(prm["horizon_years"]) * f
+    jobs = inputs.table("jobs").to_dict("records"); ccs = inputs.table("cost_centers").to_dict("records")
+    arpu, cogs_ratio = unit_economics(inputs)
+    M = prm["sam"] * market_share; churn = prm["churn"] / 100 / f
+    rows = []
+    kunden = N_START; acquired = N_START
+    base_ftes = sum(j["FTE Jahr 1"] for j in jobs)
+    cc_state = [c["Grundwert Jahr 1 (€)"] / f for c in ccs]
+    classes = [("Laptop", "price_laptop", "ul_laptop"), ("Smartphone", "price_phone", "ul_phone"), ("Auto", "price_car", "ul_car"),
+               ("LKW", "price_truck", "ul_truck"), ("Büro", "price_desk", "ul_desk")]
+    bought = {c[0]: [] for c in classes}; bought["Misc"] = []
+    av = 0.0; prev_rev = None
+    for t in range(T):
+        if t > 0:
+            n = kunden
+            adoption = (p / f) * (M - n) + (q / f) * (n / M) * (M - n) if M > 0 else 0.0
+            kunden = min(n * (1 - churn) + adoption, M)
+            acquired = max(0.0, kunden - n * (1 - churn))
+        rev = kunden * arpu * (1 - discount_pct / 100) / f
+        cogs = kunden * arpu * cogs_ratio / f
+        year = t // f
+        target = rev * f / prm["target_rev_per_fte"] if prm["target_rev_per_fte"] > 0 else 0.0
+        ftes = [0.0] * len(jobs) if base_ftes <= 0 else [
+            j["FTE Jahr 1"] * (max(1.0, target / base_ftes) if j["FTE Jahr 1"] >= 0 else min(1.0, target / base_ftes)) for j in jobs]
+        pers = sum(fte * (j["Jahresgehalt (€)"] * (1 + prm["wage_inc"] / 100) ** year * (1 + prm["lnk_pct"] / 100)
+                          + j["Sonstiges (€)"] * (1 + prm["inflation"] / 100) ** year) for fte, j in zip(ftes, jobs)) / f
+        if t > 0:
+            growth = (rev - prev_rev) / prev_rev if prev_rev > 0 else 0.0
+            cc_state = [s * (1 + prm["inflation"] / 100) ** (1 / f) * (1 + c["Umsatz-Kopplung (%)"] / 100 * growth) for s, c in zip(cc_state, ccs)]
+        kst = sum(cc_state)
+        invest = dep = 0.0
+        plans = [(hw, prm[pk], prm[uk], sum(fte for fte, j in zip(ftes, jobs) if j[hw]), 0.0) for hw, pk, uk in classes]
+        plans.append(("Misc", max(prm["capex_annual"], 0.0) / f, prm["depreciation_misc"], 0.0, 1.0))
+        for hw, price, life, need, forced in plans:
+            L = max(1, int(life)) * f
+            alive = sum(bought[hw][max(0, t - L + 1):])
+            units = max(0.0, need - alive) + forced
+            bought[hw].append(units)
+            invest += units * price; dep += (alive + units) * price / L
+        av += invest - dep
+        cac = acquired * prm["cac"]
+        opex = pers + kst + cac
+        ebit = rev - cogs - opex - dep
+        rows.append({"Kunden": kunden, "Umsatz": rev, "Wareneinsatz (COGS)": cogs, "Personalkosten": pers, "FTE Total": sum(ftes),
+                     "Kostenstellen": kst, "Marketing (CAC)": cac, "Gesamtkosten (OPEX)": opex, "Abschreibungen": dep, "EBIT": ebit,
+                     "Investitionen (Assets)": invest, "Anlagevermögen": av,
+                     "Forderungen LL": rev * f * prm["dso"] / 365, "Verb. LL": (cogs + kst) * f * prm["dpo"] / 365})
+        prev_rev = rev
+    # Finanzierung: Zinsen, Steuern mit Verlustvortrag, Mindest-Cash über Kredit
+    debt = prm["loan_initial"]; cash = prm["equity"] + debt; carry = retained = ar_prev = ap_prev = 0.0
+    for r in rows:
+        interest = debt * prm["loan_rate"] / 100 / f
+        ebt = r["EBIT"] - interest
+        if ebt < 0: tax = 0.0; carry -= ebt
+        else:
+            used = min(carry, ebt); tax = (ebt - used) * prm["tax_rate"] / 100; carry -= used
+        net = ebt - tax; retained += net
+        ocf = net + r["Abschreibungen"] - (r["Forderungen LL"] - ar_prev) + (r["Verb. LL"] - ap_prev)
+        pre = cash + ocf - r["Investitionen (Assets)"]
+        borrow = max(0.0, prm["min_cash"] - pre); repay = 0.0 if borrow else min(debt, pre - prm["min_cash"])
+        debt += borrow - repay; cash = pre + borrow - repay
+        r.update({"Zinsen": interest, "EBT": ebt, "Steuern": tax, "Jahresüberschuss": net, "Verlustvortrag": carry,
+                  "Operativer Cashflow": ocf, "Kasse vor Finanzierung": pre, "Kreditaufnahme": borrow, "Tilgung": repay,
+                  "Kasse": cash, "Bankdarlehen": debt, "Eigenkapital": prm["equity"] + retained,
+                  "Summe Aktiva": r["Anlagevermögen"] + r["Forderungen LL"] + cash,
+                  "Summe Passiva": prm["equity"] + retained + debt + r["Verb. LL"]})
+        ar_prev, ap_prev = r["Forderungen LL"], r["Verb. LL"]
+    return {m: np.array([r[m] for r in rows]) for m in rows[0]}
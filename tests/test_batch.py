@@ -0,0 +1,25 @@
+import json
+
+import pandas as pd
+import pytest
+
+from batch import main
+
+# ==========================================
+# BATCH-LAUF (Kommandozeile)
+# ==========================================
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bad_config_is_reported_and_rest_still_runs(inputs, tmp_path, workers):
+    configs = tmp_path / "configs"; configs.mkdir()
+    (configs / "gut.json").write_text(json.dumps(inputs.to_config()), encoding="utf-8")
+    (configs / "kaputt.json").write_text('{"params": {"equity": ', encoding="utf-8")
+    out, errors = tmp_path / "ergebnisse.csv", tmp_path / "fehler.csv"
+
+    assert main([str(configs), "-o", str(out), "--errors", str(errors), "--workers", str(workers)]) == 1
+    results = pd.read_csv(out)
+    assert set(results["Config"]) == {str(configs / "gut.json")}
+    assert results["Jahr"].tolist() == list(range(1, 9))
+    failed = pd.read_csv(errors)
+    assert failed["Config"].tolist() == [str(configs / "kaputt.json")] and "JSONDecodeError" in failed["Fehler"].iloc[0]
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+import cache
+from cache import ResultCache, cached_calculate, cached_calculate_batch, input_key, scenario_key
+from engine import calculate, strategy_grid
+
+# ==========================================
+# ERGEBNIS-CACHE
+# ==========================================
+
+
+def test_scenario_key_includes_shape(inputs):
+    assert scenario_key("batch", inputs, [0.03]) != scenario_key("batch", inputs, 0.03)
+    assert scenario_key("batch", inputs, np.zeros((2, 3))) != scenario_key("batch", inputs, np.zeros((3, 2)))
+    assert scenario_key("batch", inputs, [0.01, 0.02]) == scenario_key("batch", inputs, np.array([0.01, 0.02]))
+
+
+def test_input_key_ignores_labels_and_row_order(inputs):
+    jobs = inputs.table("jobs").iloc[::-1].assign(**{"Job Titel": "x"})
+    shuffled = type(inputs).build(dict(inputs.params), jobs, inputs.table("products"), inputs.table("cost_centers"))
+    assert input_key(shuffled) == input_key(inputs) and shuffled != inputs
+    assert input_key(inputs.replace(cac=1.0)) != input_key(inputs)
+
+
+def test_disk_tier_round_trip(inputs, tmp_path):
+    first = ResultCache(disk_dir=str(tmp_path))
+    res = cached_calculate(inputs, 0.03, 0.38, 0.05, cache=first)
+    second = ResultCache(disk_dir=str(tmp_path))
+    again = cached_calculate(inputs, 0.03, 0.38, 0.05, cache=second)
+    assert second.stats()["disk_hits"] == 1 and second.stats()["misses"] == 0
+    np.testing.assert_array_equal(again["Kasse"], res["Kasse"])
+    assert not again["Kasse"].flags.writeable
+
+
+def test_annual_batch_is_cached_separately(inputs):
+    c = ResultCache(); monthly = inputs.replace(periods_per_year=12)
+    args = strategy_grid(monthly, "Standard", 3)
+    annual = cached_calculate_batch(monthly, *args, cache=c, annual=True)
+    assert c.stats()["misses"] == 2  # Jahreswerte und Perioden-Batch
+    np.testing.assert_array_equal(annual.values, cached_calculate_batch(monthly, *args, cache=c).annual().values)
+    assert cached_calculate_batch(monthly, *args, cache=c, annual=True) is annual and c.stats()["misses"] == 2
+
+
+def test_disk_errors_fall_back_to_memory(inputs, tmp_path, monkeypatch, caplog):
+    c = ResultCache(disk_dir=str(tmp_path))
+
+    def full(*args, **kwargs): raise OSError(28, "No space left on device")
+    monkeypatch.setattr(cache.pickle, "dump", full)
+    res = c.get_or_compute("k", lambda: calculate(inputs, 0.03, 0.38, 0.05))
+    assert c.get("k") is res and c.stats()["disk_errors"] == 1
+    assert "nur im Speicher" in caplog.text
+    assert not [f for _, _, files in os.walk(tmp_path) for f in files]  # keine halben .tmp-Dateien
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from calibration import PARAMS, fit_bass, fit_many, read_histories, summary
+from engine import bass_step
+
+# ==========================================
+# KALIBRIERUNG (synthetische Historien mit bekannten Parametern)
+# ==========================================
+
+
+def simulate(lines, periods, seed, start=10.0):
+    rng = np.random.default_rng(seed)
+    true = {"p": rng.uniform(0.005, 0.05, lines), "q": rng.uniform(0.2, 0.8, lines), "m": rng.uniform(500, 5000, lines)}
+    churn = rng.uniform(0, 0.2, lines)
+    n = np.empty((periods, lines)); n[0] = start
+    for t in range(1, periods): n[t] = bass_step(n[t - 1], true["p"] / 12, true["q"] / 12, true["m"], churn / 12)
+    return n, true, churn, rng
+
+
+def test_recovers_parameters_without_noise():
+    n, true, churn, _ = simulate(20, 72, seed=3)
+    res = fit_many({f"Linie {i}": n[:, i] for i in range(n.shape[1])}, churn)
+    for k in PARAMS:
+        np.testing.assert_allclose([getattr(fit, k) for fit in res.fits], true[k], rtol=1e-6)
+    assert all(not fit.unidentified for fit in res.fits) and res.seconds > 0
+    ranges = res.fits[0].roa_ranges(2 * true["m"][0], "roa_fight")
+    assert sorted(ranges) == sorted(f"roa_fight_{k}_{b}" for k in "pqc" for b in ("min", "max"))
+    assert ranges["roa_fight_c_min"] == pytest.approx(res.fits[0].ci["m"][0] / (2 * true["m"][0]))
+
+
+def test_confidence_intervals_cover_true_parameters():
+    # 95 %-Intervalle bei additivem Rauschen: Anteil der Reihen, deren wahrer Wert im Intervall liegt
+    n, true, churn, rng = simulate(200, 96, seed=1, start=100.0)
+    y = np.abs(n + rng.normal(0, 1, n.shape) * 0.01 * true["m"])
+    fits = fit_many({f"Linie {i}": y[:, i] for i in range(y.shape[1])}, churn).fits
+    for k in PARAMS:
+        hits = [fit.ci[k][0] <= value <= fit.ci[k][1] for fit, value in zip(fits, true[k]) if fit.ci[k] is not None]
+        assert len(hits) >= 180
+        assert 0.85 <= np.mean(hits) <= 1.0, k
+
+
+def test_unidentified_parameters_get_no_interval():
+    # Bestand von Anfang an am Marktpotenzial: p und q wirken nicht auf den Pfad
+    fit = fit_bass([100.0] * 24, churn=0.0)
+    assert fit.unidentified == ["p", "q"] and fit.ci["m"] == pytest.approx((100.0, 100.0))
+    with pytest.raises(ValueError, match="nicht identifizierbar"): fit.roa_ranges(1000.0, "roa_std")
+    row = summary([fit]).iloc[0]
+    assert np.isnan(row["p von"]) and row["Nicht identifizierbar"] == "p, q"
+
+
+def test_churn_is_required_and_checked():
+    with pytest.raises(TypeError): fit_many([1.0, 2.0, 3.0, 4.0, 5.0])
+    with pytest.raises(ValueError, match="Churn"): fit_many([1.0, 2.0, 3.0, 4.0, 5.0], churn=1.5)
+
+
+def test_read_histories_german_csv():
+    df = read_histories("Monat;Linie A;Linie B\n1;1.000,5;10\n2;1.200;12\n".encode())
+    assert list(df.columns) == ["Linie A", "Linie B"] and df["Linie A"].tolist() == [1000.5, 1200.0]
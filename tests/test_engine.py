@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from conftest import reference
+
+from engine import METRICS, IncrementalEngine, calculate, calculate_batch, safe_float
+
+# ==========================================
+# ENGINE: Referenz, Batch, Perioden, Inkrementell, Bilanz
+# ==========================================
+
+ARGS = (0.03, 0.38, 0.05, 10.0)
+
+
+@pytest.mark.parametrize("f", [1, 4, 12])
+def test_vectorised_matches_scalar_reference(inputs, f):
+    inputs = inputs.replace(periods_per_year=f)
+    res = calculate(inputs, *ARGS); ref = reference(inputs, *ARGS)
+    for m, expected in ref.items():
+        np.testing.assert_allclose(res[m], expected, rtol=1e-9, atol=1e-6, err_msg=m)
+
+
+def test_batch_rows_match_single_scenarios(inputs):
+    p = np.array([0.01, 0.03, 0.05]); q = np.array([0.2, 0.38, 0.5]); c = np.array([0.02, 0.05, 0.1]); d = np.array([0.0, 10.0, 25.0])
+    batch = calculate_batch(inputs, p, q, c, d, overrides={"cac": [100.0, 250.0, 400.0]})
+    for i in range(3):
+        single = calculate(inputs.replace(cac=[100.0, 250.0, 400.0][i]), p[i], q[i], c[i], d[i])
+        for m in METRICS: np.testing.assert_allclose(batch.scenario(i)[m], single[m], rtol=1e-12, atol=1e-9, err_msg=m)
+
+
+def test_batch_of_one_is_calculate(inputs):
+    batch = calculate_batch(inputs, *ARGS)
+    assert len(batch) == 1
+    single = calculate(inputs, *ARGS)
+    for m in METRICS: np.testing.assert_array_equal(batch.scenario(0)[m], single[m])
+
+
+def test_annual_rollup_is_identity_for_annual_engine(inputs):
+    res = calculate(inputs, *ARGS)
+    assert res.annual() is res
+    batch = calculate_batch(inputs, *ARGS)
+    assert batch.annual() is batch
+
+
+@pytest.mark.parametrize("f", [4, 12])
+def test_periodic_rollup_matches_annual_engine(inputs, f):
+    # Ohne unterjährige Dynamik (keine Diffusion, Inflation, Misc-Capex) muss die Verdichtung exakt die Jahresrechnung ergeben
+    static = inputs.replace(churn=0.0, inflation=0.0, capex_annual=0)
+    annual = calculate(static, 0.0, 0.0, 0.05)
+    rolled = calculate(static.replace(periods_per_year=f), 0.0, 0.0, 0.05).annual()
+    assert len(rolled) == len(annual)
+    for m in ("Kunden", "Umsatz", "Wareneinsatz (COGS)", "Personalkosten", "FTE Total", "Kostenstellen", "Marketing (CAC)",
+              "Abschreibungen", "EBIT", "Investitionen (Assets)", "Anlagevermögen", "Forderungen LL", "Verb. LL"):
+        np.testing.assert_allclose(rolled[m], annual[m], rtol=1e-9, atol=1e-6, err_msg=m)
+
+
+def test_rollup_rules(inputs):
+    res = calculate(inputs.replace(periods_per_year=12), *ARGS); annual = res.annual()
+    np.testing.assert_allclose(annual["Umsatz"], res["Umsatz"].reshape(-1, 12).sum(axis=1))
+    np.testing.assert_array_equal(annual["Kasse"], res["Kasse"][11::12])
+    np.testing.assert_array_equal(annual["Kasse vor Finanzierung"], res["Kasse vor Finanzierung"].reshape(-1, 12).min(axis=1))
+    batch = calculate_batch(inputs.replace(periods_per_year=12), *ARGS).annual()
+    for m in METRICS: np.testing.assert_array_equal(batch.scenario(0)[m], annual[m])
+
+
+def test_incremental_engine_matches_full_recompute(inputs):
+    eng = IncrementalEngine()
+    p = np.array([0.01, 0.03]); q = np.array([0.3, 0.4]); c = np.array([0.04, 0.06])
+    changes = [
+        (inputs, p, q, c, {}),
+        (inputs.replace(cac=400.0), p, q, c, {"operating", "financing"}),
+        (inputs.replace(cac=400.0, tax_rate=30.0), p, q, c, {"financing"}),
+        (inputs.replace(cac=400.0, tax_rate=30.0, price_laptop=2000), p, q, c, {"assets", "operating", "financing"}),
+        (inputs.replace(cac=400.0, tax_rate=30.0, price_laptop=2000), p, q * 1.1, c, {"diffusion", "personnel", "cost_centers", "assets", "operating", "financing"}),
+    ]
+    for i, (inp, pp, qq, cc, expected) in enumerate(changes):
+        res = eng.run(inp, pp, qq, cc)
+        np.testing.assert_array_equal(res.values, calculate_batch(inp, pp, qq, cc).values)
+        if i: assert {s for s, how in eng.last_run.items() if how == "computed"} == expected
+
+
+def test_incremental_engine_after_table_change(inputs):
+    eng = IncrementalEngine(); eng.run(inputs, *ARGS)
+    jobs = inputs.table("jobs"); jobs.loc[0, "Sonstiges (€)"] += 5000
+    changed = type(inputs).build(dict(inputs.params), jobs, inputs.table("products"), inputs.table("cost_centers"))
+    np.testing.assert_array_equal(eng.run(changed, *ARGS).values, calculate_batch(changed, *ARGS).values)
+    assert eng.last_run["diffusion"] == "reused" and eng.last_run["personnel"] == "computed"
+
+
+@pytest.mark.parametrize("f", [1, 4])
+def test_other_costs_per_fte_indexed_with_inflation(inputs, f):
+    # "Sonstiges (€)" je FTE und Jahr mit Inflation, ohne Lohnnebenkosten; ohne Umsatzziel bleibt die Besetzung aus Jahr 1
+    static = inputs.replace(target_rev_per_fte=0.0, periods_per_year=f)
+    jobs = static.table("jobs"); jobs["Sonstiges (€)"] = 0.0
+    without = calculate(type(static).build(dict(static.params), jobs, static.table("products"), static.table("cost_centers")), *ARGS)
+    per_year = sum(j["FTE Jahr 1"] * j["Sonstiges (€)"] for j in static.table("jobs").to_dict("records"))
+    extra = per_year * (1 + static["inflation"] / 100) ** (np.arange(8 * f) // f) / f
+    np.testing.assert_allclose(calculate(static, *ARGS)["Personalkosten"] - without["Personalkosten"], extra, rtol=1e-12)
+
+
+@pytest.mark.parametrize("f", [1, 12])
+def test_balance_sheet_identity(inputs, f):
+    p = np.linspace(0.005, 0.05, 6); q = np.linspace(0.1, 0.5, 6)
+    batch = calculate_batch(inputs.replace(periods_per_year=f, min_cash=50000.0), p, q, 0.08)
+    for b in (batch, batch.annual()):
+        np.testing.assert_allclose(b.metric("Summe Aktiva"), b.metric("Summe Passiva"), rtol=1e-9, atol=1e-6)
+
+
+def test_safe_float():
+    assert safe_float("3,5".replace(",", ".")) == 3.5
+    assert safe_float(None) == 0.0 and safe_float("x", 1.0) == 1.0 and safe_float([1]) == 0.0
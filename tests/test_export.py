@@ -0,0 +1,62 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+from engine import METRICS, calculate, calculate_batch
+from export import batch_sheet, detail_sheets, estimate, file_name, to_bytes, write
+
+# ==========================================
+# EXPORT: Formate, Blöcke, Inhalte
+# ==========================================
+
+
+def test_detail_sheets_match_engine(inputs):
+    inputs = inputs.replace(periods_per_year=4)
+    sheets = {s.name: s for s in detail_sheets(inputs, 0.03, 0.38, 0.05)}
+    assert list(sheets) == ["GuV", "Cashflow", "Bilanz", "Perioden", "Personal", "Anlagen"]
+    for s in sheets.values():
+        df = pd.concat(list(s.blocks()), ignore_index=True)
+        assert list(df.columns) == s.columns and len(df) == s.rows, s.name
+    res = calculate(inputs, 0.03, 0.38, 0.05)
+    guv = next(sheets["GuV"].blocks())
+    np.testing.assert_allclose(guv["Umsatz"], res.annual()["Umsatz"])
+    roles = pd.concat(list(sheets["Personal"].blocks()))
+    np.testing.assert_allclose(roles.groupby("Periode")["Personalkosten"].sum(), res["Personalkosten"])
+    np.testing.assert_allclose(roles.groupby("Periode")["FTE"].sum(), res["FTE Total"])
+    assets = next(sheets["Anlagen"].blocks())
+    np.testing.assert_allclose(assets.groupby("Periode")["Zugang (€)"].sum(), res["Investitionen (Assets)"])
+
+
+def test_csv_round_trip_with_small_blocks(inputs, monkeypatch):
+    monkeypatch.setattr(export, "ROW_GROUP", 7)
+    p = np.linspace(0.01, 0.05, 5)
+    batch = calculate_batch(inputs, p, 0.38, 0.05)
+    sheet = batch_sheet("Batch", batch, {"p": p})
+    df = pd.read_csv(io.BytesIO(to_bytes([sheet], "csv", sep=";", decimal=",")), sep=";", decimal=",")
+    assert len(df) == sheet.rows == 5 * 8 and list(df.columns) == sheet.columns
+    np.testing.assert_allclose(df[METRICS].to_numpy(), batch.values.reshape(-1, len(METRICS)), rtol=1e-12)
+
+
+def test_multiple_sheets_as_zip(inputs):
+    sheets = detail_sheets(inputs, 0.03, 0.38, 0.05)
+    name, mime = file_name("plan", sheets, "csv")
+    assert name == "plan_csv.zip" and mime == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(to_bytes(sheets, "csv"))) as zf:
+        assert zf.namelist() == [f"{s.name}.csv" for s in sheets]
+        guv = pd.read_csv(zf.open("GuV.csv"))
+    assert len(guv) == 8 and estimate(sheets, "csv")[0] == sum(s.rows for s in sheets)
+
+
+@pytest.mark.parametrize("fmt, module", [("parquet", "pyarrow"), ("xlsx", "openpyxl")])
+def test_binary_formats_round_trip(inputs, fmt, module, tmp_path):
+    pytest.importorskip(module)
+    batch = calculate_batch(inputs, np.array([0.01, 0.03]), 0.38, 0.05)
+    sheet = batch_sheet("Batch", batch)
+    path = str(tmp_path / f"batch.{fmt}")
+    write([sheet], fmt, path)
+    df = pd.read_parquet(path) if fmt == "parquet" else pd.read_excel(path, sheet_name="Batch")
+    np.testing.assert_allclose(df[METRICS].to_numpy(), batch.values.reshape(-1, len(METRICS)))
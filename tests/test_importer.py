@@ -0,0 +1,77 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import ModelInputs
+from importer import read_records, read_table, typed
+
+# ==========================================
+# IMPORT: CSV / Parquet / Records
+# ==========================================
+
+GERMAN_CSV = (
+    "Job Titel;Jahresgehalt (€);FTE Jahr 1;Laptop;Smartphone;Auto;LKW;Büro;Sonstiges (€)\n"
+    "CEO;100.000,00 €;1;ja;ja;x;nein;ja;0\n"
+    "Sales;60.000;1,5;ja;nein;;;wahr;500\n"
+    "Kaputt;abc;1;ja;ja;ja;ja;ja;0\n"
+    "Minus;50000;-1;ja;ja;ja;ja;ja;0\n"
+)
+
+
+def test_german_csv_is_sniffed_and_validated():
+    res = read_table(GERMAN_CSV.encode("utf-8"), "jobs")
+    assert res.rows == 4 and res.bad_rows == 2 and not res.ok
+    assert res.table["Job Titel"].tolist() == ["CEO", "Sales"]
+    np.testing.assert_array_equal(res.table["Jahresgehalt (€)"], [100000.0, 60000.0])
+    np.testing.assert_array_equal(res.table["FTE Jahr 1"], [1.0, 1.5])
+    assert res.table["Auto"].tolist() == [True, False]
+    errors = res.errors.set_index("Zeile")
+    assert errors.loc[4, "Spalte"] == "Jahresgehalt (€)" and errors.loc[4, "Fehler"] == "keine Zahl"
+    assert errors.loc[5, "Spalte"] == "FTE Jahr 1" and errors.loc[5, "Fehler"].startswith("außerhalb")
+
+
+def test_chunks_give_same_result_as_one_block():
+    lines = GERMAN_CSV.splitlines()
+    data = "\n".join([lines[0]] + lines[1:] * 50).encode("utf-8")
+    one = read_table(data, "jobs"); chunked = read_table(data, "jobs", chunksize=7)
+    pd.testing.assert_frame_equal(one.table, chunked.table)
+    # Fehler je Block spaltenweise gesammelt -> gleiche Menge, andere Reihenfolge
+    pd.testing.assert_frame_equal(one.errors.sort_values(["Zeile", "Spalte"], ignore_index=True), chunked.errors.sort_values(["Zeile", "Spalte"], ignore_index=True))
+    assert chunked.bad_rows == 100
+
+
+def test_missing_and_unknown_columns():
+    res = read_table(io.StringIO("produkt,PREIS (€),Farbe\nA,10,rot\n"), "products")
+    assert res.table["Produkt"].tolist() == ["A"] and res.table["Preis (€)"].tolist() == [10.0]
+    assert "Take Rate (%)" in res.missing_columns and res.ignored_columns == ["Farbe"]
+
+
+def test_parquet_round_trip():
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"Kostenstelle": ["Miete", "IT"], "Grundwert Jahr 1 (€)": [24000.0, 12000.0], "Umsatz-Kopplung (%)": [0.0, 10.0]})
+    buf = io.BytesIO(); df.to_parquet(buf); buf.seek(0); buf.name = "kst.parquet"
+    res = read_table(buf, "cost_centers")
+    assert res.ok
+    pd.testing.assert_frame_equal(res.table, typed(df, "cost_centers"))
+
+
+def test_records_match_csv():
+    records = [{"Produkt": "A", "Preis (€)": "10", "Take Rate (%)": 50}, {"Produkt": "B", "Preis (€)": None, "Take Rate (%)": 150}]
+    res = read_records(records, "products")
+    assert res.rows == 2 and res.bad_rows == 1 and res.table["Produkt"].tolist() == ["A"]
+    assert read_records(None, "products").table.empty
+
+
+def test_keep_invalid_reports_but_keeps_rows_like_the_engine():
+    records = [{"Produkt": "A", "Preis (€)": 10, "Wiederkauf alle (Monate)": 240}, {"Produkt": "B", "Preis (€)": -5, "Take Rate (%)": "x"}]
+    res = read_records(records, "products", keep_invalid=True)
+    assert res.kept_invalid and res.bad_rows == 2 and len(res.errors) == 3
+    assert res.table["Produkt"].tolist() == ["A", "B"]
+    np.testing.assert_array_equal(res.table["Wiederkauf alle (Monate)"], [240.0, 0.0])
+    np.testing.assert_array_equal(res.table["Take Rate (%)"], [0.0, 0.0])
+    # Gleiche Werte wie die Engine aus den rohen Records
+    frozen = ModelInputs.build(products=records).products
+    for col, arr in frozen.items():
+        if arr.dtype != object: np.testing.assert_array_equal(res.table[col].to_numpy(), arr, err_msg=col)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELLED, DONE, EXPIRED, FAILED, RUNNING, WAITING, JobManager
+
+# ==========================================
+# HINTERGRUND-JOBS
+# ==========================================
+
+
+@pytest.fixture
+def manager():
+    m = JobManager(max_workers=1, ttl=60.0, max_per_owner=2)
+    yield m
+    m.shutdown()
+
+
+def wait(job, timeout=5.0):
+    end = time.time() + timeout
+    while not job.done:
+        assert time.time() < end, f"{job.label}: {job.status}"
+        time.sleep(0.005)
+    return job
+
+
+def blocker(release, progress):
+    # Läuft, bis release gesetzt ist; meldet dabei Fortschritt (Abbruchpunkt)
+    while not release.wait(0.005): progress(0.5)
+    return "fertig"
+
+
+def test_global_limit_queues_jobs(manager):
+    release = threading.Event()
+    first = manager.submit(blocker, release); second = manager.submit(lambda: 42, progress_arg=None)
+    time.sleep(0.05)
+    assert first.status == RUNNING and second.status == WAITING and manager.stats()["waiting"] == 1
+    release.set()
+    assert wait(first).result == "fertig" and wait(second).result == 42 and second.status == DONE
+
+
+def test_cancel_waiting_and_running_jobs(manager):
+    release = threading.Event()
+    running = manager.submit(blocker, release); waiting = manager.submit(lambda: 1, progress_arg=None)
+    time.sleep(0.05)
+    waiting.cancel()
+    assert waiting.status == CANCELLED  # noch nicht gestartet -> sofort
+    running.cancel()
+    assert wait(running).status == CANCELLED and running.result is None  # beim nächsten Fortschritts-Aufruf
+    failed = wait(manager.submit(lambda: 1 / 0, progress_arg=None))
+    assert failed.status == FAILED and "ZeroDivisionError" in failed.error
+
+
+def test_limit_per_owner(manager):
+    release = threading.Event()
+    jobs = [manager.submit(blocker, release, owner="a") for _ in range(2)]
+    with pytest.raises(RuntimeError): manager.submit(blocker, release, owner="a")
+    other = manager.submit(blocker, release, owner="b")
+    release.set()
+    for job in jobs + [other]: wait(job)
+    assert wait(manager.submit(lambda: 2, owner="a", progress_arg=None)).result == 2  # fertige Jobs zählen nicht
+
+
+def test_finished_jobs_expire_after_ttl():
+    m = JobManager(max_workers=1, ttl=0.05)
+    try:
+        job = wait(m.submit(lambda: b"pdf", progress_arg=None))
+        assert m.stats()["finished"] == 1 and job.result == b"pdf"
+        time.sleep(0.1)
+        assert m.stats()["finished"] == 0  # stats() räumt ab, ohne neuen submit()
+        assert job.status == EXPIRED and job.result is None and m.get(job.id) is None
+    finally:
+        m.shutdown()
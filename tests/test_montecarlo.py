@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_inputs
+
+from engine import STRATEGIES, calculate_batch
+from montecarlo import QUANTILES, QuantileSketch, run_monte_carlo, sample_strategy
+
+# ==========================================
+# MONTE CARLO: Sketch, Worker, Ausfallwahrscheinlichkeit
+# ==========================================
+
+# Eigenkapital so, dass "Fighter" nur in einem Teil der Ziehungen unter den Mindest-Cash fällt
+RISKY = {"equity": 700000.0, "min_cash": 20000.0}
+
+
+def test_sketch_matches_exact_percentiles():
+    # Gemergte Teil-Sketches wie in run_monte_carlo (je Chunk ein Sketch, Kompaktierung über max_parts)
+    rng = np.random.default_rng(7)
+    x = rng.lognormal(10, 1, (200_000, 3)) * [1.0, 2.0, 5.0]
+    sketch = QuantileSketch()
+    for a in range(0, len(x), 20_000):
+        part = QuantileSketch(); part.update(x[a:a + 20_000]); sketch.merge(part)
+    assert sketch.count == pytest.approx(len(x))
+    q = list(QUANTILES.values())
+    np.testing.assert_allclose(sketch.quantile(q), np.percentile(x, [100 * v for v in q], axis=0), rtol=5e-3)
+
+
+def test_results_independent_of_workers():
+    inputs = make_inputs(**RISKY)
+    single = run_monte_carlo(inputs, draws=3000, seed=11, workers=1, chunk_size=1000)
+    pooled = run_monte_carlo(inputs, draws=3000, seed=11, workers=2, chunk_size=1000)
+    for name in STRATEGIES:
+        np.testing.assert_array_equal(single[name].breach_by_year, pooled[name].breach_by_year)
+        pd.testing.assert_frame_equal(single[name].mean, pooled[name].mean)
+        for m, df in single[name].quantiles.items(): pd.testing.assert_frame_equal(df, pooled[name].quantiles[m])
+
+
+def test_breach_by_year_matches_direct_count():
+    inputs = make_inputs(**RISKY); draws, chunk, seed = 600, 200, 5
+    res = run_monte_carlo(inputs, draws=draws, seed=seed, workers=1, chunk_size=chunk)
+    for s, name in enumerate(STRATEGIES):
+        # Dieselben Ziehungen wie _run_chunk: ein Seed je (Strategie, Chunk)
+        cash = np.concatenate([
+            calculate_batch(inputs, *sample_strategy(inputs, name, chunk, np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(s, i))))).annual().metric("Kasse vor Finanzierung")
+            for i in range(draws // chunk)])
+        direct = [(cash[:, :t + 1].min(axis=1) < inputs["min_cash"]).mean() for t in range(cash.shape[1])]
+        np.testing.assert_array_equal(res[name].breach_by_year, direct)
+        assert res[name].draws == draws
+    assert 0 < res["Fighter"].breach_prob < 1
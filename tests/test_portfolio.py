@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from conftest import make_inputs
+
+from cache import ResultCache
+from engine import METRICS
+from portfolio import CashPool, Intercompany, Portfolio, evaluate
+
+# ==========================================
+# PORTFOLIO / KONZERN
+# ==========================================
+
+
+@pytest.fixture
+def group():
+    return Portfolio({"Holding": make_inputs(), "Vertrieb": make_inputs(sam=20000.0, equity=80000.0)},
+                     (Intercompany("Holding", "Vertrieb", 10000.0, growth_pct=5.0),))
+
+
+def test_consolidation_sums_entities_and_eliminates(group):
+    res = evaluate(group, workers=1, cache=ResultCache())
+    entities = sum(df[["Umsatz", "Kostenstellen", "Jahresüberschuss"]].to_numpy() for df in res.entities.values())
+    flow = 10000.0 * 1.05 ** np.arange(8)
+    np.testing.assert_allclose(res.consolidated["Umsatz"], entities[:, 0] - flow)
+    np.testing.assert_allclose(res.consolidated["Kostenstellen"], entities[:, 1] - flow)
+    # Lieferung ist ergebnisneutral
+    np.testing.assert_allclose(res.consolidated["Jahresüberschuss"], entities[:, 2])
+    np.testing.assert_allclose(res.eliminations["Umsatz/Aufwand"], flow)
+    np.testing.assert_allclose(res.consolidated["Summe Aktiva"], res.consolidated["Summe Passiva"], rtol=1e-9)
+    assert not res.warnings
+
+
+def test_elimination_capped_at_seller_revenue(group):
+    # Jahr 1: Umsatz Holding 47.200 < Lieferungen 2 × 30.000 < Konzernumsatz; Kostenstellen Vertrieb 66.000
+    ics = (Intercompany("Holding", "Vertrieb", 30000.0), Intercompany("Holding", "Vertrieb", 30000.0))
+    res = evaluate(Portfolio(group.entities, ics), workers=1, cache=ResultCache())
+    revenue = res.entities["Holding"]["Umsatz"].to_numpy()
+    first = res.eliminations[res.eliminations["Jahr"] == 1]["Umsatz/Aufwand"].to_numpy()
+    np.testing.assert_allclose(first, [30000.0, revenue[0] - 30000.0])
+    np.testing.assert_allclose(res.consolidated["Umsatz"].iloc[0], res.entities["Vertrieb"]["Umsatz"].iloc[0])
+    np.testing.assert_allclose(res.eliminations[res.eliminations["Jahr"] > 1]["Umsatz/Aufwand"], 30000.0)
+    assert len(res.warnings) == 1 and "Umsatz von Holding" in res.warnings[0]
+    assert res.portfolio == Portfolio(group.entities, ics)
+
+
+def test_only_changed_entities_are_recomputed(group):
+    cache = ResultCache()
+    assert sorted(evaluate(group, workers=1, cache=cache).recomputed) == ["Holding", "Vertrieb"]
+    changed = group.with_entity("Vertrieb", group.entities["Vertrieb"].replace(cac=100.0))
+    assert evaluate(changed, workers=1, cache=cache).recomputed == ["Vertrieb"]
+    assert evaluate(changed.without_entity("Holding"), workers=1, cache=cache).recomputed == []
+
+
+def test_cash_pool_finances_group_as_one(group):
+    pooled = Portfolio(group.entities, group.intercompany, CashPool(enabled=True, min_cash=20000.0))
+    res = evaluate(pooled, workers=1, cache=ResultCache())
+    c = res.consolidated
+    assert (c["Kasse"] >= 20000.0 - 1e-6).all()
+    np.testing.assert_allclose(c["Summe Aktiva"], c["Summe Passiva"], rtol=1e-9)
+    np.testing.assert_allclose(c["Eigenkapital"].iloc[-1] - 130000.0, c["Jahresüberschuss"].sum(), rtol=1e-9)
+
+
+def test_config_round_trip(group):
+    again = Portfolio.from_config(group.to_config())
+    assert again.entities == group.entities and again.intercompany == group.intercompany
+    with pytest.raises(KeyError): Portfolio(group.entities, (Intercompany("Holding", "Fremd", 1.0),))
+    assert set(METRICS) <= set(evaluate(again, workers=1, cache=ResultCache()).consolidated.columns)
@@ -0,0 +1,38 @@
+import threading
+import tracemalloc
+
+import profiling
+from engine import calculate
+from profiling import Tracer, bind, count, span
+
+# ==========================================
+# PROFILING
+# ==========================================
+
+
+def test_run_records_spans_counters_and_rss(inputs):
+    tracer = Tracer()
+    tracer.begin_run()
+    calculate(inputs, 0.03, 0.38, 0.05)
+    with span("test.outer"): count("test.items", 3)
+    run = tracer.end_run()
+    assert not tracemalloc.is_tracing()  # prozessweites Tracing bremst andere Sessions -> nicht verwenden
+    assert run["counters"]["engine.calls"] == 1 and run["counters"]["test.items"] == 3
+    names = {r["Span"] for r in tracer.summary(run)}
+    assert {"engine.diffusion", "engine.financing", "test.outer"} <= names
+    if profiling.rss() is not None:
+        assert run["rss"] > 0 and run["rss_delta"] == run["rss"] - run["rss_start"]
+    assert any(e["name"] == "rerun" for e in tracer.chrome_trace()["traceEvents"])
+
+
+def test_without_tracer_nothing_is_recorded():
+    tracer = Tracer(track_memory=False)
+    with span("test.idle"): count("test.idle")
+    tracer.begin_run(); run = tracer.end_run()
+    assert run["rss"] is None and not tracer.events and not tracer.counters
+
+
+def test_bind_records_from_other_threads():
+    tracer = Tracer(); tracer.begin_run()
+    t = threading.Thread(target=bind(lambda: count("test.thread"))); t.start(); t.join()
+    assert tracer.end_run()["counters"]["test.thread"] == 1
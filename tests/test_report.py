@@ -0,0 +1,28 @@
+import re
+
+import pytest
+
+import report
+from engine import calculate
+from report import create_detailed_pdf
+
+# ==========================================
+# PDF-REPORT
+# ==========================================
+
+
+def _images(pdf):
+    # RGB-Bild-XObjects mit Breite/Höhe in Pixeln (PNG-Weg legt zusätzlich Alpha-Masken in DeviceGray an)
+    return [tuple(map(int, m)) for m in re.findall(rb"/Subtype /Image\s*/Width (\d+)\s*/Height (\d+)\s*/ColorSpace /DeviceRGB", pdf)]
+
+
+@pytest.mark.parametrize("raw", [True, False])
+def test_detailed_pdf_contains_charts(inputs, monkeypatch, raw):
+    monkeypatch.setattr(report, "_RAW_IMAGES", raw and report._RAW_IMAGES)
+    df = calculate(inputs, 0.03, 0.38, 0.05).to_frame()
+    pdf = create_detailed_pdf(df, dict(inputs.params), inputs.table("jobs"), inputs.table("products"), inputs.table("cost_centers"))
+    assert pdf.startswith(b"%PDF")
+    images = _images(pdf)
+    # Management Summary (10 x 4 Zoll) und Kasse (10 x 3,5 Zoll) bei 150 dpi
+    assert images == [(1500, 600), (1500, 525)]
+    assert (b"/SMask" in pdf) is not raw  # PNG-Weg erkennbar an der Alpha-Maske
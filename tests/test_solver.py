@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from conftest import make_inputs
+
+from engine import calculate
+from solver import Constraint, Decision, solve
+
+# ==========================================
+# ZIELWERTSUCHE
+# ==========================================
+
+CASH = [Constraint("Kasse vor Finanzierung", ">=", "min_cash")]
+
+
+def worst_slack(inputs, **params):
+    # Direkt mit der Engine: kleinster Abstand von "Kasse vor Finanzierung" zum Mindest-Cash über alle Jahre
+    changed = inputs.replace(**params)
+    return (calculate(changed, changed["p_pct"], changed["q_pct"], changed["cap_pct"] / 100)["Kasse vor Finanzierung"] - changed["min_cash"]).min()
+
+
+def test_minimum_equity_lies_on_the_boundary(inputs):
+    res = solve(inputs, [Decision("equity", 0.0, 5e6)], CASH)
+    x = res.solution["equity"]
+    assert res.feasible and res.objective == x and res.slack.min() >= 0
+    assert worst_slack(inputs, equity=x) >= 0 > worst_slack(inputs, equity=x - 2e-6 * 5e6)
+
+
+def test_bound_returned_when_constraint_already_holds(inputs):
+    res = solve(inputs, [Decision("equity", 2e6, 5e6)], CASH)
+    assert res.feasible and res.solution == {"equity": 2e6}
+
+
+def test_infeasible_problem_is_reported(inputs):
+    res = solve(inputs, [Decision("equity", 0.0, 1000.0)], CASH)
+    assert not res.feasible and np.isnan(res.objective) and res.slack.min() < 0
+    assert res.solution == {"equity": 1000.0}  # geringste Verletzung, nicht als Lösung ausgegeben
+
+
+def test_integer_decision():
+    # dso ist ganzzahlig (Tage): größter zulässiger Wert, der nächste Tag verletzt die Bedingung
+    inputs = make_inputs(equity=900000.0)
+    res = solve(inputs, [Decision("dso", 0, 365, "max")], CASH)
+    dso = res.solution["dso"]
+    assert res.feasible and dso == int(dso)
+    assert worst_slack(inputs, dso=int(dso)) >= 0 > worst_slack(inputs, dso=int(dso) + 1)
+
+
+def test_budget_and_max_steps_limit_the_search(inputs):
+    decisions = [Decision("equity", 0.0, 5e6), Decision("dso", 0, 90, "max", weight=1000.0)]
+    res = solve(inputs, decisions, CASH, budget=25, max_steps=3)
+    assert res.steps == 3 == len(res.history)
+    assert all(n <= 25 for n, _, _ in res.history) and res.evaluations == sum(n for n, _, _ in res.history)
+    assert solve(inputs, decisions[:1], CASH, max_steps=1).steps == 1
+
+
+def test_invalid_decisions_are_rejected(inputs):
+    with pytest.raises(KeyError): solve(inputs, [Decision("gibt_es_nicht", 0, 1)], CASH)
+    with pytest.raises(ValueError): solve(inputs, [Decision("equity", 1.0, 0.0)], CASH)
+    with pytest.raises(ValueError): solve(inputs, [Decision("periods_per_year", 1, 12)], CASH)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from engine import METRICS, calculate, calculate_batch
+from store import ScenarioStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ScenarioStore(str(tmp_path / "scenarios.db"))
+    yield s
+    s.close()
+
+# ==========================================
+# SZENARIO-SPEICHER
+# ==========================================
+
+
+def test_save_find_load_round_trip(store, inputs):
+    res = calculate(inputs, inputs["p_pct"], inputs["q_pct"], inputs["cap_pct"] / 100)
+    sid = store.save("Basis", inputs, res)
+    assert store.find(inputs) == sid
+    assert store.find(inputs.replace(cac=999.0)) is None
+    # Bezeichnungen und Nicht-Engine-Parameter ändern das Ergebnis nicht -> Treffer
+    assert store.find(inputs.replace(wacc=12.0)) == sid
+    loaded, values, row = store.load(sid)
+    assert loaded == inputs and row["name"] == "Basis"
+    for m in METRICS: np.testing.assert_allclose(values[m], res[m], err_msg=m)
+
+
+def test_batch_query_and_diff(store, inputs):
+    p = np.array([0.01, 0.03, 0.05])
+    overrides = {"min_cash": [2e7, 0.0, 0.0]}
+    batch = calculate_batch(inputs, p, 0.38, 0.05, overrides=overrides)
+    ids = store.save_batch("Gitter", inputs, batch, p, 0.38, 0.05, overrides=overrides)
+    assert len(ids) == 3 and store.list(tag="batch")["name"].tolist() == ["Gitter #3", "Gitter #2", "Gitter #1"]
+    # Je Szenario variierter Parameter hat Vorrang vor der Konfiguration (min_cash 10000)
+    kasse = batch.metric("Kasse vor Finanzierung")[:, -1]
+    assert kasse[0] < 2e7 and (kasse > 10000).all()
+    assert store.query("Kasse vor Finanzierung", "<", "min_cash", year=8)["id"].tolist() == [ids[0]]
+    assert len(store.query("Kasse vor Finanzierung", "<", "min_cash")) == 3
+    hits = store.query("Umsatz", ">", 1e6, year=5)
+    assert hits["id"].tolist() == [i for k, i in enumerate(ids) if batch.metric("Umsatz")[k, 4] > 1e6]
+    params, tables, results = store.diff(ids[0], ids[2])
+    assert set(params["Parameter"]) == {"p", "min_cash"} and tables.empty
+    assert "Umsatz" in results["Kennzahl"].tolist()
+    with pytest.raises(KeyError): store.query("Gibt es nicht", "<", 0)
+
+
+def test_delete_removes_orphaned_configs(store, inputs):
+    a = store.save("A", inputs, calculate(inputs, 0.03, 0.38, 0.05))
+    b = store.save("B", inputs.replace(cac=100.0), calculate(inputs.replace(cac=100.0), 0.03, 0.38, 0.05))
+    assert store.stats()["configs"] == 2
+    store.delete([b])
+    assert store.stats() | {"bytes": 0} == {"scenarios": 1, "configs": 1, "bytes": 0}
+    assert store.versions("A")["id"].tolist() == [a]
+
+
+def test_query_uses_primary_keys(store, inputs):
+    store.save("A", inputs, calculate(inputs, 0.03, 0.38, 0.05))
+    # SQL von query() mitschneiden und den Plan prüfen: keine Volltabellen-Suche über results, kein JSON der Konfiguration
+    captured = []
+    with store._lock:
+        store._conn.set_trace_callback(captured.append)
+        store.query("Kasse vor Finanzierung", "<", "min_cash", year=3)
+        store._conn.set_trace_callback(None)
+        sql = next(s for s in captured if "FROM scenarios s" in s)
+        plan = " | ".join(r[3] for r in store._conn.execute("EXPLAIN QUERY PLAN " + sql))
+    assert "SEARCH r USING PRIMARY KEY" in plan and "SCAN r" not in plan
+    assert "SEARCH cp USING PRIMARY KEY" in plan and "c.params" not in sql
+
+
+def test_version_changes_on_writes(store, inputs):
+    v0 = store.version()
+    assert store.version() == v0
+    sid = store.save("A", inputs, calculate(inputs, 0.03, 0.38, 0.05))
+    v1 = store.version(); assert v1 != v0
+    store.delete([sid])
+    assert store.version() != v1
+
+
+def test_schema_v1_is_migrated(tmp_path, inputs):
+    path = str(tmp_path / "v1.db")
+    s = ScenarioStore(path)
+    s.save("A", inputs.replace(min_cash=1e9), calculate(inputs.replace(min_cash=1e9), 0.03, 0.38, 0.05))
+    with s._lock:
+        s._conn.execute("DROP TABLE config_params"); s._conn.execute("PRAGMA user_version=1")
+    s.close()
+    s = ScenarioStore(path)
+    try:
+        assert len(s.query("Kasse vor Finanzierung", "<", "min_cash")) == 1
+        assert s._conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    finally:
+        s.close()
+
+
+def test_store_path_is_configurable(monkeypatch, tmp_path):
+    import store as store_module
+    monkeypatch.delenv("FINMOD_STORE", raising=False)
+    assert store_module.store_path() == str(tmp_path.home() / ".finmod" / "scenarios.db")
+    assert store_module.store_path("/data/s.db") == "/data/s.db"
+    monkeypatch.setenv("FINMOD_STORE", str(tmp_path / "env.db"))
+    assert store_module.store_path("/data/s.db") == str(tmp_path / "env.db")